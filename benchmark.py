@@ -0,0 +1,315 @@
+"""Banc d'essai de charge du bot, sans réseau.
+
+Construit l'Application exactement comme main() (build_application), mais
+branche une fausse API Bot à la place de la couche HTTP et injecte directement
+dans la file de PTB un trafic synthétique : /start, clics sur les boutons du
+menu, messages de contact et modifications du texte d'accueil par des admins.
+
+    python benchmark.py --users 2000 --updates 20000 --api-latency 20
+
+Affiche le débit (updates/s), la latence p50/p99 des handlers et le nombre
+d'appels à l'API Bot par update, et ajoute une ligne JSON au fichier --results
+pour comparer les versions entre elles. Le bot tourne dans un dossier
+temporaire : aucune donnée réelle n'est touchée.
+"""
+import argparse
+import asyncio
+import collections
+import itertools
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ADMIN_PASSWORD = "bench-password"
+USER_ROUTES = ("no_menus", "nos_services", "contact", "nous_contacter", "back_to_main", "service_menu_0")
+
+
+# --- Trafic synthétique ---
+class TrafficGenerator:
+    """Updates au format de l'API Bot ; l'ordre des updates d'un même utilisateur est réaliste"""
+
+    def __init__(self, users, admins, seed):
+        self.random = random.Random(seed)
+        self.users = [1_000_000 + i for i in range(users)]
+        self.admins = [900_000 + i for i in range(admins)]
+        self.started = set()
+        self.update_ids = itertools.count(1)
+        self.message_ids = itertools.count(1)
+        self.date = int(time.time())
+
+    def _user(self, user_id):
+        return {"id": user_id, "is_bot": False, "first_name": f"Bench{user_id}", "username": f"bench{user_id}"}
+
+    def _message(self, user_id, text):
+        message = {
+            "message_id": next(self.message_ids),
+            "date": self.date,
+            "chat": {"id": user_id, "type": "private"},
+            "from": self._user(user_id),
+            "text": text,
+        }
+        if text.startswith("/"):
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        return {"update_id": next(self.update_ids), "message": message}
+
+    def _tap(self, user_id, data):
+        return {
+            "update_id": next(self.update_ids),
+            "callback_query": {
+                "id": str(next(self.update_ids)),
+                "from": self._user(user_id),
+                "chat_instance": str(user_id),
+                "data": data,
+                # Message du bot sur lequel le bouton a été cliqué
+                "message": {
+                    "message_id": 1000, "date": self.date,
+                    "chat": {"id": user_id, "type": "private"},
+                    "from": {"id": 1, "is_bot": True, "first_name": "Bench"},
+                    "text": "menu",
+                },
+            },
+        }
+
+    def session(self, kind):
+        """(type, update) d'une action ; la première action d'un utilisateur l'ouvre (/start, connexion admin)"""
+        if kind == "admin":
+            user_id = self.random.choice(self.admins)
+            updates = []
+            if user_id not in self.started:
+                self.started.add(user_id)
+                updates += [("admin", self._message(user_id, "/admin")), ("admin", self._message(user_id, ADMIN_PASSWORD))]
+            text = f"👋 Bienvenue ! (édition {next(self.update_ids)})"
+            return updates + [
+                ("admin", self._tap(user_id, "admin_edit_welcome_text")),
+                ("admin", self._message(user_id, text)),
+            ]
+        user_id = self.random.choice(self.users)
+        updates = []
+        if user_id not in self.started or kind == "start":
+            self.started.add(user_id)
+            updates.append(("start", self._message(user_id, "/start")))
+            if kind == "start":
+                return updates
+        if kind == "tap":
+            return updates + [("tap", self._tap(user_id, self.random.choice(USER_ROUTES)))]
+        return updates + [
+            ("contact", self._tap(user_id, "nous_contacter")),
+            ("contact", self._message(user_id, f"Bonjour, une question ({self.random.random():.6f})")),
+        ]
+
+    def generate(self, count, mix):
+        kinds, weights = zip(*mix.items())
+        updates = []
+        while len(updates) < count:
+            updates += self.session(self.random.choices(kinds, weights)[0])
+        return updates[:count]
+
+
+def parse_mix(value):
+    """"start=1,tap=6,contact=2,admin=1" -> {type: poids}"""
+    mix = {}
+    for item in value.split(","):
+        kind, _, weight = item.partition("=")
+        if kind.strip() not in ("start", "tap", "contact", "admin"):
+            raise argparse.ArgumentTypeError(f"type de trafic inconnu : {kind}")
+        mix[kind.strip()] = float(weight or 1)
+    return mix
+
+
+# --- Mesures ---
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def peak_rss_mb():
+    # ru_maxrss est en Ko sous Linux, en octets sous macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# --- Exécution ---
+async def run(args, bot):
+    latency = args.api_latency / 1000
+
+    class FakeRequest(bot.InstrumentedRequest):
+        """Couche HTTP du bot servie en mémoire : mêmes comptages que InstrumentedRequest, sans réseau"""
+
+        def __init__(self):
+            super().__init__(connection_pool_size=args.concurrency)
+            self.calls = collections.Counter()
+            self._message_ids = itertools.count(1000)
+
+        async def do_request(self, url, method, request_data=None, *a, **kw):
+            api_method = url.rsplit("/", 1)[-1]
+            self.calls[api_method] += 1
+            params = request_data.parameters if request_data is not None else {}
+            if api_method == "getMe":
+                result = {"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+            elif api_method.startswith(("send", "edit", "copy", "forward")):
+                result = {
+                    "message_id": next(self._message_ids),
+                    "date": int(time.time()),
+                    "chat": {"id": int(params.get("chat_id", 0) or 0), "type": "private"},
+                    "text": "",
+                }
+            else:
+                result = True
+            if latency:
+                await asyncio.sleep(latency)
+            return 200, json.dumps({"ok": True, "result": result}).encode("utf-8")
+
+    class TimedProcessor(bot.PerUserUpdateProcessor):
+        """Chronomètre chaque update, de son début de traitement à sa fin (attente dans la file de l'utilisateur exclue)"""
+
+        def __init__(self, max_concurrent_updates, kinds):
+            super().__init__(max_concurrent_updates)
+            self.kinds = kinds  # update_id -> type de trafic
+            self.latencies = collections.defaultdict(list)
+
+        async def _timed(self, coroutine, kind):
+            start = time.perf_counter()
+            try:
+                await coroutine
+            finally:
+                self.latencies[kind].append(time.perf_counter() - start)
+
+        async def do_process_update(self, update, coroutine):
+            kind = self.kinds.get(getattr(update, "update_id", None), "autre")
+            await super().do_process_update(update, self._timed(coroutine, kind))
+
+    traffic = TrafficGenerator(args.users, args.admins, args.seed).generate(args.updates, args.mix)
+    kinds = {raw["update_id"]: kind for kind, raw in traffic}
+    request = FakeRequest()
+    processor = TimedProcessor(args.concurrency, kinds)
+    app = bot.build_application(request=request, update_processor=processor)
+
+    await app.initialize()
+    await bot.post_init(app)
+    await app.start()
+    updates = [bot.Update.de_json(raw, app.bot) for _, raw in traffic]
+    setup_calls = sum(request.calls.values())
+    bot.bot_log.warning("⏱️ %s updates, %s utilisateurs, %s admins", len(updates), args.users, args.admins)
+
+    start = time.perf_counter()
+    for update in updates:
+        app.update_queue.put_nowait(update)
+    # Attendre que toutes les updates aient été traitées
+    while processor.processed < len(updates):
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - start
+
+    await app.stop()
+    await bot.post_stop(app)
+    await app.shutdown()
+
+    latencies = [value for values in processor.latencies.values() for value in values]
+    api_calls = sum(request.calls.values()) - setup_calls
+    return {
+        "updates": len(updates),
+        "seconds": round(elapsed, 3),
+        "updates_per_second": round(len(updates) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "api_calls": api_calls,
+        "api_calls_per_update": round(api_calls / len(updates), 3),
+        "by_kind": {
+            kind: {
+                "updates": len(values),
+                "p50_ms": round(percentile(values, 0.5) * 1000, 3),
+                "p99_ms": round(percentile(values, 0.99) * 1000, 3),
+            }
+            for kind, values in sorted(processor.latencies.items())
+        },
+        "api_methods": dict(request.calls.most_common()),
+        "flows": [
+            {"flow": flow, "updates": count, "calls_per_update": round(average, 2), "max_calls": most}
+            for flow, count, average, most in bot.api_accounting.flows()
+        ],
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Banc d'essai de charge du bot (fausse API Bot, sans réseau)")
+    parser.add_argument("--users", type=int, default=1000, help="nombre d'utilisateurs simulés")
+    parser.add_argument("--admins", type=int, default=3, help="nombre d'admins simulés")
+    parser.add_argument("--updates", type=int, default=10000, help="nombre d'updates à traiter")
+    parser.add_argument(
+        "--mix", type=parse_mix, default=parse_mix("start=2,tap=6,contact=2,admin=0.2"),
+        help="poids des types de trafic (défaut : start=2,tap=6,contact=2,admin=0.2)",
+    )
+    parser.add_argument("--concurrency", type=int, default=64, help="updates traitées en parallèle (CONCURRENT_UPDATES)")
+    parser.add_argument("--api-latency", type=float, default=0, help="latence simulée de l'API Bot, en ms")
+    parser.add_argument("--seed", type=int, default=1, help="graine du trafic (même graine = même trafic)")
+    parser.add_argument("--results", default="benchmark_results.jsonl", help="fichier JSONL où ajouter les résultats")
+    args = parser.parse_args()
+    results_path = os.path.abspath(args.results)
+
+    workdir = tempfile.TemporaryDirectory(prefix="bot-benchmark-")
+    os.chdir(workdir.name)
+    # La configuration est lue à l'import : l'environnement doit être prêt avant
+    os.environ.update(
+        TELEGRAM_TOKEN="123456:BENCHMARK",
+        TELEGRAM_API_URL="",
+        ADMIN_PASSWORD=ADMIN_PASSWORD,
+        CONCURRENT_UPDATES=str(args.concurrency),
+        API_REPORT_FILE="",
+        METRICS_PORT="0",
+        LOG_LEVEL=os.getenv("LOG_LEVEL", "WARNING"),
+    )
+    sys.path.insert(0, HERE)
+    import telegram_bot as bot
+
+    try:
+        results = asyncio.run(run(args, bot))
+    finally:
+        bot.message_journal.close()
+        bot.state_persistence.close()
+        bot.persistence.close()
+        os.chdir(HERE)
+        workdir.cleanup()
+
+    print(f"📈 Débit : {results['updates_per_second']:.0f} updates/s ({results['updates']} updates en {results['seconds']:.2f} s)")
+    print(f"⏱️ Latence des handlers : p50 {results['p50_ms']:.2f} ms, p99 {results['p99_ms']:.2f} ms")
+    for kind, stats in results["by_kind"].items():
+        print(f"   {kind} : {stats['updates']} updates, p50 {stats['p50_ms']:.2f} ms, p99 {stats['p99_ms']:.2f} ms")
+    print(f"📞 Appels API Bot : {results['api_calls']} ({results['api_calls_per_update']:.2f} par update) {results['api_methods']}")
+    for flow in results["flows"][:5]:
+        print(f"   {flow['flow']} : {flow['calls_per_update']:.2f} par update (max {flow['max_calls']})")
+    print(f"💾 Mémoire maximale : {results['peak_rss_mb']:.0f} Mo")
+
+    entry = {
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "params": {
+            "users": args.users, "admins": args.admins, "updates": args.updates, "mix": args.mix,
+            "concurrency": args.concurrency, "api_latency_ms": args.api_latency, "seed": args.seed,
+        },
+        "results": results,
+    }
+    with open(results_path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    print(f"📝 Résultats ajoutés à {results_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,354 @@
+"""Micro-benchmark du stockage du bot, de 1k à 1M enregistrements.
+
+Pour chaque taille, génère des fichiers de départ au format d'origine
+(users.json avec utilisateurs et messages, admins.json, data.json avec autant
+de menus), les importe dans le stockage actuel (users.db, messages.jsonl) par
+la migration de démarrage du bot, puis chronomètre chaque fonction de
+persistance sur deux backends :
+
+- json : les fonctions d'origine du bot (relecture et réécriture complète du
+  fichier JSON à chaque appel), reproduites ici comme référence ;
+- actuel : les fonctions de telegram_bot.py (SQLite, journal JSONL, registre
+  en mémoire, écritures différées).
+
+    python storage_benchmark.py --sizes 1000,10000,100000
+
+Chaque mesure tourne dans son propre processus, sur une copie des fichiers de
+départ : la mémoire maximale (RSS) est celle de la mesure seule. Le temps par
+opération est celui payé par l'appelant (le handler) ; les octets écrits par
+opération comptent toutes les écritures du processus (/proc/self/io),
+y compris celles faites en arrière-plan, vidées à la fin de la mesure.
+Les résultats sont ajoutés au fichier --results (JSONL).
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SIZES = (1_000, 10_000, 100_000, 1_000_000)
+FUNCTIONS = ("load_users", "add_user", "add_message", "recent_messages", "save_data", "load_admins", "get_user_role")
+BACKENDS = ("json", "actuel")
+
+
+# --- Fichiers de départ ---
+def user_record(user_id):
+    return {"user_id": user_id, "username": f"user{user_id}", "first_name": f"Prénom{user_id}", "last_name": None}
+
+
+def message_record(user_id, index, start):
+    return dict(
+        user_record(user_id),
+        message=f"Bonjour, ceci est le message numéro {index} ✉️",
+        timestamp=str(start + timedelta(seconds=index)),
+    )
+
+
+def write_fixtures(directory, size):
+    """users.json, admins.json et data.json au format d'origine, puis migration vers users.db et messages.jsonl"""
+    start = datetime(2024, 1, 1)
+    users = [user_record(1_000_000 + i) for i in range(size)]
+    messages = [message_record(1_000_000 + i % max(1, size // 10), i, start) for i in range(size)]
+    with open(os.path.join(directory, "users.json"), "w", encoding="utf-8") as f:
+        json.dump({"users": users, "messages": messages}, f, ensure_ascii=False, indent=2)
+    del users, messages
+    admins = {
+        str(2_000_000 + i): {
+            "role": ("CHEF", "ADMIN", "STAFF")[min(i, 2)],
+            "username": f"admin{i}",
+            "name": f"Admin {i}",
+            "added_by": "system",
+            "added_date": str(start),
+        }
+        for i in range(size)
+    }
+    with open(os.path.join(directory, "admins.json"), "w", encoding="utf-8") as f:
+        json.dump(admins, f, ensure_ascii=False, indent=2)
+    del admins
+    data = {
+        "contact": "📞 Contactez-nous : contact@monentreprise.com",
+        "welcome_text": "👋 Bonjour et bienvenue sur notre bot !\nChoisissez une option :",
+        "welcome_photo": None,
+        "services": [{"name": f"Menu {i}", "text": f"Contenu du menu {i}", "photo": None} for i in range(size)],
+    }
+    with open(os.path.join(directory, "data.json"), "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=4, ensure_ascii=False)
+    # Migration de démarrage du bot : users.json -> users.db + messages.jsonl
+    bot = import_bot(directory)
+    bot.message_journal.close()
+    bot.user_store.close()
+    bot.persistence.close()
+
+
+def import_bot(directory):
+    """Importer telegram_bot avec ses fichiers dans directory (la configuration est lue à l'import)"""
+    os.chdir(directory)
+    os.environ.update(
+        TELEGRAM_TOKEN="123456:BENCHMARK",
+        DATA_FILE="data.json",
+        USERS_FILE="users.json",
+        USERS_DB="users.db",
+        MESSAGES_FILE="messages.jsonl",
+        ADMINS_FILE="admins.json",
+        ADMIN_SESSIONS_FILE="admin_sessions.json",
+        STATE_DB="state.db",
+        LOG_LEVEL=os.getenv("LOG_LEVEL", "WARNING"),
+    )
+    sys.path.insert(0, HERE)
+    import telegram_bot
+    return telegram_bot
+
+
+# --- Backend d'origine (un fichier JSON relu et réécrit à chaque appel) ---
+class JsonStorage:
+    """Fonctions de persistance de la première version du bot"""
+
+    def load_users(self):
+        try:
+            with open("users.json", "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"users": [], "messages": []}
+
+    def save_users(self, users_data):
+        with open("users.json", "w", encoding="utf-8") as f:
+            json.dump(users_data, f, ensure_ascii=False, indent=2)
+
+    def add_user(self, user_id, username, first_name, last_name):
+        users_data = self.load_users()
+        for user in users_data["users"]:
+            if user["user_id"] == user_id:
+                return
+        users_data["users"].append(
+            {"user_id": user_id, "username": username, "first_name": first_name, "last_name": last_name}
+        )
+        self.save_users(users_data)
+
+    def add_message(self, user_id, username, first_name, last_name, message_text, timestamp):
+        users_data = self.load_users()
+        users_data["messages"].append({
+            "user_id": user_id, "username": username, "first_name": first_name, "last_name": last_name,
+            "message": message_text, "timestamp": timestamp,
+        })
+        self.save_users(users_data)
+
+    def recent_messages(self):
+        return self.load_users().get("messages", [])[-10:]
+
+    def load_data(self):
+        with open("data.json", "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def save_data(self, data):
+        with open("data.json", "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=4, ensure_ascii=False)
+
+    def load_admins(self):
+        try:
+            with open("admins.json", "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def get_user_role(self, user_id):
+        return self.load_admins().get(str(user_id), {}).get("role", "STAFF")
+
+    def close(self):
+        pass
+
+
+class CurrentStorage:
+    """Fonctions de persistance actuelles de telegram_bot.py"""
+
+    def __init__(self, directory):
+        self.bot = import_bot(directory)
+        self.load_users = self.bot.load_users
+        self.add_user = self.bot.add_user
+        self.add_message = self.bot.add_message
+        self.save_data = self.bot.save_data
+        self.load_admins = self.bot.load_admins
+        self.get_user_role = self.bot.get_user_role
+
+    def recent_messages(self):
+        return self.bot.message_journal.page(10)
+
+    def load_data(self):
+        return self.bot.content_store.get()
+
+    def close(self):
+        # Écrire ce qui attend encore (écritures différées, fsync du journal)
+        self.bot.persistence.close()
+        self.bot.message_journal.close()
+        self.bot.user_store.close()
+
+
+# --- Mesure (dans un processus dédié) ---
+def written_bytes():
+    """Octets passés à write() par tout le processus, threads compris (None hors Linux)"""
+    try:
+        with open("/proc/self/io", "r") as f:
+            for line in f:
+                if line.startswith("wchar:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def peak_rss_mb():
+    # ru_maxrss est en Ko sous Linux, en octets sous macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def measure(backend, function, size, max_ops, max_seconds):
+    directory = os.getcwd()
+    storage = JsonStorage() if backend == "json" else CurrentStorage(directory)
+    data = storage.load_data() if function == "save_data" else None
+    timestamp = str(datetime.now())
+
+    def operation(i):
+        if function == "add_user":
+            # Nouvel utilisateur à chaque appel (le cas coûteux)
+            user = user_record(5_000_000 + i)
+            storage.add_user(user["user_id"], user["username"], user["first_name"], user["last_name"])
+        elif function == "add_message":
+            storage.add_message(1_000_000 + i % size, f"user{i}", "Prénom", None, f"Message de test {i}", timestamp)
+        elif function == "save_data":
+            data["welcome_text"] = f"👋 Bienvenue ! ({i})"
+            storage.save_data(data)
+        elif function == "get_user_role":
+            storage.get_user_role(2_000_000 + i % size)
+        else:
+            getattr(storage, function)()
+
+    bytes_before = written_bytes()
+    elapsed = 0.0
+    ops = 0
+    while ops < max_ops and (ops == 0 or elapsed < max_seconds):
+        start = time.perf_counter()
+        operation(ops)
+        elapsed += time.perf_counter() - start
+        ops += 1
+    storage.close()
+    bytes_after = written_bytes()
+    return {
+        "backend": backend,
+        "function": function,
+        "size": size,
+        "ops": ops,
+        "us_per_op": round(elapsed / ops * 1e6, 1),
+        "bytes_per_op": round((bytes_after - bytes_before) / ops) if bytes_before is not None else None,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def run_case(fixtures, backend, function, size, args):
+    """Mesurer une fonction dans un nouveau processus, sur une copie des fichiers de départ"""
+    with tempfile.TemporaryDirectory(prefix="storage-case-") as workdir:
+        workdir = os.path.join(workdir, "data")
+        shutil.copytree(fixtures, workdir)
+        output = subprocess.run(
+            [
+                sys.executable, os.path.abspath(__file__), "--measure", backend, function,
+                "--sizes", str(size), "--ops", str(args.ops), "--max-seconds", str(args.max_seconds),
+            ],
+            cwd=workdir, capture_output=True, text=True,
+        )
+    if output.returncode != 0:
+        raise SystemExit(f"❌ {backend}.{function} ({size}) : {output.stderr.strip()}")
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def format_bytes(value):
+    if value is None:
+        return "?"
+    for unit in ("o", "Ko", "Mo"):
+        if value < 1024:
+            return f"{value:.0f} {unit}"
+        value /= 1024
+    return f"{value:.1f} Go"
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_list(value):
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark du stockage du bot")
+    parser.add_argument("--sizes", default=",".join(str(size) for size in SIZES), help="nombres d'enregistrements")
+    parser.add_argument("--functions", default=",".join(FUNCTIONS), help="fonctions à mesurer")
+    parser.add_argument("--backends", default=",".join(BACKENDS), help="backends à comparer")
+    parser.add_argument("--ops", type=int, default=200, help="opérations au plus par mesure")
+    parser.add_argument("--max-seconds", type=float, default=5, help="durée au-delà de laquelle une mesure s'arrête")
+    parser.add_argument("--results", default="storage_results.jsonl", help="fichier JSONL où ajouter les résultats")
+    parser.add_argument("--measure", nargs=2, metavar=("BACKEND", "FONCTION"), help=argparse.SUPPRESS)
+    parser.add_argument("--fixtures", metavar="DOSSIER", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    sizes = [int(size) for size in parse_list(args.sizes)]
+
+    # Processus enfants : génération des fichiers de départ, ou une mesure
+    if args.fixtures:
+        write_fixtures(args.fixtures, sizes[0])
+        return
+    if args.measure:
+        backend, function = args.measure
+        print(json.dumps(measure(backend, function, sizes[0], args.ops, args.max_seconds)))
+        return
+
+    functions = parse_list(args.functions)
+    backends = parse_list(args.backends)
+    for name in functions:
+        if name not in FUNCTIONS:
+            parser.error(f"fonction inconnue : {name} (choix : {', '.join(FUNCTIONS)})")
+    for name in backends:
+        if name not in BACKENDS:
+            parser.error(f"backend inconnu : {name} (choix : {', '.join(BACKENDS)})")
+
+    results = []
+    for size in sizes:
+        with tempfile.TemporaryDirectory(prefix="storage-fixtures-") as fixtures:
+            start = time.perf_counter()
+            subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--fixtures", fixtures, "--sizes", str(size)],
+                check=True,
+            )
+            print(f"\n📦 {size} enregistrements (fichiers générés en {time.perf_counter() - start:.1f} s)")
+            print(f"   {'fonction':<16} {'backend':<7} {'ops':>5} {'temps/op':>12} {'écrit/op':>10} {'RSS max':>9}")
+            for function in functions:
+                for backend in backends:
+                    result = run_case(fixtures, backend, function, size, args)
+                    results.append(result)
+                    print(
+                        f"   {function:<16} {backend:<7} {result['ops']:>5} {result['us_per_op']:>9.1f} µs "
+                        f"{format_bytes(result['bytes_per_op']):>10} {result['peak_rss_mb']:>6.0f} Mo"
+                    )
+
+    entry = {
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "params": {"sizes": sizes, "ops": args.ops, "max_seconds": args.max_seconds},
+        "results": results,
+    }
+    with open(args.results, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    print(f"\n📝 Résultats ajoutés à {os.path.abspath(args.results)}")
+
+
+if __name__ == "__main__":
+    main()
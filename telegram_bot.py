@@ -1,34 +1,597 @@
+import atexit
+import bisect
+import collections
+import contextlib
+import contextvars
+import concurrent.futures
+import copy
+import functools
+import hashlib
+import hmac
+import inspect
+import itertools
 import json
+import logging
+import logging.handlers
 import os
+import pickle
+import queue
+import random
+import signal
+import sqlite3
+import threading
 import asyncio
+import sys
+import time
+import traceback
+import uuid
 from datetime import datetime
 from telegram import (
     Update,
     InlineKeyboardButton,
     InlineKeyboardMarkup,
     InputMediaPhoto,
+    Message,
 )
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter, TimedOut
+from telegram.helpers import escape_markdown
 from telegram.ext import (
     ApplicationBuilder,
+    BasePersistence,
+    BaseUpdateProcessor,
     CommandHandler,
     MessageHandler,
     CallbackQueryHandler,
     filters,
     ContextTypes,
+    ExtBot,
+    PersistenceInput,
 )
+from telegram.request import HTTPXRequest
 
 # Configuration depuis les variables d'environnement
 TOKEN = os.getenv("TELEGRAM_TOKEN", "TON_TOKEN_ICI")
 ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD", "1234")
 DATA_FILE = os.getenv("DATA_FILE", "data.json")
 USERS_FILE = os.getenv("USERS_FILE", "users.json")
+USERS_DB = os.getenv("USERS_DB", "users.db")
+MESSAGES_FILE = os.getenv("MESSAGES_FILE", "messages.jsonl")
+ADMINS_FILE = os.getenv("ADMINS_FILE", "admins.json")
+ADMIN_SESSIONS_FILE = os.getenv("ADMIN_SESSIONS_FILE", "admin_sessions.json")
+BROADCASTS_DIR = os.getenv("BROADCASTS_DIR", "broadcasts")
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "")  # serveur Bot API local (optionnel)
+
+# Mode de réception des updates : "polling" (défaut) ou "webhook"
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")  # URL publique enregistrée auprès de Telegram
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_HEALTH_PATH = os.getenv("WEBHOOK_HEALTH_PATH", "/health")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+
+# Serveur local de métriques (format texte Prometheus), 0 = désactivé.
+# Jamais servi sur le port public du webhook.
+METRICS_LISTEN = os.getenv("METRICS_LISTEN", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9464"))
+METRICS_PATH = os.getenv("METRICS_PATH", "/metrics")
+
+# Rapport des appels à l'API Bot par méthode et par flux, écrit à l'arrêt ("" = aucun)
+API_REPORT_FILE = os.getenv("API_REPORT_FILE", "api_report.json")
+
+# État des conversations (context.user_data) conservé entre les redémarrages
+STATE_DB = os.getenv("STATE_DB", "state.db")
+STATE_FLUSH_INTERVAL = float(os.getenv("STATE_FLUSH_INTERVAL", "10"))
+# États gardés en mémoire : nombre maximal et inactivité maximale (secondes, 0 = sans limite)
+STATE_MAX_USERS = int(os.getenv("STATE_MAX_USERS", "10000"))
+STATE_MAX_IDLE = float(os.getenv("STATE_MAX_IDLE", "86400"))
+STATE_SPILL = os.getenv("STATE_SPILL", "1") == "1"  # 0 = oublier l'état évincé au lieu de l'écrire
+
+# Nombre d'updates traitées en parallèle (les updates d'un même utilisateur restent dans l'ordre)
+CONCURRENT_UPDATES = int(os.getenv("CONCURRENT_UPDATES", "64"))
+
+# Surveillance de la boucle asyncio : période de mesure du retard et seuil
+# au-delà duquel la boucle est considérée bloquée (0 = désactivée)
+LOOP_WATCHDOG_INTERVAL = float(os.getenv("LOOP_WATCHDOG_INTERVAL", "0.1"))
+LOOP_STALL_THRESHOLD = float(os.getenv("LOOP_STALL_THRESHOLD", "0.25"))
+
+# Journalisation : niveau global, niveaux et échantillonnage des DEBUG par
+# sous-système (ex. LOG_LEVELS="callbacks=DEBUG,storage=WARNING",
+# LOG_SAMPLING="callbacks=0.01")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_SAMPLING = os.getenv("LOG_SAMPLING", "")
+
+
+# --- Journalisation ---
+class SamplingFilter(logging.Filter):
+    """Ne garder qu'une fraction rate des messages DEBUG (les autres niveaux passent tous)"""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+        self.dropped = 0
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG or random.random() < self.rate:
+            return True
+        self.dropped += 1
+        return False
+
+
+def parse_log_settings(value):
+    """``"callbacks=DEBUG,storage=WARNING"`` -> {"callbacks": "DEBUG", "storage": "WARNING"}"""
+    settings = {}
+    for item in value.split(","):
+        name, _, setting = item.partition("=")
+        if name.strip() and setting.strip():
+            settings[name.strip()] = setting.strip()
+    return settings
+
+
+def setup_logging():
+    """Journalisation vers stdout, écrite par un thread (QueueHandler/QueueListener).
+
+    Les handlers n'écrivent jamais eux-mêmes sur stdout : ils déposent
+    l'enregistrement dans une file, et le message n'est formaté que s'il passe
+    le niveau du logger. Chaque sous-système (bot.storage, bot.callbacks...)
+    peut avoir son propre niveau et un échantillonnage de ses messages DEBUG.
+    """
+    root = logging.getLogger("bot")
+    root.setLevel(LOG_LEVEL.upper())
+    root.propagate = False
+    for name, level in parse_log_settings(LOG_LEVELS).items():
+        logging.getLogger(f"bot.{name}").setLevel(level.upper())
+    for name, rate in parse_log_settings(LOG_SAMPLING).items():
+        logging.getLogger(f"bot.{name}").addFilter(SamplingFilter(float(rate)))
+    
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(name)s] %(message)s"))
+    records = queue.SimpleQueue()
+    root.addHandler(logging.handlers.QueueHandler(records))
+    listener = logging.handlers.QueueListener(records, stream, respect_handler_level=True)
+    listener.start()
+    # Vider la file à la sortie du programme
+    atexit.register(listener.stop)
+    return listener
+
+
+setup_logging()
+bot_log = logging.getLogger("bot")
+storage_log = logging.getLogger("bot.storage")
+callbacks_log = logging.getLogger("bot.callbacks")
+messages_log = logging.getLogger("bot.messages")
+broadcast_log = logging.getLogger("bot.broadcast")
+server_log = logging.getLogger("bot.server")
+loop_log = logging.getLogger("bot.loop")
+
+
+# --- Mesure des temps d'attente (verrous, files par utilisateur) ---
+class WaitStats:
+    """Nombre d'attentes, attente moyenne et maximale"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def stats(self):
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            "max_ms": round(self.max * 1000, 3),
+        }
+
+
+# --- Histogrammes de latence (handlers, routes, API Bot) ---
+class LatencyHistogram:
+    """Histogramme à buckets fixes (en secondes), comme ceux de Prometheus"""
+
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKETS) + 1)  # dernier bucket : +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.errors = 0
+
+    def observe(self, seconds, error=False):
+        self.counts[bisect.bisect_left(self.BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        if error:
+            self.errors += 1
+
+    def quantile(self, q):
+        """Borne haute du bucket qui contient le quantile q (estimation)"""
+        rank = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.BUCKETS + (float("inf"),), self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return bound
+        return float("inf")
+
+
+class Metrics:
+    """Histogrammes de latence et erreurs par handler, route de callback et méthode de l'API Bot"""
+
+    FAMILIES = {
+        "handler": ("bot_handler", "handlers PTB", "handler"),
+        "route": ("bot_callback_route", "routes de callback", "route"),
+        "api": ("bot_api_request", "appels à l'API Bot", "method"),
+        "loop": ("bot_event_loop_lag", "retards de la boucle asyncio (erreurs : blocages)", "loop"),
+        "stall": ("bot_event_loop_stall", "blocages de la boucle asyncio", "flow"),
+    }
+
+    def __init__(self):
+        self._histograms = {family: {} for family in self.FAMILIES}
+
+    def observe(self, family, label, seconds, error=False):
+        histograms = self._histograms[family]
+        histogram = histograms.get(label)
+        if histogram is None:
+            histogram = histograms[label] = LatencyHistogram()
+        histogram.observe(seconds, error)
+
+    @contextlib.contextmanager
+    def timed(self, family, label):
+        start = time.perf_counter()
+        error = False
+        try:
+            yield
+        except Exception:
+            error = True
+            raise
+        finally:
+            self.observe(family, label, time.perf_counter() - start, error)
+
+    def summary(self, family, limit=10):
+        """(label, appels, p50, p99, erreurs) triés par temps total décroissant"""
+        histograms = sorted(self._histograms[family].items(), key=lambda item: item[1].sum, reverse=True)
+        return [
+            (label, h.count, h.quantile(0.5), h.quantile(0.99), h.errors)
+            for label, h in histograms[:limit]
+        ]
+
+    @staticmethod
+    def _escape(label):
+        return label.replace("\\", "\\\\").replace('"', '\\"')
+
+    def render_prometheus(self):
+        """Toutes les mesures au format texte de Prometheus"""
+        lines = []
+        for family, (name, description, label_name) in self.FAMILIES.items():
+            histograms = sorted(self._histograms[family].items())
+            lines.append(f"# HELP {name}_seconds Durée des {description}")
+            lines.append(f"# TYPE {name}_seconds histogram")
+            for label, h in histograms:
+                label = self._escape(label)
+                cumulative = 0
+                for bound, count in zip(h.BUCKETS, h.counts):
+                    cumulative += count
+                    lines.append(f'{name}_seconds_bucket{{{label_name}="{label}",le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_seconds_bucket{{{label_name}="{label}",le="+Inf"}} {h.count}')
+                lines.append(f'{name}_seconds_sum{{{label_name}="{label}"}} {h.sum:.6f}')
+                lines.append(f'{name}_seconds_count{{{label_name}="{label}"}} {h.count}')
+            lines.append(f"# HELP {name}_errors_total Erreurs des {description}")
+            lines.append(f"# TYPE {name}_errors_total counter")
+            for label, h in histograms:
+                label = self._escape(label)
+                lines.append(f'{name}_errors_total{{{label_name}="{label}"}} {h.errors}')
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+def instrumented(callback):
+    """Décorateur : mesurer la durée, les erreurs et les appels à l'API d'un handler PTB"""
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        with metrics.timed("handler", callback.__name__), api_flow(callback.__name__):
+            return await callback(update, context)
+    return wrapper
+
+
+# --- Comptabilité des appels à l'API Bot ---
+# Flux (handler ou route de callback) à l'origine des appels en cours
+api_origin = contextvars.ContextVar("api_origin", default="<hors handler>")
+# Appels faits pendant le traitement de l'update en cours (ApiUsage)
+api_usage = contextvars.ContextVar("api_usage", default=None)
+# Flux ouverts par tâche asyncio (handler puis route) : lisibles depuis un
+# autre thread, contrairement aux contextvars (voir LoopWatchdog)
+task_flows = {}
+
+
+class ApiUsage:
+    """Appels à l'API faits pour une update ; flow est le flux le plus précis traversé"""
+
+    def __init__(self):
+        self.calls = 0
+        self.flow = None
+
+
+@contextlib.contextmanager
+def api_flow(label):
+    """Attribuer au flux label les appels à l'API faits dans ce bloc.
+
+    Le premier bloc ouvert pour une update (le handler) compte les appels de
+    toute l'update ; un bloc imbriqué (route de callback, admin_actions...)
+    précise seulement le flux auquel ce total est attribué, s'il a fait au
+    moins un appel (check_password, appelé pour chaque texte, n'en fait pas).
+    """
+    origin_token = api_origin.set(label)
+    usage = api_usage.get()
+    usage_token = None
+    if usage is None:
+        usage = ApiUsage()
+        usage_token = api_usage.set(usage)
+    previous_flow, calls_before = usage.flow, usage.calls
+    usage.flow = label
+    task = asyncio.current_task()
+    task_flows.setdefault(task, []).append(label)
+    try:
+        yield
+    finally:
+        api_origin.reset(origin_token)
+        flows = task_flows[task]
+        flows.pop()
+        if not flows:
+            del task_flows[task]
+        if usage_token is not None:
+            api_usage.reset(usage_token)
+            api_accounting.record_update(usage.flow, usage.calls)
+        elif usage.calls == calls_before:
+            usage.flow = previous_flow
+
+
+@contextlib.contextmanager
+def background_flow(label=None):
+    """Appels d'une tâche d'arrière-plan (diffusion, récapitulatif, redessin différé).
+
+    La tâche hérite des contextvars du handler qui l'a lancée, dont l'ApiUsage
+    de son update : ses appels ne doivent pas compter dans les appels par
+    update. label remplace le flux d'origine (sinon, celui du handler reste).
+    """
+    usage_token = api_usage.set(None)
+    origin_token = api_origin.set(label) if label else None
+    try:
+        yield
+    finally:
+        if origin_token is not None:
+            api_origin.reset(origin_token)
+        api_usage.reset(usage_token)
+
+
+class ApiAccounting:
+    """Appels à l'API Bot par méthode et flux d'origine (nombre, durée, erreurs, reprises),
+    et nombre d'appels par update pour chaque flux"""
+
+    def __init__(self):
+        self.calls = {}  # (méthode, flux) -> statistiques
+        self.updates = {}  # flux -> [updates, appels, maximum par update]
+
+    def _entry(self, method, origin):
+        entry = self.calls.get((method, origin))
+        if entry is None:
+            entry = self.calls[(method, origin)] = {
+                "calls": 0, "seconds": 0.0, "errors": collections.Counter(), "retries": 0,
+            }
+        return entry
+
+    def record(self, method, seconds, error=None):
+        entry = self._entry(method, api_origin.get())
+        entry["calls"] += 1
+        entry["seconds"] += seconds
+        if error is not None:
+            entry["errors"][error] += 1
+        usage = api_usage.get()
+        if usage is not None:
+            usage.calls += 1
+        metrics.observe("api", method, seconds, error is not None)
+
+    def retry(self, method):
+        """Noter qu'un appel va être refait (RetryAfter, erreur réseau)"""
+        self._entry(method, api_origin.get())["retries"] += 1
+
+    def record_update(self, flow, calls):
+        entry = self.updates.get(flow)
+        if entry is None:
+            entry = self.updates[flow] = [0, 0, 0]
+        entry[0] += 1
+        entry[1] += calls
+        entry[2] = max(entry[2], calls)
+
+    def flows(self, limit=None):
+        """(flux, updates, appels par update en moyenne, maximum), les plus coûteux d'abord"""
+        flows = [
+            (flow, updates, calls / updates, most)
+            for flow, (updates, calls, most) in self.updates.items()
+        ]
+        flows.sort(key=lambda item: item[2], reverse=True)
+        return flows[:limit]
+
+    def report(self):
+        methods = [
+            {
+                "method": method,
+                "flow": origin,
+                "calls": entry["calls"],
+                "avg_ms": round(entry["seconds"] / entry["calls"] * 1000, 3) if entry["calls"] else 0.0,
+                "errors": dict(entry["errors"]),
+                "retries": entry["retries"],
+            }
+            for (method, origin), entry in self.calls.items()
+        ]
+        methods.sort(key=lambda item: item["calls"], reverse=True)
+        flows = [
+            {"flow": flow, "updates": updates, "calls_per_update": round(average, 2), "max_calls": most}
+            for flow, updates, average, most in self.flows()
+        ]
+        return {"methods": methods, "flows": flows}
+
+    def write_report(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, ensure_ascii=False, indent=2)
+
+
+api_accounting = ApiAccounting()
+
+
+class InstrumentedRequest(HTTPXRequest):
+    """Couche HTTP de PTB : chaque appel à l'API Bot est compté et chronométré"""
+
+    async def post(self, url, request_data=None, *args, **kwargs):
+        method = url.rsplit("/", 1)[-1]
+        start = time.perf_counter()
+        error = None
+        try:
+            return await super().post(url, request_data, *args, **kwargs)
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            api_accounting.record(method, time.perf_counter() - start, error)
+
+
+# --- Persistance différée (write-behind) ---
+class WriteBehind:
+    """Regroupe les sauvegardes JSON et les écrit depuis un thread d'arrière-plan.
+
+    schedule() prend un instantané sérialisé de l'objet et marque le fichier
+    comme modifié ; seul le dernier instantané de chaque fichier est écrit, au
+    plus tard debounce secondes après la première modification. L'écriture passe
+    par un fichier temporaire puis os.replace, pour qu'un arrêt brutal ne laisse
+    jamais un fichier tronqué.
+    """
+
+    def __init__(self, debounce=0.5):
+        self.debounce = debounce
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._dirty = {}  # chemin -> (contenu sérialisé, nombre d'écritures regroupées)
+        self._inflight = {}  # instantanés en cours d'écriture
+        self._written_mtime = {}
+        self._closed = False
+        self.flushes = 0
+        self.writes = 0
+        self.coalesced = 0
+        self.last_latency = 0.0
+        self.max_latency = 0.0
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+
+    def schedule(self, path, obj, indent=None):
+        payload = json.dumps(obj, ensure_ascii=False, indent=indent)
+        with self._cond:
+            _, count = self._dirty.get(path, (None, 0))
+            self._dirty[path] = (payload, count + 1)
+            self._cond.notify()
+
+    def pending(self, path):
+        """Contenu pas encore écrit sur le disque pour ce fichier (ou None)"""
+        with self._cond:
+            entry = self._dirty.get(path) or self._inflight.get(path)
+        return entry[0] if entry else None
+
+    def written_mtime(self, path):
+        """mtime du fichier après notre dernière écriture"""
+        return self._written_mtime.get(path)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._dirty and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+            # Laisser les écritures suivantes se regrouper
+            time.sleep(self.debounce)
+            self.flush()
+
+    def flush(self):
+        """Écrire tous les fichiers modifiés"""
+        with self._flush_lock:
+            with self._cond:
+                batch, self._dirty = self._dirty, {}
+                self._inflight = dict(batch)
+            for path, (payload, count) in batch.items():
+                self._write(path, payload, count)
+                with self._cond:
+                    self._inflight.pop(path, None)
+
+    def _write(self, path, payload, count):
+        start = time.perf_counter()
+        try:
+            write_atomic(path, payload)
+            self._written_mtime[path] = os.stat(path).st_mtime_ns
+        except OSError as e:
+            storage_log.error("Erreur lors de l'écriture de %s: %s", path, e)
+            with self._cond:
+                # Réessayer au prochain passage sauf si un instantané plus récent existe
+                if path not in self._dirty:
+                    self._dirty[path] = (payload, count)
+                    self._cond.notify()
+            return
+        latency = time.perf_counter() - start
+        self.flushes += 1
+        self.writes += count
+        self.coalesced += count - 1
+        self.last_latency = latency
+        self.max_latency = max(self.max_latency, latency)
+        storage_log.debug("💾 %s écrit en %.1f ms (%s sauvegarde(s) regroupée(s))", path, latency * 1000, count)
+
+    def stats(self):
+        return {
+            "flushes": self.flushes,
+            "writes": self.writes,
+            "coalesced": self.coalesced,
+            "last_latency_ms": round(self.last_latency * 1000, 3),
+            "max_latency_ms": round(self.max_latency * 1000, 3),
+            "pending": len(self._dirty),
+        }
+
+    def close(self):
+        """Écriture finale à l'arrêt du bot"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self.flush()
+        self._thread.join(timeout=5)
+
+
+def write_atomic(path, payload):
+    """Écrire un fichier via un fichier temporaire et os.replace"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def load_json(path):
+    """Lire un fichier JSON en tenant compte d'une sauvegarde encore en attente"""
+    payload = persistence.pending(path)
+    if payload is not None:
+        return json.loads(payload)
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+persistence = WriteBehind(debounce=float(os.getenv("PERSIST_DEBOUNCE", "0.5")))
 
 
 # --- Charger les données depuis le fichier JSON ---
 def load_data():
     try:
-        with open(DATA_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return load_json(DATA_FILE)
     except FileNotFoundError:
         data = {
             "contact": "📞 Contactez-nous : contact@monentreprise.com\nTéléphone : +33 6 12 34 56 78",
@@ -41,40 +604,729 @@ def load_data():
 
 
 def save_data(data):
-    with open(DATA_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=4, ensure_ascii=False)
+    persistence.schedule(DATA_FILE, data, indent=4)
+
+
+# --- Surveillance des fichiers modifiés en dehors du bot ---
+class FileWatch:
+    """Détecte (au plus une fois par interval secondes) les modifications
+    d'un fichier qui ne viennent pas de nos propres sauvegardes différées."""
+
+    def __init__(self, path, interval=1.0):
+        self.path = path
+        self.interval = interval
+        self._mtime = None
+        self._last_check = 0.0
+
+    def _file_mtime(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def mark(self):
+        """Mémoriser l'état actuel du fichier"""
+        self._mtime = self._file_mtime()
+        self._last_check = time.monotonic()
+
+    def changed(self):
+        now = time.monotonic()
+        if now - self._last_check < self.interval:
+            return False
+        self._last_check = now
+        mtime = self._file_mtime()
+        if mtime == self._mtime or persistence.pending(self.path) is not None:
+            return False
+        if mtime == persistence.written_mtime(self.path):
+            # Fichier écrit par notre propre sauvegarde différée
+            self._mtime = mtime
+            return False
+        return True
+
+
+# --- Contenu en mémoire ---
+class ContentStore:
+    """Garde le contenu de data.json en mémoire avec un compteur de version.
+
+    Chaque modification passe par save(), qui écrit le fichier et incrémente
+    la version. Si check_mtime est actif, get() vérifie (au plus une fois par
+    mtime_interval secondes) la date de modification du fichier pour prendre
+    en compte les éditions faites en dehors du bot. Les handlers modifient le
+    contenu dans un bloc ``async with content_store.edit() as data`` : le
+    contenu est relu sous verrou puis sauvegardé, si bien que deux updates
+    traitées en parallèle ne peuvent pas écraser la modification de l'autre.
+    """
+
+    def __init__(self, path, check_mtime=True, mtime_interval=1.0):
+        self.path = path
+        self.check_mtime = check_mtime
+        self.version = 0
+        self._data = None
+        self._watch = FileWatch(path, mtime_interval)
+        self._lock = asyncio.Lock()
+        self.lock_wait = WaitStats()
+
+    def reload(self):
+        """Relire le fichier et incrémenter la version"""
+        self._data = load_data()
+        self._watch.mark()
+        self.version += 1
+        return self._data
+
+    def get(self):
+        """Retourner le contenu courant (relu seulement si le fichier a changé)"""
+        if self._data is None:
+            return self.reload()
+        if self.check_mtime and self._watch.changed():
+            storage_log.info("📄 data.json modifié en dehors du bot, rechargement")
+            return self.reload()
+        return self._data
+
+    def save(self, data=None):
+        """Enregistrer le contenu et incrémenter la version"""
+        if data is not None:
+            self._data = data
+        save_data(self._data)
+        self.version += 1
+        return self.version
+
+    @contextlib.asynccontextmanager
+    async def edit(self):
+        """Lire, modifier puis sauvegarder le contenu sous verrou (si modifié)"""
+        start = time.perf_counter()
+        async with self._lock:
+            self.lock_wait.observe(time.perf_counter() - start)
+            data = self.get()
+            before = copy.deepcopy(data)
+            yield data
+            if data != before:
+                self.save(data)
+
+# --- Claviers du menu principal ---
+def service_list(data):
+    """Liste des menus du Service (une ancienne valeur texte compte comme vide)"""
+    services = data.get("services", [])
+    if isinstance(services, str):
+        return []
+    return services
+
+
+class MenuRenderer:
+    """Construit les claviers du menu principal et des menus du Service une
+    seule fois par version du contenu, puis les réutilise pour tous les
+    utilisateurs jusqu'à la prochaine modification admin."""
+
+    def __init__(self, store):
+        self.store = store
+        self.hits = 0
+        self.rebuilds = 0
+        self._version = None
+        self._main = None
+        self._services = None
+
+    def _refresh(self):
+        self.store.get()  # prend en compte une modification extérieure du fichier
+        if self._version == self.store.version:
+            self.hits += 1
+            return
+        services = service_list(self.store.get())
+        service_rows = []
+        for i, service in enumerate(services):
+            if isinstance(service, dict):
+                service_name = service.get("name", f"Menu {i+1}")
+            else:
+                service_name = str(service)
+            service_rows.append([InlineKeyboardButton(service_name, callback_data=f"service_menu_{i}")])
+        if not service_rows:
+            # Si pas de menus, afficher un message
+            service_rows.append([InlineKeyboardButton("📋 Aucun menu disponible", callback_data="no_menus")])
+        main_rows = [
+            [InlineKeyboardButton("💼 Nos Services", callback_data="nos_services")],
+            [InlineKeyboardButton("📞 Contact", callback_data="contact")],
+            [InlineKeyboardButton("✉️ Nous Contacter", callback_data="nous_contacter")],
+        ]
+        self._main = InlineKeyboardMarkup(main_rows + service_rows)
+        self._services = InlineKeyboardMarkup(service_rows)
+        self._version = self.store.version
+        self.rebuilds += 1
+
+    def main_keyboard(self):
+        """Clavier d'accueil : boutons principaux + menus du Service"""
+        self._refresh()
+        return self._main
+
+    def service_keyboard(self):
+        """Clavier affiché sous le contenu d'un menu du Service"""
+        self._refresh()
+        return self._services
+
+    def stats(self):
+        return {"hits": self.hits, "rebuilds": self.rebuilds, "version": self._version}
+
 
 # --- Gestion des utilisateurs ---
-def load_users():
-    try:
-        with open(USERS_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return {"users": [], "messages": []}
+USER_FIELDS = ("user_id", "username", "first_name", "last_name")
+MESSAGE_FIELDS = ("user_id", "username", "first_name", "last_name", "message", "timestamp")
 
-def save_users(users_data):
-    with open(USERS_FILE, "w", encoding="utf-8") as f:
-        json.dump(users_data, f, ensure_ascii=False, indent=2)
 
-def add_user(user_id, username, first_name, last_name):
-    users_data = load_users()
-    user_info = {
-        "user_id": user_id,
-        "username": username,
-        "first_name": first_name,
-        "last_name": last_name
-    }
-    
-    # Vérifier si l'utilisateur existe déjà
-    for user in users_data["users"]:
-        if user["user_id"] == user_id:
+class UserStore:
+    """Registre des utilisateurs dans SQLite (mode WAL).
+
+    La table users a une clé primaire sur user_id : add_user() est une
+    insertion indexée au lieu d'un parcours complet de users.json. Au premier
+    démarrage, le contenu de l'ancien users.json est importé une seule fois.
+    """
+
+    def __init__(self, path, legacy_file=None):
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS users (
+                user_id INTEGER PRIMARY KEY,
+                seq INTEGER NOT NULL,
+                username TEXT,
+                first_name TEXT,
+                last_name TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_users_seq ON users(seq);
+            CREATE TABLE IF NOT EXISTS dead_recipients (
+                user_id INTEGER PRIMARY KEY,
+                reason TEXT NOT NULL,
+                since TEXT NOT NULL
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+            """
+        )
+        if legacy_file:
+            self.migrate_json(legacy_file)
+
+    def _next_seq(self):
+        row = self.conn.execute("SELECT COALESCE(MAX(seq), 0) + 1 FROM users").fetchone()
+        return row[0]
+
+    def migrate_json(self, legacy_file):
+        """Importer une seule fois les utilisateurs de l'ancien users.json"""
+        with self._lock:
+            if self.conn.execute("SELECT 1 FROM meta WHERE key = 'migrated_json'").fetchone():
+                return 0
+            if not os.path.exists(legacy_file):
+                return 0
+            try:
+                with open(legacy_file, "r", encoding="utf-8") as f:
+                    legacy = json.load(f)
+            except (OSError, ValueError) as e:
+                storage_log.error("Erreur lors de la lecture de %s: %s", legacy_file, e)
+                return 0
+            users = legacy.get("users", [])
+            self.conn.execute("BEGIN")
+            try:
+                seq = self._next_seq()
+                for user in users:
+                    cur = self.conn.execute(
+                        "INSERT OR IGNORE INTO users (user_id, seq, username, first_name, last_name) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (user["user_id"], seq, user.get("username"), user.get("first_name"), user.get("last_name")),
+                    )
+                    seq += cur.rowcount
+                self.conn.execute(
+                    "INSERT INTO meta (key, value) VALUES ('migrated_json', ?)",
+                    (str(datetime.now()),),
+                )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+            storage_log.info("📦 Migration de %s : %s utilisateurs", legacy_file, len(users))
+            return len(users)
+
+    def add_user(self, user_id, username, first_name, last_name):
+        """Ajouter un utilisateur s'il n'existe pas encore (True si ajouté)"""
+        with self._lock:
+            if self.conn.execute("SELECT 1 FROM users WHERE user_id = ?", (user_id,)).fetchone():
+                # Un /start prouve que l'utilisateur peut de nouveau recevoir nos messages
+                if self.conn.execute("DELETE FROM dead_recipients WHERE user_id = ?", (user_id,)).rowcount:
+                    storage_log.info("🔄 Utilisateur %s réactivé pour les diffusions", user_id)
+                return False
+            self.conn.execute(
+                "INSERT INTO users (user_id, seq, username, first_name, last_name) VALUES (?, ?, ?, ?, ?)",
+                (user_id, self._next_seq(), username, first_name, last_name),
+            )
+            return True
+
+    def get_user(self, user_id):
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT user_id, username, first_name, last_name FROM users WHERE user_id = ?",
+                (user_id,),
+            ).fetchone()
+        return dict(row) if row else None
+
+    def list_users(self, limit=None):
+        query = "SELECT user_id, username, first_name, last_name FROM users ORDER BY seq"
+        params = ()
+        if limit is not None:
+            query += " LIMIT ?"
+            params = (limit,)
+        with self._lock:
+            return [dict(row) for row in self.conn.execute(query, params)]
+
+    def max_seq(self):
+        with self._lock:
+            return self.conn.execute("SELECT COALESCE(MAX(seq), 0) FROM users").fetchone()[0]
+
+    def recipients(self, after_seq, upto_seq):
+        """(seq, user_id) des destinataires joignables tels que after_seq < seq <= upto_seq"""
+        with self._lock:
+            return self.conn.execute(
+                "SELECT seq, user_id FROM users WHERE seq > ? AND seq <= ? "
+                "AND user_id NOT IN (SELECT user_id FROM dead_recipients) ORDER BY seq",
+                (after_seq, upto_seq),
+            ).fetchall()
+
+    def count_recipients(self, upto_seq):
+        with self._lock:
+            return self.conn.execute(
+                "SELECT COUNT(*) FROM users WHERE seq <= ? "
+                "AND user_id NOT IN (SELECT user_id FROM dead_recipients)",
+                (upto_seq,),
+            ).fetchone()[0]
+
+    def mark_dead(self, user_id, reason):
+        """Noter un destinataire définitivement injoignable (bot bloqué, compte supprimé)"""
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO dead_recipients (user_id, reason, since) VALUES (?, ?, ?)",
+                (user_id, reason, str(datetime.now())),
+            )
+
+    def count_dead(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM dead_recipients").fetchone()[0]
+
+    def count_users(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    def take_legacy_messages(self):
+        """Retirer et retourner les messages d'une ancienne table messages"""
+        with self._lock:
+            if not self.conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'messages'"
+            ).fetchone():
+                return []
+            rows = self.conn.execute(
+                "SELECT user_id, username, first_name, last_name, message, timestamp FROM messages ORDER BY id"
+            ).fetchall()
+            self.conn.execute("DROP TABLE messages")
+        return [dict(row) for row in rows]
+
+    def replace_all(self, users):
+        """Remplacer la liste des utilisateurs"""
+        with self._lock:
+            self.conn.execute("BEGIN")
+            try:
+                self.conn.execute("DELETE FROM users")
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO users (user_id, seq, username, first_name, last_name) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (user["user_id"], seq, user.get("username"), user.get("first_name"), user.get("last_name"))
+                        for seq, user in enumerate(users, 1)
+                    ],
+                )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+# --- Journal des messages reçus ---
+class MessageJournal:
+    """Journal append-only (JSONL) des messages reçus.
+
+    Chaque ligne est un enregistrement : {"op": "add", "id": ...} pour un
+    message, {"op": "del", "ids": [...]} pour une suppression et
+    {"op": "clear", "upto": ...} pour tout vider ; {"op": "seq", "next": ...}
+    conserve le compteur d'ids après une compaction. Un index en mémoire
+    (id -> position dans le fichier) permet de relire les N derniers messages
+    sans parcourir tout l'historique ; des listes triées des ids non supprimés
+    (globale, par utilisateur, avec l'heure de réception) servent à la
+    pagination par curseur de page(). Les fsync sont regroupés (tous les
+    fsync_batch ajouts ou toutes les fsync_interval secondes) et le fichier est
+    compacté en arrière-plan quand les suppressions s'accumulent.
+    """
+
+    def __init__(self, path, fsync_interval=1.0, fsync_batch=50, cache_size=100, compact_min=1000):
+        self.path = path
+        self.fsync_interval = fsync_interval
+        self.fsync_batch = fsync_batch
+        self.cache_size = cache_size
+        self.compact_min = compact_min
+        self.is_new = not os.path.exists(path)
+        self.tombstones = 0
+        self.compactions = 0
+        self._lock = threading.RLock()
+        self._offsets = {}  # id -> (position, longueur), dans l'ordre d'arrivée
+        self._ids = []  # ids triés des messages non supprimés
+        self._times = []  # heure de réception (epoch) de chaque id de _ids, croissante
+        self._by_user = collections.defaultdict(list)  # user_id -> ids triés
+        self._users = {}  # id -> user_id, pour retirer l'id de _by_user à la suppression
+        self._cache = collections.OrderedDict()  # derniers messages déjà décodés
+        self._next_id = 1
+        self._pending = 0
+        self._compacting = False
+        self._load()
+        self._file = open(path, "ab")
+        self._stop = threading.Event()
+        self._sync_thread = threading.Thread(target=self._sync_loop, name="journal-fsync", daemon=True)
+        self._sync_thread.start()
+
+    # Lecture du journal au démarrage
+    def _load(self):
+        if self.is_new:
             return
-    
-    users_data["users"].append(user_info)
-    save_users(users_data)
+        position = 0
+        valid_end = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                length = len(line)
+                if not line.endswith(b"\n"):
+                    break  # ligne incomplète (arrêt pendant une écriture)
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    storage_log.warning("Ligne illisible dans %s à la position %s", self.path, position)
+                    position += length
+                    valid_end = position
+                    continue
+                self._apply(record, position, length)
+                position += length
+                valid_end = position
+        if valid_end < os.path.getsize(self.path):
+            with open(self.path, "r+b") as f:
+                f.truncate(valid_end)
+        self._reindex()
+
+    def _apply(self, record, position, length):
+        op = record.get("op")
+        if op == "add":
+            self._offsets[record["id"]] = (position, length)
+            self._next_id = max(self._next_id, record["id"] + 1)
+            self._index(record)
+        elif op == "del":
+            for msg_id in record.get("ids", []):
+                if self._offsets.pop(msg_id, None) is not None:
+                    self.tombstones += 1
+        elif op == "seq":
+            self._next_id = max(self._next_id, record["next"])
+        elif op == "clear":
+            upto = record.get("upto", self._next_id - 1)
+            for msg_id in [i for i in self._offsets if i <= upto]:
+                del self._offsets[msg_id]
+                self.tombstones += 1
+
+    @staticmethod
+    def _epoch(timestamp):
+        try:
+            return datetime.fromisoformat(str(timestamp).replace("Z", "+00:00")).timestamp()
+        except ValueError:
+            return None
+
+    def _index(self, record):
+        # L'heure indexée ne recule jamais : les ids restent triés par date
+        epoch = self._epoch(record.get("timestamp"))
+        last = self._times[-1] if self._times else 0.0
+        self._ids.append(record["id"])
+        self._times.append(last if epoch is None else max(last, epoch))
+        self._by_user[record.get("user_id")].append(record["id"])
+        self._users[record["id"]] = record.get("user_id")
+
+    def _reindex(self):
+        """Retirer des listes d'ids les messages supprimés"""
+        live = [(msg_id, t) for msg_id, t in zip(self._ids, self._times) if msg_id in self._offsets]
+        self._ids = [msg_id for msg_id, _ in live]
+        self._times = [t for _, t in live]
+        self._users = {msg_id: user_id for msg_id, user_id in self._users.items() if msg_id in self._offsets}
+        for user_id in list(self._by_user):
+            ids = [msg_id for msg_id in self._by_user[user_id] if msg_id in self._offsets]
+            if ids:
+                self._by_user[user_id] = ids
+            else:
+                del self._by_user[user_id]
+
+    REINDEX_MIN = 64  # au-delà, reconstruire les listes plutôt que d'en retirer les ids un par un
+
+    def _unindex(self, removed):
+        """Retirer des listes d'ids des messages qui viennent d'être supprimés"""
+        if len(removed) > self.REINDEX_MIN:
+            self._reindex()
+            return
+        for msg_id in removed:
+            i = bisect.bisect_left(self._ids, msg_id)
+            if i < len(self._ids) and self._ids[i] == msg_id:
+                del self._ids[i]
+                del self._times[i]
+            user_id = self._users.pop(msg_id, None)
+            ids = self._by_user.get(user_id)
+            if ids is not None:
+                i = bisect.bisect_left(ids, msg_id)
+                if i < len(ids) and ids[i] == msg_id:
+                    del ids[i]
+                if not ids:
+                    del self._by_user[user_id]
+
+    @staticmethod
+    def _to_message(record):
+        message = {field: record.get(field) for field in MESSAGE_FIELDS}
+        message["id"] = record["id"]
+        return message
+
+    def _write(self, record):
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        position = self._file.tell()
+        self._file.write(line)
+        self._file.flush()
+        self._pending += 1
+        if self._pending >= self.fsync_batch:
+            self._sync_locked()
+        return position, len(line)
+
+    def _sync_locked(self):
+        if self._pending:
+            os.fsync(self._file.fileno())
+            self._pending = 0
+
+    def _sync_loop(self):
+        while not self._stop.wait(self.fsync_interval):
+            self.sync()
+
+    def sync(self):
+        with self._lock:
+            if not self._file.closed:
+                self._sync_locked()
+
+    # Écriture
+    def append(self, message_info):
+        """Ajouter un message et retourner son id"""
+        with self._lock:
+            msg_id = self._next_id
+            self._next_id += 1
+            record = {"op": "add", "id": msg_id}
+            record.update({field: message_info.get(field) for field in MESSAGE_FIELDS})
+            self._offsets[msg_id] = self._write(record)
+            self._index(record)
+            self._cache[msg_id] = self._to_message(record)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            return msg_id
+
+    def delete(self, ids):
+        """Supprimer des messages par id (pierre tombale dans le journal)"""
+        with self._lock:
+            removed = [msg_id for msg_id in ids if msg_id in self._offsets]
+            if not removed:
+                return 0
+            self._write({"op": "del", "ids": removed})
+            for msg_id in removed:
+                del self._offsets[msg_id]
+                self._cache.pop(msg_id, None)
+            self._unindex(removed)
+            self.tombstones += len(removed)
+        self._maybe_compact()
+        return len(removed)
+
+    def clear(self):
+        """Supprimer tous les messages et retourner leur nombre"""
+        with self._lock:
+            count = len(self._offsets)
+            if not count:
+                return 0
+            self._write({"op": "clear", "upto": self._next_id - 1})
+            self._offsets.clear()
+            self._cache.clear()
+            self._reindex()
+            self.tombstones += count
+        self._maybe_compact()
+        return count
+
+    def import_messages(self, messages):
+        for message_info in messages:
+            self.append(message_info)
+        self.sync()
+        return len(messages)
+
+    # Lecture
+    def count(self):
+        return len(self._offsets)
+
+    def _read(self, f, msg_id):
+        message = self._cache.get(msg_id)
+        if message is not None:
+            return message
+        position, length = self._offsets[msg_id]
+        f.seek(position)
+        return self._to_message(json.loads(f.read(length)))
+
+    def recent(self, n):
+        """Les n derniers messages (du plus ancien au plus récent)"""
+        with self._lock:
+            ids = list(itertools.islice(reversed(self._offsets), n))
+            ids.reverse()
+            if all(msg_id in self._cache for msg_id in ids):
+                return [self._cache[msg_id] for msg_id in ids]
+            with open(self.path, "rb") as f:
+                return [self._read(f, msg_id) for msg_id in ids]
+
+    def list(self):
+        """Tous les messages, dans l'ordre d'arrivée"""
+        with self._lock:
+            with open(self.path, "rb") as f:
+                return [self._read(f, msg_id) for msg_id in self._offsets]
+
+    def _id_bound(self, epoch, right=False):
+        # Premier id reçu à partir de epoch (après epoch si right)
+        i = (bisect.bisect_right if right else bisect.bisect_left)(self._times, epoch)
+        return self._ids[i] if i < len(self._ids) else self._next_id
+
+    def page(self, limit=10, before=None, after=None, user_id=None, since=None, until=None):
+        """Une page de messages, du plus ancien au plus récent.
+
+        Sans curseur, c'est la page la plus récente. before=<id> donne la page
+        précédant cet id, after=<id> celle qui le suit. user_id, since et until
+        (datetime, bornes incluses) filtrent les messages avec les mêmes
+        curseurs. Retourne {"messages", "older", "newer"} : older/newer sont
+        les curseurs des pages voisines, ou None s'il n'y en a pas.
+        """
+        with self._lock:
+            ids = self._ids if user_id is None else self._by_user.get(user_id, [])
+            # Bornes du filtre, puis bornes du curseur à l'intérieur du filtre
+            first, last = 0, len(ids)
+            if since is not None:
+                first = bisect.bisect_left(ids, self._id_bound(since.timestamp()))
+            if until is not None:
+                last = max(first, bisect.bisect_left(ids, self._id_bound(until.timestamp(), right=True)))
+            lo, hi = first, last
+            if before is not None:
+                hi = max(lo, min(hi, bisect.bisect_left(ids, before)))
+            if after is not None:
+                lo = min(hi, max(lo, bisect.bisect_right(ids, after)))
+            # Les listes ne contiennent que des ids vivants : une page coûte O(limit)
+            if after is not None:
+                page_ids = ids[lo:min(hi, lo + limit)]
+                older = page_ids[0] if page_ids and lo > first else None
+                newer = page_ids[-1] if hi - lo > limit else None
+            else:
+                page_ids = ids[max(lo, hi - limit):hi]
+                older = page_ids[0] if hi - lo > limit else None
+                newer = page_ids[-1] if page_ids and hi < last else None
+            with open(self.path, "rb") as f:
+                messages = [self._read(f, msg_id) for msg_id in page_ids]
+        return {"messages": messages, "older": older, "newer": newer}
+
+    # Compaction
+    def _maybe_compact(self):
+        with self._lock:
+            if self._compacting:
+                return
+            if self.tombstones < max(self.compact_min, len(self._offsets)):
+                return
+            self._compacting = True
+        threading.Thread(target=self._compact, name="journal-compact", daemon=True).start()
+
+    def _compact(self):
+        """Réécrire le journal sans les messages supprimés"""
+        tmp_path = self.path + ".tmp"
+        try:
+            with self._lock:
+                self._file.flush()
+                snapshot = list(self._offsets.items())
+                snapshot_end = self._file.tell()
+                snapshot_tombstones = self.tombstones
+                next_id = self._next_id
+            new_offsets = {}
+            with open(self.path, "rb") as src, open(tmp_path, "wb") as dst:
+                dst.write((json.dumps({"op": "seq", "next": next_id}) + "\n").encode("utf-8"))
+                # Copie des messages vivants sans bloquer les nouveaux ajouts
+                for msg_id, (position, length) in snapshot:
+                    src.seek(position)
+                    new_offsets[msg_id] = (dst.tell(), length)
+                    dst.write(src.read(length))
+                with self._lock:
+                    # Enregistrements ajoutés pendant la copie
+                    self._file.flush()
+                    src.seek(snapshot_end)
+                    base = dst.tell()
+                    dst.write(src.read())
+                    dst.flush()
+                    os.fsync(dst.fileno())
+                    offsets = {}
+                    for msg_id, (position, length) in self._offsets.items():
+                        if msg_id in new_offsets:
+                            offsets[msg_id] = new_offsets[msg_id]
+                        else:
+                            offsets[msg_id] = (base + position - snapshot_end, length)
+                    self._file.close()
+                    os.replace(tmp_path, self.path)
+                    self._file = open(self.path, "ab")
+                    self._pending = 0
+                    self._offsets = offsets
+                    self._reindex()
+                    self.tombstones -= snapshot_tombstones
+                    self.compactions += 1
+        except Exception as e:
+            storage_log.error("Erreur lors de la compaction de %s: %s", self.path, e)
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+        finally:
+            with self._lock:
+                self._compacting = False
+
+    def close(self):
+        self._stop.set()
+        with self._lock:
+            if not self._file.closed:
+                self._sync_locked()
+                self._file.close()
+
+
+user_store = UserStore(USERS_DB, legacy_file=USERS_FILE)
+message_journal = MessageJournal(MESSAGES_FILE)
+if message_journal.is_new:
+    # Reprise des messages de l'ancien stockage (users.json ou table SQLite)
+    legacy_messages = user_store.take_legacy_messages()
+    if not legacy_messages and os.path.exists(USERS_FILE):
+        try:
+            with open(USERS_FILE, "r", encoding="utf-8") as f:
+                legacy_messages = json.load(f).get("messages", [])
+        except (OSError, ValueError) as e:
+            storage_log.error("Erreur lors de la lecture de %s: %s", USERS_FILE, e)
+    if legacy_messages:
+        message_journal.import_messages(legacy_messages)
+        storage_log.info("📦 Migration de %s messages vers %s", len(legacy_messages), MESSAGES_FILE)
+
+
+def load_users():
+    """Tous les utilisateurs et messages, au format {"users": [...], "messages": [...]} (lecture seule)"""
+    return {"users": user_store.list_users(), "messages": message_journal.list()}
+
+def add_user(user_id, username, first_name, last_name):
+    return user_store.add_user(user_id, username, first_name, last_name)
 
 def add_message(user_id, username, first_name, last_name, message_text, timestamp):
-    users_data = load_users()
     message_info = {
         "user_id": user_id,
         "username": username,
@@ -83,14 +1335,16 @@ def add_message(user_id, username, first_name, last_name, message_text, timestam
         "message": message_text,
         "timestamp": timestamp
     }
-    users_data["messages"].append(message_info)
-    save_users(users_data)
+    return message_journal.append(message_info)
 
 
 
 
-data = load_data()
-admins = set()  # liste des ID admins connectés
+content_store = ContentStore(
+    DATA_FILE,
+    check_mtime=os.getenv("CONTENT_MTIME_CHECK", "1") != "0",
+)
+menu_renderer = MenuRenderer(content_store)
 
 # --- Système de rôles ---
 ROLES = {
@@ -99,28 +1353,125 @@ ROLES = {
     "STAFF": 1       # Niveau basique
 }
 
+
+class RoleRegistry:
+    """Rôles des administrateurs gardés en mémoire.
+
+    admins.json est lu une seule fois puis relu seulement après une
+    modification extérieure du fichier ; les vérifications de permission sont
+    de simples lectures de dictionnaire. Le registre conserve aussi les
+    sessions admin ouvertes (admin_sessions.json) pour qu'elles survivent
+    à un redémarrage.
+    """
+
+    def __init__(self, path, sessions_path, mtime_interval=1.0):
+        self.path = path
+        self.sessions_path = sessions_path
+        self.reloads = 0
+        self._lock = asyncio.Lock()
+        self.lock_wait = WaitStats()
+        self._admins = None
+        self._levels = {}
+        self._watch = FileWatch(path, mtime_interval)
+        self.sessions = self._load_sessions()
+
+    def _load_sessions(self):
+        try:
+            return set(load_json(self.sessions_path))
+        except FileNotFoundError:
+            return set()
+        except (OSError, ValueError) as e:
+            storage_log.error("Erreur lors de la lecture de %s: %s", self.sessions_path, e)
+            return set()
+
+    def _set(self, admins_data):
+        self._admins = admins_data
+        self._levels = {
+            admin_id: ROLES.get(info.get("role", "STAFF"), 0)
+            for admin_id, info in admins_data.items()
+        }
+
+    def reload(self):
+        try:
+            admins_data = load_json(self.path)
+        except FileNotFoundError:
+            admins_data = {}
+        except (OSError, ValueError) as e:
+            storage_log.error("Erreur lors de la lecture de %s: %s", self.path, e)
+            admins_data = {}
+        self._watch.mark()
+        self._set(admins_data)
+        self.reloads += 1
+
+    def _current(self):
+        if self._admins is None or self._watch.changed():
+            self.reload()
+        return self._admins
+
+    def all(self):
+        """Copie de la liste des administrateurs (modifiable puis save())"""
+        return copy.deepcopy(self._current())
+
+    def save(self, admins_data):
+        persistence.schedule(self.path, admins_data, indent=2)
+        self._set(copy.deepcopy(admins_data))
+
+    @contextlib.asynccontextmanager
+    async def edit(self):
+        """Lire, modifier puis sauvegarder les administrateurs sous verrou (si modifiés)"""
+        start = time.perf_counter()
+        async with self._lock:
+            self.lock_wait.observe(time.perf_counter() - start)
+            admins_data = self.all()
+            yield admins_data
+            if admins_data != self._admins:
+                self.save(admins_data)
+
+    def level(self, user_id):
+        self._current()
+        return self._levels.get(str(user_id), ROLES["STAFF"])
+
+    def role(self, user_id):
+        return self._current().get(str(user_id), {}).get("role", "STAFF")
+
+    def members(self, min_role="STAFF"):
+        """ID des administrateurs (admins.json et sessions ouvertes) ayant au moins min_role"""
+        admin_ids = {int(admin_id) for admin_id in self._current()} | self.sessions
+        return sorted(admin_id for admin_id in admin_ids if self.level(admin_id) >= ROLES.get(min_role, 0))
+
+    # Sessions admin (utilisateurs connectés avec le mot de passe)
+    def _save_sessions(self):
+        persistence.schedule(self.sessions_path, sorted(self.sessions))
+
+    def login(self, user_id):
+        if user_id not in self.sessions:
+            self.sessions.add(user_id)
+            self._save_sessions()
+
+    def logout(self, user_id):
+        if user_id in self.sessions:
+            self.sessions.discard(user_id)
+            self._save_sessions()
+
+
+role_registry = RoleRegistry(ADMINS_FILE, ADMIN_SESSIONS_FILE)
+admins = role_registry.sessions  # liste des ID admins connectés
+
 def load_admins():
-    """Charger la liste des administrateurs depuis le fichier"""
-    try:
-        with open("admins.json", "r", encoding="utf-8") as f:
-            return json.load(f)
-    except:
-        return {}
+    """Charger la liste des administrateurs (depuis le registre en mémoire)"""
+    return role_registry.all()
 
 def save_admins(admins_data):
     """Sauvegarder la liste des administrateurs"""
-    with open("admins.json", "w", encoding="utf-8") as f:
-        json.dump(admins_data, f, ensure_ascii=False, indent=2)
+    role_registry.save(admins_data)
 
 def get_user_role(user_id):
     """Obtenir le rôle d'un utilisateur"""
-    admins_data = load_admins()
-    return admins_data.get(str(user_id), {}).get("role", "STAFF")
+    return role_registry.role(user_id)
 
 def has_permission(user_id, required_role):
     """Vérifier si un utilisateur a la permission requise"""
-    user_role = get_user_role(user_id)
-    return ROLES.get(user_role, 0) >= ROLES.get(required_role, 0)
+    return role_registry.level(user_id) >= ROLES.get(required_role, 0)
 
 def is_chef(user_id):
     """Vérifier si l'utilisateur est chef"""
@@ -130,25 +1481,97 @@ def is_admin_or_higher(user_id):
     """Vérifier si l'utilisateur est admin ou plus"""
     return has_permission(user_id, "ADMIN")
 
-async def update_message_display(query, context):
-    """Mettre à jour l'affichage des messages avec les sélections"""
-    try:
-        users_data = load_users()
-        messages = users_data.get("messages", [])
-        recent_messages = messages[-10:]
-        selected_messages = context.user_data.get("selected_messages", [])
-        
-        print(f"DEBUG: selected_messages = {selected_messages}")
-        print(f"DEBUG: recent_messages count = {len(recent_messages)}")
-        
-        if recent_messages:
-            message_text = "📊 **Messages reçus (10 derniers)**\n\n"
-            for i, msg in enumerate(recent_messages, 1):
-                name = f"{msg['first_name']} {msg['last_name']}".strip()
+def grantable_roles(user_id):
+    """Rôles que l'utilisateur peut attribuer : tous pour le Chef, sinon ceux sous le sien"""
+    if is_chef(user_id):
+        return list(ROLES)
+    level = ROLES.get(get_user_role(user_id), 0)
+    return [role for role, role_level in ROLES.items() if role_level < level]
+
+
+# --- Consultation des messages reçus ---
+MESSAGES_PAGE_SIZE = 10
+
+
+def parse_message_filter(text):
+    """Lire un filtre '<user_id> <AAAA-MM-JJ> <AAAA-MM-JJ>' (chaque partie est facultative)"""
+    message_filter = {}
+    dates = []
+    for token in text.split():
+        if token.isdigit():
+            message_filter["user_id"] = int(token)
+        else:
+            dates.append(datetime.strptime(token, "%Y-%m-%d"))
+    if len(dates) > 2:
+        raise ValueError("trop de dates")
+    if dates:
+        message_filter["since"] = dates[0].isoformat()
+    if len(dates) == 2:
+        # La date de fin est incluse
+        message_filter["until"] = dates[1].replace(hour=23, minute=59, second=59).isoformat()
+    return message_filter
+
+
+def describe_message_filter(message_filter):
+    parts = []
+    if "user_id" in message_filter:
+        parts.append(f"utilisateur {message_filter['user_id']}")
+    if "since" in message_filter:
+        parts.append(f"depuis le {message_filter['since'][:10]}")
+    if "until" in message_filter:
+        parts.append(f"jusqu'au {message_filter['until'][:10]}")
+    return ", ".join(parts)
+
+
+def load_message_page(context):
+    """Page courante du visualiseur (curseur et filtre gardés dans user_data)"""
+    message_filter = context.user_data.get("message_filter", {})
+    cursor = context.user_data.get("message_cursor", {})
+    page = message_journal.page(
+        MESSAGES_PAGE_SIZE,
+        before=cursor.get("before"),
+        after=cursor.get("after"),
+        user_id=message_filter.get("user_id"),
+        since=datetime.fromisoformat(message_filter["since"]) if "since" in message_filter else None,
+        until=datetime.fromisoformat(message_filter["until"]) if "until" in message_filter else None,
+    )
+    context.user_data["message_page_ids"] = [msg["id"] for msg in page["messages"]]
+    return page
+
+
+async def update_message_display(query, context):
+    """Mettre à jour l'affichage des messages avec les sélections"""
+    try:
+        page = load_message_page(context)
+        recent_messages = page["messages"]
+        selected_messages = context.user_data.get("selected_messages", set())
+        message_filter = context.user_data.get("message_filter", {})
+        
+        messages_log.debug("selected_messages = %s", len(selected_messages))
+        messages_log.debug("recent_messages count = %s", len(recent_messages))
+        
+        header = "📊 **Messages reçus**\n\n"
+        if message_filter:
+            header += f"🔎 Filtre : {describe_message_filter(message_filter)}\n\n"
+        
+        # Navigation entre les pages et filtre
+        nav_buttons = []
+        if page["older"] is not None:
+            nav_buttons.append(InlineKeyboardButton("⬅️ Plus anciens", callback_data=f"admin_messages_older_{page['older']}"))
+        if page["newer"] is not None:
+            nav_buttons.append(InlineKeyboardButton("Plus récents ➡️", callback_data=f"admin_messages_newer_{page['newer']}"))
+        filter_buttons = [InlineKeyboardButton("🔎 Filtrer", callback_data="admin_messages_filter")]
+        if message_filter:
+            filter_buttons.append(InlineKeyboardButton("❌ Retirer le filtre", callback_data="admin_messages_unfilter"))
+        
+        if recent_messages:
+            message_text = header
+            for i, msg in enumerate(recent_messages, 1):
+                name = f"{msg['first_name']} {msg['last_name']}".strip()
                 username = f"@{msg['username']}" if msg['username'] else "Sans @username"
                 
                 # Indicateur de sélection
-                selection_indicator = "✅" if (i-1) in selected_messages else "☐"
+                selection_indicator = "✅" if msg["id"] in selected_messages else "☐"
                 
                 message_text += f"{selection_indicator} **{i}.** Message envoyé par {name} [{msg['user_id']}]\n"
                 message_text += f"#{msg['user_id']}\n"
@@ -160,9 +1583,9 @@ async def update_message_display(query, context):
             for i, msg in enumerate(recent_messages, 1):
                 name = f"{msg['first_name']} {msg['last_name']}".strip()
                 # Bouton de sélection + bouton profil
-                selection_text = "❌ Désélectionner" if (i-1) in selected_messages else f"☑️ Sélectionner {i}"
+                selection_text = "❌ Désélectionner" if msg["id"] in selected_messages else f"☑️ Sélectionner {i}"
                 keyboard.append([
-                    InlineKeyboardButton(selection_text, callback_data=f"select_msg_{i}"),
+                    InlineKeyboardButton(selection_text, callback_data=f"select_msg_{msg['id']}"),
                     InlineKeyboardButton(f"👤 Profil {name}", url=f"tg://user?id={msg['user_id']}")
                 ])
             
@@ -171,165 +1594,185 @@ async def update_message_display(query, context):
             if selected_messages:
                 action_buttons.append(InlineKeyboardButton(f"🗑️ Supprimer ({len(selected_messages)})", callback_data="delete_selected_messages"))
             
-            if len(selected_messages) < len(recent_messages):
+            if any(msg["id"] not in selected_messages for msg in recent_messages):
                 action_buttons.append(InlineKeyboardButton("✅ Tout sélectionner", callback_data="select_all_messages"))
             
             if action_buttons:
                 keyboard.append(action_buttons)
-            
-            keyboard.append([InlineKeyboardButton("🔙 Retour au panel message", callback_data="admin_message_panel")])
-            markup = InlineKeyboardMarkup(keyboard)
-            
-            try:
-                await query.edit_message_text(
-                    text=message_text,
-                    reply_markup=markup,
-                    parse_mode="Markdown"
-                )
-                print("DEBUG: Message édité avec succès")
-            except Exception as e:
-                print(f"Erreur lors de l'édition du message: {e}")
-                await query.answer("Erreur lors de la mise à jour")
         else:
             # Aucun message
-            keyboard = [[InlineKeyboardButton("🔙 Retour au panel message", callback_data="admin_message_panel")]]
-            markup = InlineKeyboardMarkup(keyboard)
-            try:
-                await query.edit_message_text(
-                    text="📊 **Messages reçus**\n\nAucun message reçu pour le moment.",
-                    reply_markup=markup,
-                    parse_mode="Markdown"
-                )
-            except Exception as e:
-                print(f"Erreur lors de l'édition du message: {e}")
-                await query.answer("Erreur lors de la mise à jour")
-    except Exception as e:
-        print(f"Erreur dans update_message_display: {e}")
-        await query.answer("Erreur lors de la mise à jour de l'affichage")
-
-# --- Fonction pour forcer la suppression de tous les messages du bot ---
-async def force_delete_all_bot_messages(context, chat_id):
-    """Force la suppression de tous les messages du bot dans un chat"""
-    deleted_count = 0
-    try:
-        print(f"DEBUG: force_delete_all_bot_messages pour chat_id {chat_id}")
+            message_text = header + "Aucun message reçu pour le moment."
+            keyboard = []
+        
+        if nav_buttons:
+            keyboard.append(nav_buttons)
+        keyboard.append(filter_buttons)
+        keyboard.append([InlineKeyboardButton("🔙 Retour au panel message", callback_data="admin_message_panel")])
+        markup = InlineKeyboardMarkup(keyboard)
         
-        # Utiliser get_updates pour récupérer les messages
-        message_ids = []
         try:
-            # Récupérer les updates récents
-            updates = await context.bot.get_updates(limit=100, timeout=10)
-            print(f"DEBUG: Récupéré {len(updates)} updates")
-            
-            for update in updates:
-                if update.message and update.message.chat_id == chat_id:
-                    if update.message.from_user and update.message.from_user.id == context.bot.id:
-                        message_ids.append(update.message.message_id)
-                        print(f"DEBUG: Message du bot trouvé: {update.message.message_id}")
-            
-            print(f"DEBUG: Première passe - trouvé {len(message_ids)} messages du bot")
+            await query.edit_message_text(
+                text=message_text,
+                reply_markup=markup,
+                parse_mode="Markdown"
+            )
+            messages_log.debug("Message édité avec succès")
         except Exception as e:
-            print(f"DEBUG: Erreur get_updates dans force_delete_all_bot_messages: {e}")
-            return 0
-        
-        # Supprimer du plus récent au plus ancien
-        for message_id in reversed(message_ids):
-            try:
-                await context.bot.delete_message(chat_id=chat_id, message_id=message_id)
-                deleted_count += 1
-                print(f"DEBUG: Message {message_id} supprimé")
-                await asyncio.sleep(0.1)
-            except Exception as e:
-                print(f"DEBUG: Erreur suppression message {message_id}: {e}")
-                continue
-                
-        # Deuxième passe : essayer de récupérer plus d'updates
-        await asyncio.sleep(1)
-        message_ids = []
+            messages_log.error("Erreur lors de l'édition du message: %s", e)
+            await query.answer("Erreur lors de la mise à jour")
+    except Exception as e:
+        messages_log.error("Erreur dans update_message_display: %s", e)
+        await query.answer("Erreur lors de la mise à jour de l'affichage")
+
+# --- Notification des administrateurs (messages reçus) ---
+class AdminNotifier:
+    """Prévient les administrateurs des messages reçus.
+
+    Chaque notification part en parallèle vers tous les administrateurs qui
+    ont au moins le rôle min_role. Le premier message après une période calme
+    est notifié tout de suite ; ceux qui arrivent dans les window secondes
+    suivantes sont regroupés en un seul récapitulatif par administrateur, au
+    lieu d'un message chacun (limite d'envoi par chat de Telegram).
+    """
+
+    DIGEST_LINES = 10  # messages détaillés dans un récapitulatif
+
+    def __init__(self, window=10.0, min_role="STAFF"):
+        self.window = window
+        self.min_role = min_role
+        self._pending = []  # (user, message_text, time_str)
+        self._quiet_until = 0.0
+        self._flush_scheduled = False
+        self.sent = 0
+        self.failed = 0
+        self.digests = 0
+
+    async def notify(self, bot, user, message_text, timestamp=None):
+        now = time.monotonic()
+        if now >= self._quiet_until and not self._flush_scheduled:
+            # Période calme : notification immédiate, puis ouverture de la fenêtre
+            self._quiet_until = now + self.window
+            text, markup = self._single(user, message_text, self._time_str(timestamp))
+            await self._fan_out(bot, text, markup)
+            return
+        self._pending.append((user, message_text, self._time_str(timestamp)))
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            ui_scheduler.later("admin_digest", self._quiet_until - now, self._flush, bot)
+
+    async def _flush(self, bot):
+        self._flush_scheduled = False
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+        # La fenêtre reste ouverte tant que les messages continuent d'arriver
+        self._quiet_until = time.monotonic() + self.window
+        self.digests += 1
+        with background_flow("notifications"):
+            await self._fan_out(bot, *self._digest(pending))
+
+    async def drain(self, bot, timeout=10.0):
+        """À l'arrêt : envoyer tout de suite le récapitulatif qui attendait la fin de la fenêtre"""
+        ui_scheduler.cancel("admin_digest")
+        count = len(self._pending)
+        if not count:
+            return
+        messages_log.info("🔔 Envoi du récapitulatif en attente avant l'arrêt (%s message(s))", count)
         try:
-            # Récupérer plus d'updates avec un offset
-            updates = await context.bot.get_updates(limit=200, timeout=10)
-            print(f"DEBUG: Deuxième passe - récupéré {len(updates)} updates")
-            
-            for update in updates:
-                if update.message and update.message.chat_id == chat_id:
-                    if update.message.from_user and update.message.from_user.id == context.bot.id:
-                        message_ids.append(update.message.message_id)
-                        print(f"DEBUG: Message du bot trouvé (2ème passe): {update.message.message_id}")
-            
-            print(f"DEBUG: Deuxième passe - trouvé {len(message_ids)} messages du bot")
+            await asyncio.wait_for(self._flush(bot), timeout)
         except Exception as e:
-            print(f"DEBUG: Erreur get_updates deuxième passe: {e}")
-            return deleted_count
-        
-        for message_id in reversed(message_ids):
+            messages_log.error("Récapitulatif de %s message(s) non envoyé à l'arrêt : %s", count, e)
+
+    async def _fan_out(self, bot, text, markup):
+        recipients = role_registry.members(self.min_role)
+        results = await asyncio.gather(
+            *(self._send(bot, admin_id, text, markup) for admin_id in recipients)
+        )
+        self.sent += sum(results)
+        self.failed += len(results) - sum(results)
+
+    async def _send(self, bot, admin_id, text, markup):
+        for _ in range(2):
             try:
-                await context.bot.delete_message(chat_id=chat_id, message_id=message_id)
-                deleted_count += 1
-                print(f"DEBUG: Message {message_id} supprimé (deuxième passe)")
-                await asyncio.sleep(0.1)
+                await bot.send_message(chat_id=admin_id, text=text, reply_markup=markup, parse_mode="Markdown")
+                return True
+            except RetryAfter as e:
+                api_accounting.retry("sendMessage")
+                await asyncio.sleep(e.retry_after)
             except Exception as e:
-                print(f"DEBUG: Erreur suppression message {message_id} (deuxième passe): {e}")
-                continue
-                
-        print(f"DEBUG: force_delete_all_bot_messages terminé - {deleted_count} messages supprimés")
-        return deleted_count
-    except Exception as e:
-        print(f"DEBUG: Erreur générale dans force_delete_all_bot_messages: {e}")
-        return deleted_count
+                messages_log.warning("Erreur lors de la notification admin %s: %s", admin_id, e)
+                return False
+        return False
 
-# --- Fonction pour notifier l'admin des messages de contact ---
-async def notify_admin_contact(context, user, message_text, timestamp=None):
-    """Notifie l'admin d'un nouveau message de contact"""
-    try:
-        # Récupérer l'ID admin (premier admin connecté)
-        admin_id = list(admins)[0] if admins else None
-        if not admin_id:
-            return
-        
-        # Formater le message pour l'admin
-        username = f"@{user.username}" if user.username else "Pas de @username"
-        name = f"{user.first_name} {user.last_name}".strip() if user.last_name else user.first_name
-        
-        # Formater l'heure
-        from datetime import datetime
+    @staticmethod
+    def _time_str(timestamp):
         if timestamp:
             try:
-                time_obj = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-                time_str = time_obj.strftime('%H:%M:%S')
-            except:
-                time_str = "Maintenant"
-        else:
-            time_str = "Maintenant"
-        
-        # Créer le message de notification avec emoji et formatage
-        admin_message = (
+                return datetime.fromisoformat(timestamp.replace('Z', '+00:00')).strftime('%H:%M:%S')
+            except ValueError:
+                pass
+        return "Maintenant"
+
+    @staticmethod
+    def _name(user):
+        return f"{user.first_name} {user.last_name}".strip() if user.last_name else user.first_name
+
+    @staticmethod
+    def _md(text):
+        """Texte fourni par l'utilisateur, échappé pour parse_mode="Markdown" (un _ ou * isolé ferait échouer l'envoi)"""
+        return escape_markdown(text or "")
+
+    def _single(self, user, message_text, time_str):
+        name = self._name(user)
+        username = f"@{user.username}" if user.username else "Pas de @username"
+        text = (
             f"🔔 **NOUVEAU MESSAGE REÇU !**\n\n"
-            f"👤 **De :** {name}\n"
-            f"📱 **@username :** {username}\n"
+            f"👤 **De :** {self._md(name)}\n"
+            f"📱 **@username :** {self._md(username)}\n"
             f"🆔 **ID :** `{user.id}`\n"
             f"⏰ **Heure :** {time_str}\n\n"
-            f"💬 **Message :**\n{message_text}\n\n"
+            f"💬 **Message :**\n{self._md(message_text)}\n\n"
             f"📝 *Utilisez /repondre {user.id} <votre message> pour répondre*"
         )
-        
-        # Créer un clavier avec boutons d'action
-        from telegram import InlineKeyboardButton, InlineKeyboardMarkup
         keyboard = [
             [InlineKeyboardButton(f"👤 Voir le profil de {name}", url=f"tg://user?id={user.id}")],
             [InlineKeyboardButton("📊 Voir tous les messages", callback_data="admin_view_messages")]
         ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        # Envoyer le message à l'admin avec notification
-        await context.bot.send_message(
-            chat_id=admin_id,
-            text=admin_message,
-            reply_markup=reply_markup,
-            parse_mode="Markdown"
+        return text, InlineKeyboardMarkup(keyboard)
+
+    def _digest(self, pending):
+        senders = {user.id for user, _, _ in pending}
+        lines = [
+            # Couper avant d'échapper : jamais d'échappement coupé en deux
+            f"• {time_str} {self._md(self._name(user))} (`{user.id}`) : {self._md((message_text or '')[:80])}"
+            for user, message_text, time_str in pending[-self.DIGEST_LINES:]
+        ]
+        if len(pending) > self.DIGEST_LINES:
+            lines.insert(0, f"… et {len(pending) - self.DIGEST_LINES} message(s) plus ancien(s)")
+        text = (
+            f"🔔 **{len(pending)} NOUVEAUX MESSAGES** de {len(senders)} utilisateur(s)\n\n"
+            + "\n".join(lines)
+            + "\n\n📝 *Utilisez /repondre <ID> <votre message> pour répondre*"
         )
+        keyboard = [[InlineKeyboardButton("📊 Voir tous les messages", callback_data="admin_view_messages")]]
+        return text, InlineKeyboardMarkup(keyboard)
+
+    def stats(self):
+        return {"sent": self.sent, "failed": self.failed, "digests": self.digests, "pending": len(self._pending)}
+
+
+admin_notifier = AdminNotifier(
+    window=float(os.getenv("NOTIFY_DIGEST_WINDOW", "10")),
+    min_role=os.getenv("NOTIFY_MIN_ROLE", "STAFF"),
+)
+
+
+async def notify_admin_contact(context, user, message_text, timestamp=None):
+    """Notifie les administrateurs d'un nouveau message de contact"""
+    try:
+        await admin_notifier.notify(context.bot, user, message_text, timestamp)
     except Exception as e:
-        print(f"Erreur lors de la notification admin: {e}")
+        messages_log.error("Erreur lors de la notification admin: %s", e)
 
 # --- Fonction utilitaire pour l'édition sécurisée de messages ---
 async def safe_edit_message(query, text, reply_markup=None, parse_mode=None):
@@ -358,7 +1801,7 @@ async def safe_edit_message(query, text, reply_markup=None, parse_mode=None):
                 parse_mode=parse_mode
             )
         except Exception as e2:
-            print(f"Erreur lors de l'envoi du message: {e2}")
+            bot_log.error("Erreur lors de l'envoi du message: %s", e2)
             await query.answer("❌ Erreur lors de l'affichage du contenu")
 
 async def safe_edit_message_media(query, media, reply_markup=None):
@@ -394,11 +1837,517 @@ async def safe_edit_message_media(query, media, reply_markup=None):
                         parse_mode="Markdown"
                     )
             except Exception as e3:
-                print(f"Erreur lors de l'affichage du média: {e3}")
+                bot_log.error("Erreur lors de l'affichage du média: %s", e3)
                 await query.answer("❌ Erreur lors de l'affichage du contenu")
 
 
+# --- Diffusion de messages (broadcast) ---
+class TokenBucket:
+    """Limiteur de débit partagé : rate jetons par seconde, capacity au maximum"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds):
+        """Bloquer tous les envois (flood control de Telegram)"""
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._blocked_until:
+                    await asyncio.sleep(self._blocked_until - now)
+                    continue
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+# Échecs définitifs : le destinataire est retiré des prochaines diffusions
+DEAD_REASONS = ("blocked", "not_found")
+
+
+def classify_send_error(error):
+    """Classer un échec d'envoi : blocked, not_found ou transient"""
+    if isinstance(error, Forbidden):
+        # Bot bloqué par l'utilisateur ou compte supprimé
+        return "blocked"
+    if isinstance(error, BadRequest) and "chat not found" in str(error).lower():
+        return "not_found"
+    return "transient"
+
+
+class BroadcastJob:
+    """État d'une diffusion, enregistré sur le disque pour pouvoir la reprendre.
+
+    Les destinataires sont les utilisateurs de seq <= max_seq (ordre
+    d'inscription). cursor est le dernier seq dont l'envoi est terminé ainsi
+    que tous ceux qui le précèdent ; les envois terminés au-delà du curseur
+    sont notés un par un dans le journal <id>.log. Le point de reprise
+    n'enregistre que les compteurs jusqu'au curseur (settled) : à la reprise,
+    le journal est la seule source pour ce qui est au-delà, et rien n'est
+    compté deux fois. total est recalculé à la reprise : envois déjà faits
+    plus destinataires restants encore joignables.
+    """
+
+    def __init__(self, job_id, text, admin_chat_id, max_seq, total, cursor=0, sent=0, failed=0,
+                 unreachable=0, status="running", status_message_id=None):
+        self.id = job_id
+        self.text = text
+        self.admin_chat_id = admin_chat_id
+        self.max_seq = max_seq
+        self.total = total
+        self.cursor = cursor
+        self.sent = sent
+        self.failed = failed
+        self.unreachable = unreachable
+        # Compteurs des envois jusqu'au curseur inclus (ceux du point de reprise)
+        self.settled = {"sent": sent, "failed": failed, "unreachable": unreachable}
+        self.status = status
+        self.status_message_id = status_message_id
+        self.retries = 0
+        self.resumed_from = sent + failed
+        self.started = time.monotonic()
+        self.finished = None
+
+    @classmethod
+    def from_record(cls, record):
+        return cls(
+            record["id"],
+            record["text"],
+            record["admin_chat_id"],
+            record["max_seq"],
+            record["total"],
+            cursor=record.get("cursor", 0),
+            sent=record.get("sent", 0),
+            failed=record.get("failed", 0),
+            unreachable=record.get("unreachable", 0),
+            status=record.get("status", "running"),
+            status_message_id=record.get("status_message_id"),
+        )
+
+    def to_record(self):
+        return {
+            "id": self.id,
+            "text": self.text,
+            "admin_chat_id": self.admin_chat_id,
+            "status_message_id": self.status_message_id,
+            "max_seq": self.max_seq,
+            "total": self.total,
+            "cursor": self.cursor,
+            "sent": self.settled["sent"],
+            "failed": self.settled["failed"],
+            "unreachable": self.settled["unreachable"],
+            "status": self.status,
+        }
+
+    @property
+    def done(self):
+        return self.sent + self.failed
+
+    def record(self, result):
+        if result == "ok":
+            self.sent += 1
+        else:
+            self.failed += 1
+            if result in DEAD_REASONS:
+                self.unreachable += 1
+
+    def settle(self, result):
+        """Le curseur a dépassé un envoi terminé : le compter dans le point de reprise"""
+        if result == "ok":
+            self.settled["sent"] += 1
+        else:
+            self.settled["failed"] += 1
+            if result in DEAD_REASONS:
+                self.settled["unreachable"] += 1
+
+    def throughput(self):
+        elapsed = (self.finished or time.monotonic()) - self.started
+        return (self.done - self.resumed_from) / elapsed if elapsed > 0 else 0.0
+
+    def status_text(self):
+        if self.status == "running":
+            title = "📤 **Diffusion en cours...**"
+        else:
+            title = "✅ **Message diffusé !**"
+        percent = (self.done * 100 // self.total) if self.total else 100
+        return (
+            f"{title}\n\n"
+            f"*Diffusion :* `{self.id}`\n"
+            f"*Progression :* {self.done}/{self.total} ({percent}%)\n"
+            f"*Envoyé à :* {self.sent} utilisateurs\n"
+            f"*Échecs :* {self.failed} utilisateurs (dont {self.unreachable} inaccessibles)\n"
+            f"*Débit :* {self.throughput():.1f} msg/s"
+        )
+
+
+class BroadcastEngine:
+    """Diffuse un message à tous les utilisateurs en tâche de fond.
+
+    Les envois passent par un TokenBucket global (limite d'environ 30 msg/s
+    de Telegram), au plus concurrency envois simultanés, et respectent les
+    RetryAfter renvoyés par l'API. La progression est affichée à l'admin en
+    éditant un message de statut toutes les progress_interval secondes.
+
+    Chaque diffusion est enregistrée dans store_dir (<id>.json, point de
+    reprise écrit toutes les checkpoint_every réponses) avec un journal des
+    envois terminés (<id>.log). Au démarrage, resume_all() relance les
+    diffusions inachevées sans renvoyer le message à ceux qui l'ont déjà reçu.
+    """
+
+    def __init__(self, store_dir, rate=30, concurrency=10, max_retries=3, progress_interval=3.0,
+                 checkpoint_every=100):
+        self.store_dir = store_dir
+        self.bucket = TokenBucket(rate)
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.progress_interval = progress_interval
+        self.checkpoint_every = checkpoint_every
+        self.jobs = {}
+        self._tasks = {}
+        os.makedirs(store_dir, exist_ok=True)
+
+    def _job_path(self, job):
+        return os.path.join(self.store_dir, f"{job.id}.json")
+
+    def _log_path(self, job):
+        return os.path.join(self.store_dir, f"{job.id}.log")
+
+    def checkpoint(self, job, sync=False):
+        persistence.schedule(self._job_path(job), job.to_record())
+        if sync:
+            persistence.flush()
+
+    def create(self, text, admin_chat_id):
+        """Créer une diffusion vers tous les utilisateurs inscrits à cet instant"""
+        max_seq = user_store.max_seq()
+        job = BroadcastJob(
+            uuid.uuid4().hex[:8],
+            text,
+            admin_chat_id,
+            max_seq=max_seq,
+            total=user_store.count_recipients(max_seq),
+        )
+        self.jobs[job.id] = job
+        self.checkpoint(job, sync=True)
+        return job
+
+    def launch(self, job, bot):
+        """Lancer la diffusion en arrière-plan"""
+        task = asyncio.create_task(self.run(job, bot), name=f"broadcast-{job.id}")
+        self._tasks[job.id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job.id, None))
+        return task
+
+    def resume_all(self, bot):
+        """Relancer les diffusions interrompues par un redémarrage"""
+        resumed = 0
+        for name in sorted(os.listdir(self.store_dir)):
+            if not name.endswith(".json"):
+                continue
+            try:
+                record = load_json(os.path.join(self.store_dir, name))
+            except (OSError, ValueError) as e:
+                broadcast_log.error("Erreur lors de la lecture de la diffusion %s: %s", name, e)
+                continue
+            if record.get("status") != "running" or record["id"] in self.jobs:
+                continue
+            job = BroadcastJob.from_record(record)
+            self.jobs[job.id] = job
+            broadcast_log.info("📤 Reprise de la diffusion %s (%s/%s)", job.id, job.done, job.total)
+            self.launch(job, bot)
+            resumed += 1
+        return resumed
+
+    def _already_done(self, job):
+        """Seqs déjà traités au-delà du curseur, d'après le journal des envois"""
+        done = {}
+        try:
+            with open(self._log_path(job), "r", encoding="utf-8") as f:
+                for line in f:
+                    parts = line.split()
+                    if len(parts) == 2 and parts[0].isdigit():
+                        done[int(parts[0])] = parts[1]
+        except FileNotFoundError:
+            pass
+        return {seq: result for seq, result in done.items() if seq > job.cursor}
+
+    async def run(self, job, bot):
+        # Lancée depuis un handler : ses envois ne comptent pas pour l'update de l'admin
+        with background_flow("diffusion"):
+            await self._run(job, bot)
+
+    async def _run(self, job, bot):
+        already_done = self._already_done(job)
+        # Le point de reprise ne compte que les envois jusqu'au curseur : ceux
+        # du journal au-delà du curseur s'y ajoutent sans double comptage
+        for result in already_done.values():
+            job.record(result)
+        job.resumed_from = job.done
+        recipients = [
+            (seq, user_id)
+            for seq, user_id in user_store.recipients(job.cursor, job.max_seq)
+            if seq not in already_done
+        ]
+        # Total recalculé à chaque lancement : depuis la création (ou l'arrêt),
+        # des destinataires ont pu être marqués injoignables ou réactivés
+        total = job.done + len(recipients)
+        if total != job.total:
+            broadcast_log.info("📤 Diffusion %s : %s destinataires au lieu de %s", job.id, total, job.total)
+            job.total = total
+        # Tous les seqs au-delà du curseur, dans l'ordre : le curseur avance
+        # aussi sur ceux déjà journalisés, et les compte alors comme acquis
+        order = sorted(set(already_done) | {seq for seq, _ in recipients})
+        positions = {seq: position for position, seq in enumerate(order)}
+        results = [already_done.get(seq) for seq in order]
+        state = {"low": 0, "since_checkpoint": 0}
+        queue = ((positions[seq], (seq, user_id)) for seq, user_id in recipients)
+
+        def advance():
+            while state["low"] < len(order) and results[state["low"]] is not None:
+                job.settle(results[state["low"]])
+                job.cursor = order[state["low"]]
+                state["low"] += 1
+
+        def mark_done(position, result):
+            results[position] = result
+            advance()
+            state["since_checkpoint"] += 1
+            if state["since_checkpoint"] >= self.checkpoint_every:
+                state["since_checkpoint"] = 0
+                self.checkpoint(job)
+
+        advance()
+        log = open(self._log_path(job), "a", encoding="utf-8")
+        workers = [
+            asyncio.create_task(self._worker(job, bot, queue, log, mark_done))
+            for _ in range(self.concurrency)
+        ]
+        reporter = asyncio.create_task(self._report(job, bot))
+        try:
+            await asyncio.gather(*workers)
+            job.status = "done"
+        except asyncio.CancelledError:
+            # Arrêt du bot : la diffusion reprendra au prochain démarrage
+            for worker in workers:
+                worker.cancel()
+            raise
+        finally:
+            job.finished = time.monotonic()
+            reporter.cancel()
+            log.close()
+            self.checkpoint(job, sync=True)
+            if job.status == "running":
+                broadcast_log.info("📤 Diffusion %s interrompue à %s/%s, reprise au prochain démarrage", job.id, job.done, job.total)
+            else:
+                try:
+                    os.remove(self._log_path(job))
+                except OSError:
+                    pass
+                broadcast_log.info(
+                    "📤 Diffusion %s terminée : %s envoyés, %s échecs, %.1f msg/s",
+                    job.id, job.sent, job.failed, job.throughput(),
+                )
+                await self._show_status(job, bot, final=True)
+
+    async def _worker(self, job, bot, queue, log, mark_done):
+        # Les workers se partagent le même itérateur (pas de await entre next() et l'envoi)
+        for position, (seq, user_id) in queue:
+            result = await self._send(job, bot, user_id)
+            log.write(f"{seq} {result}\n")
+            log.flush()
+            job.record(result)
+            if result in DEAD_REASONS:
+                user_store.mark_dead(user_id, result)
+            mark_done(position, result)
+
+    async def _send(self, job, bot, user_id):
+        for attempt in range(self.max_retries + 1):
+            await self.bucket.acquire()
+            try:
+                await bot.send_message(chat_id=user_id, text=job.text)
+                return "ok"
+            except RetryAfter as e:
+                job.retries += 1
+                api_accounting.retry("sendMessage")
+                self.bucket.pause(e.retry_after)
+                await asyncio.sleep(e.retry_after)
+            except BadRequest as e:
+                # BadRequest hérite de NetworkError mais ne sert à rien de réessayer
+                return self._failure(user_id, e)
+            except (TimedOut, NetworkError) as e:
+                job.retries += 1
+                if attempt == self.max_retries:
+                    return self._failure(user_id, e)
+                api_accounting.retry("sendMessage")
+                await asyncio.sleep(2 ** attempt)
+            except Exception as e:
+                return self._failure(user_id, e)
+        return "transient"
+
+    def _failure(self, user_id, error):
+        result = classify_send_error(error)
+        if result == "transient":
+            broadcast_log.warning("Erreur envoi à %s: %s", user_id, error)
+        return result
+
+    async def _report(self, job, bot):
+        while True:
+            await asyncio.sleep(self.progress_interval)
+            await self._show_status(job, bot)
+
+    async def _show_status(self, job, bot, final=False):
+        if job.status_message_id is None:
+            return
+        markup = None
+        if final:
+            keyboard = [
+                [InlineKeyboardButton("📤 Envoyer Message à tous", callback_data="admin_broadcast_message")],
+                [InlineKeyboardButton("📊 Voir les messages reçus", callback_data="admin_view_messages")],
+                [InlineKeyboardButton("🔙 Retour au panneau admin", callback_data="admin_panel")]
+            ]
+            markup = InlineKeyboardMarkup(keyboard)
+        try:
+            await bot.edit_message_text(
+                chat_id=job.admin_chat_id,
+                message_id=job.status_message_id,
+                text=job.status_text() + ("\n\n📢 **Panel Message**" if final else ""),
+                reply_markup=markup,
+                parse_mode="Markdown"
+            )
+        except BadRequest:
+            pass  # Message inchangé
+        except Exception as e:
+            broadcast_log.warning("Erreur lors de la mise à jour du statut de diffusion %s: %s", job.id, e)
+
+    async def stop(self):
+        """Interrompre les diffusions en cours (elles reprendront au démarrage)"""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+broadcast_engine = BroadcastEngine(
+    BROADCASTS_DIR,
+    rate=float(os.getenv("BROADCAST_RATE", "30")),
+    concurrency=int(os.getenv("BROADCAST_CONCURRENCY", "10")),
+)
+
+
+# --- Registre des messages envoyés (nettoyage des conversations) ---
+class MessageLedger:
+    """Derniers messages envoyés par le bot, par chat.
+
+    Chaque chat a un tampon circulaire de size identifiants : seuls les plus
+    récents sont gardés. Au-delà de max_chats, le chat resté le plus longtemps
+    sans message est oublié. Le registre est en mémoire : les messages envoyés
+    avant un redémarrage ne sont plus connus.
+    """
+
+    def __init__(self, size=100, max_chats=10000):
+        self.size = size
+        self.max_chats = max_chats
+        self._chats = collections.OrderedDict()  # chat_id -> deque d'identifiants
+
+    def record(self, chat_id, message_id):
+        message_ids = self._chats.get(chat_id)
+        if message_ids is None:
+            message_ids = self._chats[chat_id] = collections.deque(maxlen=self.size)
+            if len(self._chats) > self.max_chats:
+                self._chats.popitem(last=False)
+        else:
+            self._chats.move_to_end(chat_id)
+            if message_id in message_ids:
+                return  # message édité : déjà enregistré
+        message_ids.append(message_id)
+
+    def forget(self, chat_id, message_id):
+        message_ids = self._chats.get(chat_id)
+        if message_ids and message_id in message_ids:
+            message_ids.remove(message_id)
+
+    def take(self, chat_id):
+        """Retirer et renvoyer les identifiants enregistrés pour un chat"""
+        return list(self._chats.pop(chat_id, ()))
+
+    def stats(self):
+        return {"chats": len(self._chats), "messages": sum(len(ids) for ids in self._chats.values())}
+
+
+message_ledger = MessageLedger(
+    size=int(os.getenv("MESSAGE_LEDGER_SIZE", "100")),
+    max_chats=int(os.getenv("MESSAGE_LEDGER_CHATS", "10000")),
+)
+cleanup_bucket = TokenBucket(float(os.getenv("CLEANUP_RATE", "20")))
+CLEANUP_CONCURRENCY = int(os.getenv("CLEANUP_CONCURRENCY", "5"))
+
+
+class TrackingBot(ExtBot):
+    """ExtBot qui enregistre dans message_ledger chaque message envoyé.
+
+    send_message, send_photo, reply_text, edit_message_text... passent tous
+    par _send_message : un seul point d'interception suffit.
+    """
+
+    async def _send_message(self, endpoint, data, *args, **kwargs):
+        result = await super()._send_message(endpoint, data, *args, **kwargs)
+        if isinstance(result, Message):
+            message_ledger.record(result.chat_id, result.message_id)
+        return result
+
+    async def delete_message(self, chat_id, message_id, *args, **kwargs):
+        result = await super().delete_message(chat_id, message_id, *args, **kwargs)
+        message_ledger.forget(chat_id, message_id)
+        return result
+
+
+async def delete_recorded_messages(bot, chat_id):
+    """Supprimer les messages du bot enregistrés pour un chat.
+
+    Les suppressions partent en parallèle (CLEANUP_CONCURRENCY au plus),
+    au débit de cleanup_bucket. Les messages déjà supprimés ou trop anciens
+    (plus de 48 h) sont ignorés.
+    """
+    message_ids = message_ledger.take(chat_id)
+    if not message_ids:
+        return 0
+    semaphore = asyncio.Semaphore(CLEANUP_CONCURRENCY)
+    
+    async def delete(message_id):
+        async with semaphore:
+            for _ in range(3):
+                await cleanup_bucket.acquire()
+                try:
+                    return await bot.delete_message(chat_id=chat_id, message_id=message_id)
+                except RetryAfter as e:
+                    api_accounting.retry("deleteMessage")
+                    cleanup_bucket.pause(e.retry_after)
+                except (BadRequest, Forbidden):
+                    return False
+                except (TimedOut, NetworkError):
+                    api_accounting.retry("deleteMessage")
+            return False
+    
+    start = time.perf_counter()
+    results = await asyncio.gather(*(delete(message_id) for message_id in reversed(message_ids)))
+    deleted = sum(1 for result in results if result)
+    messages_log.info("🧹 Chat %s : %s/%s message(s) supprimé(s) en %.2f s", chat_id, deleted, len(message_ids), time.perf_counter() - start)
+    return deleted
+
+
 # --- Commande /start ---
+@instrumented
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # Enregistrer l'utilisateur
     user = update.effective_user
@@ -408,33 +2357,10 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         user.first_name,
         user.last_name
     )
+    data = content_store.get()
     
-    # Construire le clavier avec les boutons principaux
-    keyboard = []
-    
-    # Ajouter les boutons principaux
-    keyboard.append([InlineKeyboardButton("💼 Nos Services", callback_data="nos_services")])
-    keyboard.append([InlineKeyboardButton("📞 Contact", callback_data="contact")])
-    keyboard.append([InlineKeyboardButton("✉️ Nous Contacter", callback_data="nous_contacter")])
-    
-    # Ajouter les menus du Service
-    services = data.get("services", [])
-    if isinstance(services, str):
-        services = []
-    
-    if services:
-        # Ajouter chaque menu comme un bouton séparé
-        for i, service in enumerate(services):
-            if isinstance(service, dict):
-                service_name = service.get("name", f"Menu {i+1}")
-            else:
-                service_name = str(service)
-            keyboard.append([InlineKeyboardButton(service_name, callback_data=f"service_menu_{i}")])
-    else:
-        # Si pas de menus, afficher un message
-        keyboard.append([InlineKeyboardButton("📋 Aucun menu disponible", callback_data="no_menus")])
-    
-    reply_markup = InlineKeyboardMarkup(keyboard)
+    # Clavier du menu principal (mis en cache par version du contenu)
+    reply_markup = menu_renderer.main_keyboard()
     
     welcome_text = data.get("welcome_text", "👋 Bonjour et bienvenue sur notre bot !\nChoisissez une option :")
     welcome_photo = data.get("welcome_photo")
@@ -461,7 +2387,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 )
             return  # Succès, on sort de la fonction
         except Exception as e:
-            print(f"Erreur lors de l'édition du message: {e}")
+            bot_log.error("Erreur lors de l'édition du message: %s", e)
             # Si l'édition échoue, supprimer l'ancien message et continuer
             try:
                 await context.bot.delete_message(chat_id=user.id, message_id=main_message_id)
@@ -487,7 +2413,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         context.user_data["main_message_id"] = sent_message.message_id
         
     except Exception as e:
-        print(f"Erreur lors de l'affichage du menu: {e}")
+        bot_log.error("Erreur lors de l'affichage du menu: %s", e)
         # En cas d'erreur, envoyer un message simple
         sent_message = await update.message.reply_text(
             text=welcome_text,
@@ -496,273 +2422,403 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         context.user_data["main_message_id"] = sent_message.message_id
 
 
+# --- Transitions d'interface différées ---
+class UiScheduler:
+    """Transitions d'interface différées (« afficher une confirmation, puis revenir »).
+
+    Le handler programme la suite avec later() et se termine tout de suite, au
+    lieu de garder la main pendant asyncio.sleep(). Chaque transition a une clé
+    (en général le message à redessiner) : une nouvelle transition ou un clic
+    sur ce message annule celle qui attendait encore, pour ne pas écraser
+    l'écran que l'utilisateur a ouvert entre-temps.
+    """
+
+    def __init__(self):
+        self._pending = {}  # clé -> asyncio.TimerHandle
+        self._tasks = set()
+        self.fired = 0
+        self.cancelled = 0
+
+    def later(self, key, delay, callback, *args):
+        """Appeler ``await callback(*args)`` dans delay secondes"""
+        self.cancel(key)
+        loop = asyncio.get_running_loop()
+        self._pending[key] = loop.call_later(delay, self._fire, key, callback, args)
+
+    def cancel(self, key):
+        handle = self._pending.pop(key, None)
+        if handle is not None:
+            handle.cancel()
+            self.cancelled += 1
+
+    def _fire(self, key, callback, args):
+        self._pending.pop(key, None)
+        self.fired += 1
+        task = asyncio.create_task(self._run(callback, args))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, callback, args):
+        try:
+            # Le flux du handler qui a programmé la transition reste l'origine
+            with background_flow():
+                await callback(*args)
+        except Exception as e:
+            bot_log.error("Erreur lors d'une transition différée : %s", e)
+
+    async def stop(self):
+        for handle in self._pending.values():
+            handle.cancel()
+        self._pending.clear()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self):
+        return {"pending": len(self._pending), "fired": self.fired, "cancelled": self.cancelled}
+
+
+ui_scheduler = UiScheduler()
+
+
+def message_key(query):
+    """Clé de transition : le message qui porte les boutons"""
+    return (query.message.chat_id, query.message.message_id) if query.message else query.id
+
+
+# --- Routage des callbacks ---
+class CallbackRouter:
+    """Table de routage des callback_data vers leurs handlers.
+
+    Les valeurs fixes (``admin_panel``) sont résolues par un dictionnaire.
+    Les valeurs paramétrées (``admin_edit_menu_3``) passent par une table
+    de préfixes consultée du plus long au plus court : ``admin_edit_menu_name_``
+    l'emporte donc toujours sur ``admin_edit_menu_``, quel que soit l'ordre
+    d'enregistrement. Le reste de la valeur est converti (int par défaut)
+    avant l'appel du handler ; une conversion impossible n'est pas une
+    correspondance. Chaque route compte ses appels et mesure sa durée.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._exact = {}
+        self._prefixes = {}
+        self._lengths = []  # longueurs de préfixes, de la plus grande à la plus petite
+        self._default = None
+        self.hits = collections.Counter()
+        self.misses = 0
+
+    def exact(self, value):
+        """Décorateur : route pour une valeur de callback fixe"""
+        def register(handler):
+            if value in self._exact:
+                raise ValueError(f"Route {value} déjà enregistrée")
+            self._exact[value] = handler
+            return handler
+        return register
+
+    def prefix(self, value, convert=int):
+        """Décorateur : route pour ``<préfixe><paramètre>``, le paramètre est passé au handler"""
+        def register(handler):
+            if value in self._prefixes:
+                raise ValueError(f"Route {value}* déjà enregistrée")
+            self._prefixes[value] = (handler, convert)
+            self._lengths = sorted({len(p) for p in self._prefixes}, reverse=True)
+            return handler
+        return register
+
+    def default(self, handler):
+        """Décorateur : handler appelé quand aucune route ne correspond"""
+        self._default = handler
+        return handler
+
+    def resolve(self, callback_data):
+        """Retourne (route, handler, arguments) ou None si aucune route ne correspond"""
+        handler = self._exact.get(callback_data)
+        if handler is not None:
+            return callback_data, handler, ()
+        for length in self._lengths:
+            if length >= len(callback_data):
+                continue
+            entry = self._prefixes.get(callback_data[:length])
+            if entry is None:
+                continue
+            handler, convert = entry
+            try:
+                param = convert(callback_data[length:])
+            except ValueError:
+                continue
+            return callback_data[:length] + "*", handler, (param,)
+        return None
+
+    async def dispatch(self, query, context, resolved=None):
+        """Appelle le handler de query.data ; retourne False si rien n'a été appelé"""
+        if resolved is None:
+            resolved = self.resolve(query.data)
+        if resolved is None:
+            self.misses += 1
+            if self._default is None:
+                return False
+            self.hits["<défaut>"] += 1
+            label = f"{self.name}:<défaut>"
+            with metrics.timed("route", label), api_flow(label):
+                await self._default(query, context)
+            return True
+        route, handler, args = resolved
+        self.hits[route] += 1
+        label = f"{self.name}:{route}"
+        with metrics.timed("route", label), api_flow(label):
+            await handler(query, context, *args)
+        return True
+
+    def stats(self):
+        return {
+            "routes": len(self._exact) + len(self._prefixes),
+            "hits": dict(self.hits.most_common()),
+            "misses": self.misses,
+        }
+
+
+# Callbacks réservés aux admins connectés / callbacks des utilisateurs
+admin_router = CallbackRouter("admin")
+user_router = CallbackRouter("user")
+
+
 # --- Boutons ---
+@instrumented
 async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
     
-    print(f"DEBUG: Callback reçu: {query.data}")
+    callbacks_log.debug("Callback reçu: %s", query.data)
     
-    # Charger les données au début de la fonction
-    data = load_data()
+    # Un clic annule le retour automatique prévu pour ce message
+    ui_scheduler.cancel(message_key(query))
     
-    # Gestion des callbacks admin
-    if query.data.startswith("admin_"):
-        print("DEBUG: Routage vers handle_admin_callback (admin_)")
-        await handle_admin_callback(query, context)
+    # Callbacks admin : admin_*, sélection de messages, choix du rôle
+    route = admin_router.resolve(query.data)
+    if route is not None or query.data.startswith("admin_"):
+        await handle_admin_callback(query, context, route)
         return
     
-    # Gestion des callbacks de sélection de messages
-    if query.data.startswith("select_msg_") or query.data == "select_all_messages" or query.data == "delete_selected_messages":
-        print("DEBUG: Routage vers handle_admin_callback (sélection)")
-        await handle_admin_callback(query, context)
-        return
+    # Boutons du /start ; une valeur inconnue affiche la clé correspondante de data.json
+    await user_router.dispatch(query, context)
+
+
+@user_router.prefix("service_menu_")
+async def show_service_menu(query, context: ContextTypes.DEFAULT_TYPE, menu_index: int):
+    """Gérer les menus du Service"""
+    data = content_store.get()
     
-    # Gestion des callbacks des menus du Service
-    if query.data.startswith("service_menu_"):
-        # Gérer les menus du Service
-        menu_index = int(query.data.split("_")[-1])
-        data = load_data()
-        services = data.get("services", [])
-        
-        # Si services est une chaîne, la convertir en liste
-        if isinstance(services, str):
-            services = []
-        
-        if 0 <= menu_index < len(services):
-            # Afficher le contenu du menu sélectionné
-            service = services[menu_index]
-            if isinstance(service, dict):
-                menu_content = service.get("text", "Aucun contenu")
-                menu_photo = service.get("photo", None)
-            else:
-                menu_content = str(service)
-                menu_photo = None
-            
-            # Créer le clavier de retour
-            keyboard = []
-            
-            # Ajouter les menus du Service
-            if services:
-                for i, service in enumerate(services):
-                    if isinstance(service, dict):
-                        service_name = service.get("name", f"Menu {i+1}")
-                    else:
-                        service_name = str(service)
-                    keyboard.append([InlineKeyboardButton(service_name, callback_data=f"service_menu_{i}")])
-            else:
-                keyboard.append([InlineKeyboardButton("📋 Aucun menu disponible", callback_data="no_menus")])
-            
-            
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            if menu_photo:
-                # Afficher avec photo
-                try:
-                    await query.edit_message_media(
-                        media=InputMediaPhoto(media=menu_photo, caption=menu_content),
-                        reply_markup=reply_markup
-                    )
-                except Exception as e:
-                    # Si l'édition du média échoue, afficher le texte
-                    await query.edit_message_text(
-                        text=f"{menu_content}\n\n🖼️ *Photo disponible*",
-                        reply_markup=reply_markup,
-                        parse_mode="Markdown"
-                    )
-            else:
-                # Afficher sans photo
-                await query.edit_message_text(
-                    text=menu_content,
-                    reply_markup=reply_markup
-                )
-        else:
-            await query.answer("❌ Menu introuvable")
-        return
+    services = data.get("services", [])
     
-    # Gestion du callback "no_menus"
-    if query.data == "no_menus":
-        await query.answer("📋 Aucun menu configuré pour le moment")
-        return
+    # Si services est une chaîne, la convertir en liste
+    if isinstance(services, str):
+        services = []
     
-    # Gestion des callbacks pour les boutons principaux
-    if query.data == "nos_services":
-        data = load_data()
-        content = data.get("nos_services", "💼 Nos Services :\n1️⃣ Développement Web\n2️⃣ Design\n3️⃣ Marketing Digital")
-        keyboard = [[InlineKeyboardButton("🔙 Retour", callback_data="back_to_main")]]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        # Vérifier s'il y a une photo pour nos services
-        nos_services_photo = data.get("nos_services_photo")
-        
-        if nos_services_photo:
-            try:
-                await query.edit_message_media(
-                    media=InputMediaPhoto(media=nos_services_photo, caption=content),
-                    reply_markup=reply_markup
-                )
-            except Exception as e:
-                await safe_edit_message(query, f"{content}\n\n🖼️ *Photo disponible*", reply_markup=reply_markup, parse_mode="Markdown")
+    if 0 <= menu_index < len(services):
+        # Afficher le contenu du menu sélectionné
+        service = services[menu_index]
+        if isinstance(service, dict):
+            menu_content = service.get("text", "Aucun contenu")
+            menu_photo = service.get("photo", None)
         else:
-            await safe_edit_message(query, content, reply_markup=reply_markup)
-        return
-    
-    if query.data == "contact":
-        data = load_data()
-        content = data.get("contact", "📞 Contactez-nous : contact@monentreprise.com\nTéléphone : +33 6 12 34 56 78")
-        keyboard = [[InlineKeyboardButton("🔙 Retour", callback_data="back_to_main")]]
-        reply_markup = InlineKeyboardMarkup(keyboard)
+            menu_content = str(service)
+            menu_photo = None
         
-        # Vérifier s'il y a une photo pour contact
-        contact_photo = data.get("contact_photo")
+        # Clavier des menus du Service (mis en cache par version du contenu)
+        reply_markup = menu_renderer.service_keyboard()
         
-        if contact_photo:
+        if menu_photo:
+            # Afficher avec photo
             try:
                 await query.edit_message_media(
-                    media=InputMediaPhoto(media=contact_photo, caption=content),
+                    media=InputMediaPhoto(media=menu_photo, caption=menu_content),
                     reply_markup=reply_markup
                 )
             except Exception as e:
-                await safe_edit_message(query, f"{content}\n\n🖼️ *Photo disponible*", reply_markup=reply_markup, parse_mode="Markdown")
-        else:
-            await safe_edit_message(query, content, reply_markup=reply_markup)
-        return
-    
-    if query.data == "nous_contacter":
-        data = load_data()
-        content = data.get("nous_contacter", "✉️ Nous Contacter :\n\nEnvoyez-nous un message et nous vous répondrons rapidement !")
-        keyboard = [[InlineKeyboardButton("🔙 Retour", callback_data="back_to_main")]]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        # Vérifier s'il y a une photo pour nous contacter
-        nous_contacter_photo = data.get("nous_contacter_photo")
-        
-        if nous_contacter_photo:
-            try:
-                await query.edit_message_media(
-                    media=InputMediaPhoto(media=nous_contacter_photo, caption=content),
-                    reply_markup=reply_markup
+                # Si l'édition du média échoue, afficher le texte
+                await query.edit_message_text(
+                    text=f"{menu_content}\n\n🖼️ *Photo disponible*",
+                    reply_markup=reply_markup,
+                    parse_mode="Markdown"
                 )
-            except Exception as e:
-                await safe_edit_message(query, f"{content}\n\n🖼️ *Photo disponible*", reply_markup=reply_markup, parse_mode="Markdown")
         else:
-            await safe_edit_message(query, content, reply_markup=reply_markup)
-        return
+            # Afficher sans photo
+            await query.edit_message_text(
+                text=menu_content,
+                reply_markup=reply_markup
+            )
+    else:
+        await query.answer("❌ Menu introuvable")
+
+
+@user_router.exact("no_menus")
+async def show_no_menus(query, context: ContextTypes.DEFAULT_TYPE):
+    await query.answer("📋 Aucun menu configuré pour le moment")
+
+
+@user_router.exact("nos_services")
+async def show_nos_services(query, context: ContextTypes.DEFAULT_TYPE):
+    data = content_store.get()
     
-    # Gestion des callbacks normaux
-    if query.data == "back_to_main":
-        # Charger les données
-        data = load_data()
-        
-        # Construire le clavier avec les boutons principaux
-        keyboard = []
-        
-        # Ajouter les boutons principaux
-        keyboard.append([InlineKeyboardButton("💼 Nos Services", callback_data="nos_services")])
-        keyboard.append([InlineKeyboardButton("📞 Contact", callback_data="contact")])
-        keyboard.append([InlineKeyboardButton("✉️ Nous Contacter", callback_data="nous_contacter")])
-        
-        # Ajouter les menus du Service
-        services = data.get("services", [])
-        if isinstance(services, str):
-            services = []
-        
-        if services:
-            # Ajouter chaque menu comme un bouton séparé
-            for i, service in enumerate(services):
-                if isinstance(service, dict):
-                    service_name = service.get("name", f"Menu {i+1}")
-                else:
-                    service_name = str(service)
-                keyboard.append([InlineKeyboardButton(service_name, callback_data=f"service_menu_{i}")])
-        else:
-            # Si pas de menus, afficher un message
-            keyboard.append([InlineKeyboardButton("📋 Aucun menu disponible", callback_data="no_menus")])
-        
-        
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        welcome_text = data.get("welcome_text", "👋 Bonjour et bienvenue sur notre bot !\nChoisissez une option :")
-        welcome_photo = data.get("welcome_photo")
-        
-        # Vérifier s'il y a déjà un message principal à éditer
-        main_message_id = context.user_data.get("main_message_id")
-        
-        if main_message_id:
-            # Essayer d'éditer le message existant
-            try:
-                if welcome_photo:
-                    await context.bot.edit_message_media(
-                        chat_id=query.from_user.id,
-                        message_id=main_message_id,
-                        media=InputMediaPhoto(media=welcome_photo, caption=welcome_text),
-                        reply_markup=reply_markup
-                    )
-                else:
-                    await context.bot.edit_message_text(
-                        chat_id=query.from_user.id,
-                        message_id=main_message_id,
-                        text=welcome_text,
-                        reply_markup=reply_markup
-                    )
-                return  # Succès, on sort de la fonction
-            except Exception as e:
-                print(f"Erreur lors de l'édition du message: {e}")
-                # Si l'édition échoue, supprimer l'ancien message et continuer
-                try:
-                    await context.bot.delete_message(chat_id=query.from_user.id, message_id=main_message_id)
-                except:
-                    pass
-                context.user_data.pop("main_message_id", None)  # Nettoyer l'ID invalide
-        
-        # Si pas de message existant ou édition échouée, envoyer un nouveau message
+    content = data.get("nos_services", "💼 Nos Services :\n1️⃣ Développement Web\n2️⃣ Design\n3️⃣ Marketing Digital")
+    keyboard = [[InlineKeyboardButton("🔙 Retour", callback_data="back_to_main")]]
+    reply_markup = InlineKeyboardMarkup(keyboard)
+    
+    # Vérifier s'il y a une photo pour nos services
+    nos_services_photo = data.get("nos_services_photo")
+    
+    if nos_services_photo:
+        try:
+            await query.edit_message_media(
+                media=InputMediaPhoto(media=nos_services_photo, caption=content),
+                reply_markup=reply_markup
+            )
+        except Exception as e:
+            await safe_edit_message(query, f"{content}\n\n🖼️ *Photo disponible*", reply_markup=reply_markup, parse_mode="Markdown")
+    else:
+        await safe_edit_message(query, content, reply_markup=reply_markup)
+
+
+@user_router.exact("contact")
+async def show_contact(query, context: ContextTypes.DEFAULT_TYPE):
+    data = content_store.get()
+    
+    content = data.get("contact", "📞 Contactez-nous : contact@monentreprise.com\nTéléphone : +33 6 12 34 56 78")
+    keyboard = [[InlineKeyboardButton("🔙 Retour", callback_data="back_to_main")]]
+    reply_markup = InlineKeyboardMarkup(keyboard)
+    
+    # Vérifier s'il y a une photo pour contact
+    contact_photo = data.get("contact_photo")
+    
+    if contact_photo:
+        try:
+            await query.edit_message_media(
+                media=InputMediaPhoto(media=contact_photo, caption=content),
+                reply_markup=reply_markup
+            )
+        except Exception as e:
+            await safe_edit_message(query, f"{content}\n\n🖼️ *Photo disponible*", reply_markup=reply_markup, parse_mode="Markdown")
+    else:
+        await safe_edit_message(query, content, reply_markup=reply_markup)
+
+
+@user_router.exact("nous_contacter")
+async def show_nous_contacter(query, context: ContextTypes.DEFAULT_TYPE):
+    data = content_store.get()
+    
+    content = data.get("nous_contacter", "✉️ Nous Contacter :\n\nEnvoyez-nous un message et nous vous répondrons rapidement !")
+    keyboard = [[InlineKeyboardButton("🔙 Retour", callback_data="back_to_main")]]
+    reply_markup = InlineKeyboardMarkup(keyboard)
+    
+    # Vérifier s'il y a une photo pour nous contacter
+    nous_contacter_photo = data.get("nous_contacter_photo")
+    
+    if nous_contacter_photo:
+        try:
+            await query.edit_message_media(
+                media=InputMediaPhoto(media=nous_contacter_photo, caption=content),
+                reply_markup=reply_markup
+            )
+        except Exception as e:
+            await safe_edit_message(query, f"{content}\n\n🖼️ *Photo disponible*", reply_markup=reply_markup, parse_mode="Markdown")
+    else:
+        await safe_edit_message(query, content, reply_markup=reply_markup)
+
+
+@user_router.exact("back_to_main")
+async def back_to_main(query, context: ContextTypes.DEFAULT_TYPE):
+    data = content_store.get()
+    
+    # Clavier du menu principal (mis en cache par version du contenu)
+    reply_markup = menu_renderer.main_keyboard()
+    
+    welcome_text = data.get("welcome_text", "👋 Bonjour et bienvenue sur notre bot !\nChoisissez une option :")
+    welcome_photo = data.get("welcome_photo")
+    
+    # Vérifier s'il y a déjà un message principal à éditer
+    main_message_id = context.user_data.get("main_message_id")
+    
+    if main_message_id:
+        # Essayer d'éditer le message existant
         try:
             if welcome_photo:
-                sent_message = await query.message.reply_photo(
-                    photo=welcome_photo,
-                    caption=welcome_text,
+                await context.bot.edit_message_media(
+                    chat_id=query.from_user.id,
+                    message_id=main_message_id,
+                    media=InputMediaPhoto(media=welcome_photo, caption=welcome_text),
                     reply_markup=reply_markup
                 )
             else:
-                sent_message = await query.message.reply_text(
+                await context.bot.edit_message_text(
+                    chat_id=query.from_user.id,
+                    message_id=main_message_id,
                     text=welcome_text,
                     reply_markup=reply_markup
                 )
-            
-            # Stocker l'ID du message pour les prochaines éditions
-            context.user_data["main_message_id"] = sent_message.message_id
-            
+            return  # Succès, on sort de la fonction
         except Exception as e:
-            print(f"Erreur lors de l'affichage du menu principal: {e}")
-            await query.answer("Erreur lors de l'affichage du contenu")
-    else:
-        # Charger les données pour cette section
-        data = load_data()
-        content = data.get(query.data, "Texte non défini.")
-        keyboard = [[InlineKeyboardButton("🔙 Retour", callback_data="back_to_main")]]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        # Vérifier s'il y a une photo d'accueil pour l'afficher avec le contenu
-        welcome_photo = data.get("welcome_photo")
-        
-        # Utiliser safe_edit_message pour gérer les erreurs d'édition
-        if welcome_photo:
-            # Si on a une photo d'accueil, essayer d'éditer le média
+            bot_log.error("Erreur lors de l'édition du message: %s", e)
+            # Si l'édition échoue, supprimer l'ancien message et continuer
             try:
-                await query.edit_message_media(
-                    media=InputMediaPhoto(media=welcome_photo, caption=content),
-                    reply_markup=reply_markup
-                )
-            except Exception as e:
-                print(f"Erreur lors de l'édition du média: {e}")
-                # Si l'édition du média échoue, utiliser safe_edit_message
-                await safe_edit_message(query, f"{content}\n\n🖼️ *Photo d'accueil disponible*", reply_markup=reply_markup, parse_mode="Markdown")
+                await context.bot.delete_message(chat_id=query.from_user.id, message_id=main_message_id)
+            except:
+                pass
+            context.user_data.pop("main_message_id", None)  # Nettoyer l'ID invalide
+    
+    # Si pas de message existant ou édition échouée, envoyer un nouveau message
+    try:
+        if welcome_photo:
+            sent_message = await query.message.reply_photo(
+                photo=welcome_photo,
+                caption=welcome_text,
+                reply_markup=reply_markup
+            )
         else:
-            # Pas de photo, utiliser safe_edit_message
-            await safe_edit_message(query, content, reply_markup=reply_markup)
+            sent_message = await query.message.reply_text(
+                text=welcome_text,
+                reply_markup=reply_markup
+            )
+        
+        # Stocker l'ID du message pour les prochaines éditions
+        context.user_data["main_message_id"] = sent_message.message_id
+        
+    except Exception as e:
+        bot_log.error("Erreur lors de l'affichage du menu principal: %s", e)
+        await query.answer("Erreur lors de l'affichage du contenu")
+
+
+@user_router.default
+async def show_content(query, context: ContextTypes.DEFAULT_TYPE):
+    data = content_store.get()
+    
+    content = data.get(query.data, "Texte non défini.")
+    keyboard = [[InlineKeyboardButton("🔙 Retour", callback_data="back_to_main")]]
+    reply_markup = InlineKeyboardMarkup(keyboard)
+    
+    # Vérifier s'il y a une photo d'accueil pour l'afficher avec le contenu
+    welcome_photo = data.get("welcome_photo")
+    
+    # Utiliser safe_edit_message pour gérer les erreurs d'édition
+    if welcome_photo:
+        # Si on a une photo d'accueil, essayer d'éditer le média
+        try:
+            await query.edit_message_media(
+                media=InputMediaPhoto(media=welcome_photo, caption=content),
+                reply_markup=reply_markup
+            )
+        except Exception as e:
+            bot_log.error("Erreur lors de l'édition du média: %s", e)
+            # Si l'édition du média échoue, utiliser safe_edit_message
+            await safe_edit_message(query, f"{content}\n\n🖼️ *Photo d'accueil disponible*", reply_markup=reply_markup, parse_mode="Markdown")
+    else:
+        # Pas de photo, utiliser safe_edit_message
+        await safe_edit_message(query, content, reply_markup=reply_markup)
 
 
 # --- Commande /répondre ---
+@instrumented
 async def reply_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Commande pour répondre à un utilisateur"""
     # Vérifier si c'est un admin
@@ -799,39 +2855,73 @@ async def reply_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text(f"❌ Erreur lors de l'envoi : {e}")
 
 
+# --- Commande /stats ---
+def format_latency(seconds):
+    if seconds == float("inf"):
+        return f"> {LatencyHistogram.BUCKETS[-1]:g} s"
+    return f"≤ {seconds * 1000:g} ms"
+
+
+@instrumented
+async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Latences par handler, route et méthode de l'API (réservé aux administrateurs)"""
+    if update.message.from_user.id not in admins:
+        await update.message.reply_text("❌ Cette commande est réservée aux administrateurs.")
+        return
+    
+    sections = [
+        ("🧩 Handlers", "handler"), ("🔘 Routes de callback", "route"), ("📡 API Bot", "api"),
+        ("⏳ Blocages de la boucle", "stall"),
+    ]
+    lines = ["📈 **Statistiques depuis le démarrage**", "_appels · p50 · p99 · erreurs_"]
+    for title, family in sections:
+        lines.append(f"\n**{title}**")
+        summary = metrics.summary(family)
+        if not summary:
+            lines.append("Aucune mesure")
+        for label, count, p50, p99, errors in summary:
+            lines.append(f"`{label}` {count} · {format_latency(p50)} · {format_latency(p99)} · {errors}")
+    lines.append("\n**📞 Appels API par update** _(moyenne · max · updates)_")
+    flows = api_accounting.flows(limit=10)
+    if not flows:
+        lines.append("Aucune mesure")
+    for flow, updates, average, most in flows:
+        lines.append(f"`{flow}` {average:.2f} · {most} · {updates}")
+    await update.message.reply_text("\n".join(lines), parse_mode="Markdown")
+
+
 # --- Commande /admin ---
+@instrumented
 async def admin(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    # Supprimer tous les anciens messages du bot dans cette conversation
-    user_id = update.effective_user.id
-    await force_delete_all_bot_messages(context, user_id)
-    
-    # Attendre un peu pour s'assurer que la suppression est terminée
-    await asyncio.sleep(0.5)
+    # Supprimer les anciens messages du bot dans cette conversation
+    await delete_recorded_messages(context.bot, update.effective_chat.id)
     
     await update.message.reply_text("🔐 Entrez le mot de passe admin :")
     context.user_data["awaiting_password"] = True
 
 
 # --- Gestion du mot de passe ---
+@instrumented
 async def check_password(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if context.user_data.get("awaiting_password"):
         if update.message.text == ADMIN_PASSWORD:
             user_id = update.message.from_user.id
-            admins.add(user_id)
+            role_registry.login(user_id)
             context.user_data["awaiting_password"] = False
             
             # Vérifier si c'est le premier admin (chef)
-            admins_data = load_admins()
-            if not admins_data:
-                # Premier admin = Chef
-                admins_data[str(user_id)] = {
-                    "role": "CHEF",
-                    "username": update.message.from_user.username,
-                    "name": f"{update.message.from_user.first_name} {update.message.from_user.last_name or ''}".strip(),
-                    "added_by": "system",
-                    "added_date": str(datetime.now())
-                }
-                save_admins(admins_data)
+            async with role_registry.edit() as admins_data:
+                first_admin = not admins_data
+                if first_admin:
+                    # Premier admin = Chef
+                    admins_data[str(user_id)] = {
+                        "role": "CHEF",
+                        "username": update.message.from_user.username,
+                        "name": f"{update.message.from_user.first_name} {update.message.from_user.last_name or ''}".strip(),
+                        "added_by": "system",
+                        "added_date": str(datetime.now())
+                    }
+            if first_admin:
                 await update.message.reply_text("✅ Connexion admin réussie ! Vous êtes maintenant le Chef.")
             else:
                 await update.message.reply_text("✅ Connexion admin réussie !")
@@ -860,8 +2950,8 @@ async def check_password(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 # --- Gestion des callbacks admin ---
-async def handle_admin_callback(query, context: ContextTypes.DEFAULT_TYPE):
-    print(f"DEBUG: handle_admin_callback appelé avec query.data = {query.data}")
+async def handle_admin_callback(query, context: ContextTypes.DEFAULT_TYPE, route=None):
+    callbacks_log.debug("handle_admin_callback appelé avec query.data = %s", query.data)
     user_id = query.from_user.id
     if user_id not in admins:
         try:
@@ -872,728 +2962,750 @@ async def handle_admin_callback(query, context: ContextTypes.DEFAULT_TYPE):
     
     # Gestion d'erreurs globale pour les callbacks admin
     try:
-        await handle_admin_callback_internal(query, context)
+        if not await admin_router.dispatch(query, context, route):
+            callbacks_log.debug("Aucune route admin pour %s", query.data)
     except Exception as e:
-        print(f"Erreur dans handle_admin_callback: {e}")
+        callbacks_log.error("Erreur dans handle_admin_callback: %s", e)
         try:
             await query.answer("❌ Erreur lors du traitement de la requête")
         except:
             pass
 
-async def handle_admin_callback_internal(query, context: ContextTypes.DEFAULT_TYPE):
-    user_id = query.from_user.id
+
+@admin_router.exact("admin_edit_contact")
+async def admin_edit_contact(query, context: ContextTypes.DEFAULT_TYPE):
+    data = content_store.get()
     
-    if query.data == "admin_edit_contact":
-        keyboard = [[InlineKeyboardButton("🔙 Retour au panneau admin", callback_data="admin_panel")]]
-        markup = InlineKeyboardMarkup(keyboard)
-        await safe_edit_message(
-            query,
-            "✏️ **Modification du Contact**\n\n"
-            "Envoie le nouveau texte pour *Contact* :\n\n"
-            f"*Texte actuel :*\n{data.get('contact', 'Aucun texte défini')}",
-            reply_markup=markup,
-            parse_mode="Markdown"
-        )
-        context.user_data["editing"] = "contact"
-    elif query.data == "admin_edit_services":
-        keyboard = [[InlineKeyboardButton("🔙 Retour au panneau admin", callback_data="admin_panel")]]
-        markup = InlineKeyboardMarkup(keyboard)
-        await safe_edit_message(
-            query,
-            "✏️ **Modification des Services**\n\n"
-            "Envoie le nouveau texte pour *Services* :\n\n"
-            f"*Texte actuel :*\n{data.get('services', 'Aucun texte défini')}",
-            reply_markup=markup,
-            parse_mode="Markdown"
-        )
-        context.user_data["editing"] = "services"
-    elif query.data == "admin_photo_panel":
-        keyboard = [
-            [InlineKeyboardButton("✏️ Modifier Texte d'accueil", callback_data="admin_edit_welcome_text")],
-            [InlineKeyboardButton("🖼️ Modifier Photo d'accueil", callback_data="admin_edit_welcome_photo")],
-            [InlineKeyboardButton("🗑️ Supprimer Photo d'accueil", callback_data="admin_delete_welcome_photo")],
-            [InlineKeyboardButton("🔙 Retour au panneau admin", callback_data="admin_panel")]
-        ]
-        markup = InlineKeyboardMarkup(keyboard)
-        current_photo = data.get("welcome_photo")
-        photo_status = "✅ Photo définie" if current_photo else "❌ Aucune photo"
-        await safe_edit_message(
-            query,
-            f"🖼️ **Panel Admin Photo**\n\n"
-            f"*Texte d'accueil actuel :*\n{data.get('welcome_text', 'Aucun texte défini')}\n\n"
-            f"*Photo d'accueil :* {photo_status}",
-            reply_markup=markup,
-            parse_mode="Markdown"
-        )
-    elif query.data == "admin_edit_welcome_text":
-        keyboard = [[InlineKeyboardButton("🔙 Retour au panel photo", callback_data="admin_photo_panel")]]
-        markup = InlineKeyboardMarkup(keyboard)
-        await safe_edit_message(
-            query,
-            "✏️ **Modification du Texte d'accueil**\n\n"
-            "Envoie le nouveau texte pour l'accueil :\n\n"
-            f"*Texte actuel :*\n{data.get('welcome_text', 'Aucun texte défini')}",
-            reply_markup=markup,
-            parse_mode="Markdown"
-        )
-        context.user_data["editing"] = "welcome_text"
-    elif query.data == "admin_edit_welcome_photo":
-        keyboard = [[InlineKeyboardButton("🔙 Retour au panel photo", callback_data="admin_photo_panel")]]
-        markup = InlineKeyboardMarkup(keyboard)
-        await safe_edit_message(
-            query,
-            "🖼️ **Modification de la Photo d'accueil**\n\n"
-            "Envoie la nouvelle photo pour l'accueil :\n\n"
-            "*Note :* Envoie une image en tant que photo (pas en tant que fichier)",
-            reply_markup=markup,
-            parse_mode="Markdown"
-        )
-        context.user_data["editing"] = "welcome_photo"
-    elif query.data == "admin_delete_welcome_photo":
+    keyboard = [[InlineKeyboardButton("🔙 Retour au panneau admin", callback_data="admin_panel")]]
+    markup = InlineKeyboardMarkup(keyboard)
+    await safe_edit_message(
+        query,
+        "✏️ **Modification du Contact**\n\n"
+        "Envoie le nouveau texte pour *Contact* :\n\n"
+        f"*Texte actuel :*\n{data.get('contact', 'Aucun texte défini')}",
+        reply_markup=markup,
+        parse_mode="Markdown"
+    )
+    context.user_data["editing"] = "contact"
+
+
+@admin_router.exact("admin_edit_services")
+async def admin_edit_services(query, context: ContextTypes.DEFAULT_TYPE):
+    data = content_store.get()
+    
+    keyboard = [[InlineKeyboardButton("🔙 Retour au panneau admin", callback_data="admin_panel")]]
+    markup = InlineKeyboardMarkup(keyboard)
+    await safe_edit_message(
+        query,
+        "✏️ **Modification des Services**\n\n"
+        "Envoie le nouveau texte pour *Services* :\n\n"
+        f"*Texte actuel :*\n{data.get('services', 'Aucun texte défini')}",
+        reply_markup=markup,
+        parse_mode="Markdown"
+    )
+    context.user_data["editing"] = "services"
+
+
+@admin_router.exact("admin_photo_panel")
+async def admin_photo_panel(query, context: ContextTypes.DEFAULT_TYPE):
+    data = content_store.get()
+    
+    keyboard = [
+        [InlineKeyboardButton("✏️ Modifier Texte d'accueil", callback_data="admin_edit_welcome_text")],
+        [InlineKeyboardButton("🖼️ Modifier Photo d'accueil", callback_data="admin_edit_welcome_photo")],
+        [InlineKeyboardButton("🗑️ Supprimer Photo d'accueil", callback_data="admin_delete_welcome_photo")],
+        [InlineKeyboardButton("🔙 Retour au panneau admin", callback_data="admin_panel")]
+    ]
+    markup = InlineKeyboardMarkup(keyboard)
+    current_photo = data.get("welcome_photo")
+    photo_status = "✅ Photo définie" if current_photo else "❌ Aucune photo"
+    await safe_edit_message(
+        query,
+        f"🖼️ **Panel Admin Photo**\n\n"
+        f"*Texte d'accueil actuel :*\n{data.get('welcome_text', 'Aucun texte défini')}\n\n"
+        f"*Photo d'accueil :* {photo_status}",
+        reply_markup=markup,
+        parse_mode="Markdown"
+    )
+
+
+@admin_router.exact("admin_edit_welcome_text")
+async def admin_edit_welcome_text(query, context: ContextTypes.DEFAULT_TYPE):
+    data = content_store.get()
+    
+    keyboard = [[InlineKeyboardButton("🔙 Retour au panel photo", callback_data="admin_photo_panel")]]
+    markup = InlineKeyboardMarkup(keyboard)
+    await safe_edit_message(
+        query,
+        "✏️ **Modification du Texte d'accueil**\n\n"
+        "Envoie le nouveau texte pour l'accueil :\n\n"
+        f"*Texte actuel :*\n{data.get('welcome_text', 'Aucun texte défini')}",
+        reply_markup=markup,
+        parse_mode="Markdown"
+    )
+    context.user_data["editing"] = "welcome_text"
+
+
+@admin_router.exact("admin_edit_welcome_photo")
+async def admin_edit_welcome_photo(query, context: ContextTypes.DEFAULT_TYPE):
+    keyboard = [[InlineKeyboardButton("🔙 Retour au panel photo", callback_data="admin_photo_panel")]]
+    markup = InlineKeyboardMarkup(keyboard)
+    await safe_edit_message(
+        query,
+        "🖼️ **Modification de la Photo d'accueil**\n\n"
+        "Envoie la nouvelle photo pour l'accueil :\n\n"
+        "*Note :* Envoie une image en tant que photo (pas en tant que fichier)",
+        reply_markup=markup,
+        parse_mode="Markdown"
+    )
+    context.user_data["editing"] = "welcome_photo"
+
+
+@admin_router.exact("admin_delete_welcome_photo")
+async def admin_delete_welcome_photo(query, context: ContextTypes.DEFAULT_TYPE):
+    async with content_store.edit() as data:
         data["welcome_photo"] = None
-        save_data(data)
-        keyboard = [
-            [InlineKeyboardButton("✏️ Modifier Texte d'accueil", callback_data="admin_edit_welcome_text")],
-            [InlineKeyboardButton("🖼️ Modifier Photo d'accueil", callback_data="admin_edit_welcome_photo")],
-            [InlineKeyboardButton("🗑️ Supprimer Photo d'accueil", callback_data="admin_delete_welcome_photo")],
-            [InlineKeyboardButton("🔙 Retour au panneau admin", callback_data="admin_panel")]
-        ]
-        markup = InlineKeyboardMarkup(keyboard)
-        await safe_edit_message(
-            query,
-            "✅ **Photo d'accueil supprimée !**\n\n"
-            f"*Texte d'accueil actuel :*\n{data.get('welcome_text', 'Aucun texte défini')}\n\n"
-            f"*Photo d'accueil :* ❌ Aucune photo",
-            reply_markup=markup,
-            parse_mode="Markdown"
-        )
-    elif query.data == "admin_message_panel":
-        users_data = load_users()
-        total_users = len(users_data["users"])
-        total_messages = len(users_data["messages"])
-        
-        keyboard = [
-            [InlineKeyboardButton("📤 Envoyer Message à tous", callback_data="admin_broadcast_message")],
-            [InlineKeyboardButton("🗑️ Supprimer messages reçus", callback_data="admin_clear_received_messages")],
-            [InlineKeyboardButton("📊 Voir les messages reçus", callback_data="admin_view_messages")],
-            [InlineKeyboardButton("🔙 Retour au panneau admin", callback_data="admin_panel")]
-        ]
-        markup = InlineKeyboardMarkup(keyboard)
-        await safe_edit_message(
-            query,
-            f"📢 **Panel Message**\n\n"
-            f"*Utilisateurs enregistrés :* {total_users}\n"
-            f"*Messages reçus :* {total_messages}\n\n"
-            "Choisissez une action :",
-            reply_markup=markup,
-            parse_mode="Markdown"
-        )
-    elif query.data == "admin_broadcast_message":
-        keyboard = [[InlineKeyboardButton("🔙 Retour au panel message", callback_data="admin_message_panel")]]
-        markup = InlineKeyboardMarkup(keyboard)
-        await safe_edit_message(
-            query,
-            "📤 **Envoi de message à tous les utilisateurs**\n\n"
-            "Envoie le message que tu veux diffuser à tous les utilisateurs :",
-            reply_markup=markup,
-            parse_mode="Markdown"
-        )
-        context.user_data["editing"] = "broadcast_message"
-    elif query.data == "admin_clear_received_messages":
-        # Afficher un message de traitement
-        await safe_edit_message(
-            query,
-            "🗑️ **Suppression en cours...**\n\n"
-            "Suppression des messages reçus par le bot...\n"
-            "Cela peut prendre quelques instants.",
-            parse_mode="Markdown"
-        )
-        
-        # Supprimer SEULEMENT les messages reçus par le bot (pas les menus)
-        users_data = load_users()
-        users_data["messages"] = []  # Vider la liste des messages reçus
-        save_users(users_data)
-        
-        # Afficher le résultat
-        await safe_edit_message(
-            query,
-            "✅ **Suppression terminée !**\n\n"
-            "🗑️ Tous les messages reçus ont été supprimés\n\n"
-            "Les menus du bot ont été conservés.",
-            parse_mode="Markdown"
-        )
-        
-        # Retourner au menu principal après 3 secondes
-        await asyncio.sleep(3)
-        
-        # Afficher le menu principal
-        users_data = load_users()
-        keyboard = [
-            [InlineKeyboardButton("📤 Envoyer Message à tous", callback_data="admin_broadcast_message")],
-            [InlineKeyboardButton("🗑️ Supprimer messages reçus", callback_data="admin_clear_received_messages")],
-            [InlineKeyboardButton("📊 Voir les messages reçus", callback_data="admin_view_messages")],
-            [InlineKeyboardButton("🔙 Retour au panneau admin", callback_data="admin_panel")]
-        ]
-        markup = InlineKeyboardMarkup(keyboard)
-        
-        await safe_edit_message(
-            query,
-            "📢 **Panel Message**\n\n"
-            f"*Utilisateurs enregistrés :* {len(users_data['users'])}\n"
-            f"*Messages reçus :* {len(users_data.get('messages', []))}\n\n"
-            "Choisissez une action :",
-            reply_markup=markup,
-            parse_mode="Markdown"
-        )
-        
-    elif query.data == "admin_clear_received_messages":
-        # Supprimer les messages reçus par le bot
-        users_data = load_users()
-        messages_count = len(users_data.get("messages", []))
-        
-        # Supprimer les messages stockés
-        users_data["messages"] = []
-        save_users(users_data)
-        
-        await safe_edit_message(
-            query,
-            f"✅ **Messages reçus supprimés !**\n\n"
-            f"🗑️ {messages_count} messages reçus supprimés\n\n"
-            "Les menus du bot ont été conservés.",
-            parse_mode="Markdown"
-        )
-        
-        # Retourner au menu principal après 3 secondes
-        await asyncio.sleep(3)
-        
-        # Afficher le menu principal
-        keyboard = [
-            [InlineKeyboardButton("📤 Envoyer Message à tous", callback_data="admin_broadcast_message")],
-            [InlineKeyboardButton("🗑️ Supprimer messages reçus", callback_data="admin_clear_received_messages")],
-            [InlineKeyboardButton("📊 Voir les messages reçus", callback_data="admin_view_messages")],
-            [InlineKeyboardButton("🔙 Retour au panneau admin", callback_data="admin_panel")]
-        ]
-        markup = InlineKeyboardMarkup(keyboard)
-        
-        await safe_edit_message(
-            query,
-            "📢 **Panel Message**\n\n"
-            f"*Utilisateurs enregistrés :* {len(users_data['users'])}\n"
-            f"*Messages reçus :* 0\n\n"
-            "Choisissez une action :",
-            reply_markup=markup,
-            parse_mode="Markdown"
-        )
-    elif query.data == "admin_view_messages":
-        users_data = load_users()
-        messages = users_data["messages"]
-        
-        if not messages:
-            keyboard = [[InlineKeyboardButton("🔙 Retour au panel message", callback_data="admin_message_panel")]]
-            markup = InlineKeyboardMarkup(keyboard)
-            await safe_edit_message(
-                query,
-                "📊 **Messages reçus**\n\n"
-                "Aucun message reçu pour le moment.",
-                reply_markup=markup,
-                parse_mode="Markdown"
-            )
-        else:
-            # Afficher les 10 derniers messages
-            recent_messages = messages[-10:]
-            message_text = "📊 **Messages reçus** (10 derniers)\n\n"
-            
-            for i, msg in enumerate(recent_messages, 1):
-                username = f"@{msg['username']}" if msg['username'] else "Sans @username"
-                name = f"{msg['first_name']} {msg['last_name']}".strip()
-                message_text += f"**{i}.** Message envoyé par {name} [{msg['user_id']}]\n"
-                message_text += f"#{msg['user_id']}\n"
-                message_text += f"• {username}\n"
-                message_text += f"Message: {msg['message'][:100]}{'...' if len(msg['message']) > 100 else ''}\n\n"
-            
-            # Créer des boutons pour chaque message
-            keyboard = []
-            for i, msg in enumerate(recent_messages, 1):
-                name = f"{msg['first_name']} {msg['last_name']}".strip()
-                # Bouton de sélection + bouton profil
-                keyboard.append([
-                    InlineKeyboardButton(f"☑️ Sélectionner {i}", callback_data=f"select_msg_{i}"),
-                    InlineKeyboardButton(f"👤 Profil {name}", url=f"tg://user?id={msg['user_id']}")
-                ])
-            
-            keyboard.append([
-                InlineKeyboardButton("🗑️ Supprimer sélectionnés", callback_data="delete_selected_messages"),
-                InlineKeyboardButton("✅ Tout sélectionner", callback_data="select_all_messages")
-            ])
-            keyboard.append([InlineKeyboardButton("🔙 Retour au panel message", callback_data="admin_message_panel")])
-            markup = InlineKeyboardMarkup(keyboard)
-            await safe_edit_message(
-                query,
-                message_text,
-                reply_markup=markup,
-                parse_mode="Markdown"
-            )
-    
+    keyboard = [
+        [InlineKeyboardButton("✏️ Modifier Texte d'accueil", callback_data="admin_edit_welcome_text")],
+        [InlineKeyboardButton("🖼️ Modifier Photo d'accueil", callback_data="admin_edit_welcome_photo")],
+        [InlineKeyboardButton("🗑️ Supprimer Photo d'accueil", callback_data="admin_delete_welcome_photo")],
+        [InlineKeyboardButton("🔙 Retour au panneau admin", callback_data="admin_panel")]
+    ]
+    markup = InlineKeyboardMarkup(keyboard)
+    await safe_edit_message(
+        query,
+        "✅ **Photo d'accueil supprimée !**\n\n"
+        f"*Texte d'accueil actuel :*\n{data.get('welcome_text', 'Aucun texte défini')}\n\n"
+        f"*Photo d'accueil :* ❌ Aucune photo",
+        reply_markup=markup,
+        parse_mode="Markdown"
+    )
+
+
+@admin_router.exact("admin_message_panel")
+async def admin_message_panel(query, context: ContextTypes.DEFAULT_TYPE):
+    total_users = user_store.count_users()
+    total_dead = user_store.count_dead()
+    total_messages = message_journal.count()
     
-    elif query.data == "admin_panel":
-        keyboard = [
-            [
-                InlineKeyboardButton("👥 Admin", callback_data="admin_manage_admins"),
-                InlineKeyboardButton("📋 Menu", callback_data="admin_menu")
-            ],
-            [
-                InlineKeyboardButton("💼 Nos Services", callback_data="admin_manage_nos_services"),
-                InlineKeyboardButton("📞 Contact", callback_data="admin_manage_contact")
-            ],
-            [InlineKeyboardButton("✉️ Nous Contacter", callback_data="admin_manage_nous_contacter")],
-            [InlineKeyboardButton("🖼️ Panel Admin Photo", callback_data="admin_photo_panel")],
-            [InlineKeyboardButton("📢 Message", callback_data="admin_message_panel")],
-            [InlineKeyboardButton("🚪 Quitter admin", callback_data="admin_quit")]
-        ]
-        markup = InlineKeyboardMarkup(keyboard)
-        await safe_edit_message(query, "⚙️ Panneau Admin :", reply_markup=markup)
+    keyboard = [
+        [InlineKeyboardButton("📤 Envoyer Message à tous", callback_data="admin_broadcast_message")],
+        [InlineKeyboardButton("🗑️ Supprimer messages reçus", callback_data="admin_clear_received_messages")],
+        [InlineKeyboardButton("📊 Voir les messages reçus", callback_data="admin_view_messages")],
+        [InlineKeyboardButton("🔙 Retour au panneau admin", callback_data="admin_panel")]
+    ]
+    markup = InlineKeyboardMarkup(keyboard)
+    await safe_edit_message(
+        query,
+        f"📢 **Panel Message**\n\n"
+        f"*Utilisateurs enregistrés :* {total_users}\n"
+        f"*Utilisateurs injoignables :* {total_dead}\n"
+        f"*Messages reçus :* {total_messages}\n\n"
+        "Choisissez une action :",
+        reply_markup=markup,
+        parse_mode="Markdown"
+    )
+
+
+@admin_router.exact("admin_broadcast_message")
+async def admin_broadcast_message(query, context: ContextTypes.DEFAULT_TYPE):
+    keyboard = [[InlineKeyboardButton("🔙 Retour au panel message", callback_data="admin_message_panel")]]
+    markup = InlineKeyboardMarkup(keyboard)
+    await safe_edit_message(
+        query,
+        "📤 **Envoi de message à tous les utilisateurs**\n\n"
+        "Envoie le message que tu veux diffuser à tous les utilisateurs :",
+        reply_markup=markup,
+        parse_mode="Markdown"
+    )
+    context.user_data["editing"] = "broadcast_message"
+
+
+@admin_router.exact("admin_clear_received_messages")
+async def admin_clear_received_messages(query, context: ContextTypes.DEFAULT_TYPE):
+    # Afficher un message de traitement
+    await safe_edit_message(
+        query,
+        "🗑️ **Suppression en cours...**\n\n"
+        "Suppression des messages reçus par le bot...\n"
+        "Cela peut prendre quelques instants.",
+        parse_mode="Markdown"
+    )
     
-    elif query.data == "admin_menu":
-        # Menu principal - Gestion des boutons principaux et des menus
-        keyboard = [
-            [InlineKeyboardButton("💼 Gérer Nos Services", callback_data="admin_manage_nos_services")],
-            [InlineKeyboardButton("📞 Gérer Contact", callback_data="admin_manage_contact")],
-            [InlineKeyboardButton("✉️ Gérer Nous Contacter", callback_data="admin_manage_nous_contacter")],
-            [InlineKeyboardButton("📋 Gérer les Menus", callback_data="admin_service")],
-            [InlineKeyboardButton("🔙 Retour au panneau admin", callback_data="admin_panel")]
-        ]
-        markup = InlineKeyboardMarkup(keyboard)
-        await safe_edit_message(
-            query,
-            "📋 **Menu - Gestion des Boutons**\n\n"
-            "Gérez les boutons principaux et les menus qui s'affichent dans la commande /start\n\n"
-            "Choisissez une action :",
-            reply_markup=markup,
-            parse_mode="Markdown"
-        )
+    # Supprimer SEULEMENT les messages reçus par le bot (pas les menus)
+    message_journal.clear()  # Vider la liste des messages reçus
     
-    elif query.data == "admin_service":
-        # Menu Service - Gestion des menus du /start
-        keyboard = [
-            [InlineKeyboardButton("📋 Voir les menus actuels", callback_data="admin_view_menus")],
-            [InlineKeyboardButton("➕ Ajouter un menu", callback_data="admin_add_menu")],
-            [InlineKeyboardButton("✏️ Modifier un menu", callback_data="admin_edit_menu")],
-            [InlineKeyboardButton("🗑️ Supprimer un menu", callback_data="admin_delete_menu")],
-            [InlineKeyboardButton("🔙 Retour au menu", callback_data="admin_menu")]
-        ]
-        markup = InlineKeyboardMarkup(keyboard)
-        await safe_edit_message(
-            query,
-            "⚙️ **Service - Gestion des Menus**\n\n"
-            "Gérez les menus qui s'affichent dans la commande /start\n\n"
-            "Choisissez une action :",
-            reply_markup=markup,
-            parse_mode="Markdown"
-        )
+    # Afficher le résultat
+    await safe_edit_message(
+        query,
+        "✅ **Suppression terminée !**\n\n"
+        "🗑️ Tous les messages reçus ont été supprimés\n\n"
+        "Les menus du bot ont été conservés.",
+        parse_mode="Markdown"
+    )
     
-    elif query.data == "admin_manage_nos_services":
-        # Gestion de Nos Services
-        data = load_data()
-        current_text = data.get("nos_services", "💼 Nos Services :\n1️⃣ Développement Web\n2️⃣ Design\n3️⃣ Marketing Digital")
-        current_photo = data.get("nos_services_photo")
-        photo_status = "✅ Photo définie" if current_photo else "❌ Aucune photo"
-        
-        keyboard = [
-            [InlineKeyboardButton("✏️ Modifier le texte", callback_data="admin_edit_nos_services_text")],
-            [InlineKeyboardButton("🖼️ Modifier la photo", callback_data="admin_edit_nos_services_photo")],
-            [InlineKeyboardButton("🗑️ Supprimer la photo", callback_data="admin_delete_nos_services_photo")],
-            [InlineKeyboardButton("🔙 Retour au menu", callback_data="admin_menu")]
-        ]
-        markup = InlineKeyboardMarkup(keyboard)
-        await safe_edit_message(
-            query,
-            f"💼 **Gestion de Nos Services**\n\n"
-            f"*Texte actuel :*\n{current_text}\n\n"
-            f"*Photo :* {photo_status}",
-            reply_markup=markup,
-            parse_mode="Markdown"
-        )
+    # Retourner au Panel Message après 3 secondes, sans bloquer le handler
+    ui_scheduler.later(message_key(query), 3, admin_message_panel, query, context)
+
+
+@admin_router.exact("admin_view_messages")
+async def admin_view_messages(query, context: ContextTypes.DEFAULT_TYPE):
+    """Première page (messages les plus récents) du visualiseur"""
+    context.user_data["message_cursor"] = {}
+    context.user_data["selected_messages"] = set()
+    await update_message_display(query, context)
+
+
+@admin_router.prefix("admin_messages_older_")
+async def admin_messages_older(query, context: ContextTypes.DEFAULT_TYPE, cursor: int):
+    context.user_data["message_cursor"] = {"before": cursor}
+    await update_message_display(query, context)
+
+
+@admin_router.prefix("admin_messages_newer_")
+async def admin_messages_newer(query, context: ContextTypes.DEFAULT_TYPE, cursor: int):
+    context.user_data["message_cursor"] = {"after": cursor}
+    await update_message_display(query, context)
+
+
+@admin_router.exact("admin_messages_filter")
+async def admin_messages_filter(query, context: ContextTypes.DEFAULT_TYPE):
+    keyboard = [[InlineKeyboardButton("🔙 Retour aux messages", callback_data="admin_view_messages")]]
+    markup = InlineKeyboardMarkup(keyboard)
+    await safe_edit_message(
+        query,
+        "🔎 **Filtrer les messages reçus**\n\n"
+        "Envoie un ID utilisateur et/ou une période :\n"
+        "`123456789` : messages d'un utilisateur\n"
+        "`2024-01-01` : depuis une date\n"
+        "`123456789 2024-01-01 2024-01-31` : un utilisateur sur une période",
+        reply_markup=markup,
+        parse_mode="Markdown"
+    )
+    context.user_data["editing"] = "message_filter"
+
+
+@admin_router.exact("admin_messages_unfilter")
+async def admin_messages_unfilter(query, context: ContextTypes.DEFAULT_TYPE):
+    context.user_data.pop("message_filter", None)
+    await admin_view_messages(query, context)
+
+
+@admin_router.exact("admin_panel")
+async def admin_panel(query, context: ContextTypes.DEFAULT_TYPE):
+    keyboard = [
+        [
+            InlineKeyboardButton("👥 Admin", callback_data="admin_manage_admins"),
+            InlineKeyboardButton("📋 Menu", callback_data="admin_menu")
+        ],
+        [
+            InlineKeyboardButton("💼 Nos Services", callback_data="admin_manage_nos_services"),
+            InlineKeyboardButton("📞 Contact", callback_data="admin_manage_contact")
+        ],
+        [InlineKeyboardButton("✉️ Nous Contacter", callback_data="admin_manage_nous_contacter")],
+        [InlineKeyboardButton("🖼️ Panel Admin Photo", callback_data="admin_photo_panel")],
+        [InlineKeyboardButton("📢 Message", callback_data="admin_message_panel")],
+        [InlineKeyboardButton("🚪 Quitter admin", callback_data="admin_quit")]
+    ]
+    markup = InlineKeyboardMarkup(keyboard)
+    await safe_edit_message(query, "⚙️ Panneau Admin :", reply_markup=markup)
+
+
+@admin_router.exact("admin_menu")
+async def admin_menu(query, context: ContextTypes.DEFAULT_TYPE):
+    """Menu principal - Gestion des boutons principaux et des menus"""
+    keyboard = [
+        [InlineKeyboardButton("💼 Gérer Nos Services", callback_data="admin_manage_nos_services")],
+        [InlineKeyboardButton("📞 Gérer Contact", callback_data="admin_manage_contact")],
+        [InlineKeyboardButton("✉️ Gérer Nous Contacter", callback_data="admin_manage_nous_contacter")],
+        [InlineKeyboardButton("📋 Gérer les Menus", callback_data="admin_service")],
+        [InlineKeyboardButton("🔙 Retour au panneau admin", callback_data="admin_panel")]
+    ]
+    markup = InlineKeyboardMarkup(keyboard)
+    await safe_edit_message(
+        query,
+        "📋 **Menu - Gestion des Boutons**\n\n"
+        "Gérez les boutons principaux et les menus qui s'affichent dans la commande /start\n\n"
+        "Choisissez une action :",
+        reply_markup=markup,
+        parse_mode="Markdown"
+    )
+
+
+@admin_router.exact("admin_service")
+async def admin_service(query, context: ContextTypes.DEFAULT_TYPE):
+    """Menu Service - Gestion des menus du /start"""
+    keyboard = [
+        [InlineKeyboardButton("📋 Voir les menus actuels", callback_data="admin_view_menus")],
+        [InlineKeyboardButton("➕ Ajouter un menu", callback_data="admin_add_menu")],
+        [InlineKeyboardButton("✏️ Modifier un menu", callback_data="admin_edit_menu")],
+        [InlineKeyboardButton("🗑️ Supprimer un menu", callback_data="admin_delete_menu")],
+        [InlineKeyboardButton("🔙 Retour au menu", callback_data="admin_menu")]
+    ]
+    markup = InlineKeyboardMarkup(keyboard)
+    await safe_edit_message(
+        query,
+        "⚙️ **Service - Gestion des Menus**\n\n"
+        "Gérez les menus qui s'affichent dans la commande /start\n\n"
+        "Choisissez une action :",
+        reply_markup=markup,
+        parse_mode="Markdown"
+    )
+
+
+@admin_router.exact("admin_manage_nos_services")
+async def admin_manage_nos_services(query, context: ContextTypes.DEFAULT_TYPE):
+    """Gestion de Nos Services"""
+    data = content_store.get()
     
-    elif query.data == "admin_edit_nos_services_text":
-        keyboard = [[InlineKeyboardButton("🔙 Retour", callback_data="admin_manage_nos_services")]]
-        markup = InlineKeyboardMarkup(keyboard)
-        await safe_edit_message(
-            query,
-            "✏️ **Modification du texte Nos Services**\n\n"
-            "Envoie le nouveau texte pour *Nos Services* :\n\n"
-            f"*Texte actuel :*\n{data.get('nos_services', 'Aucun texte défini')}",
-            reply_markup=markup,
-            parse_mode="Markdown"
-        )
-        context.user_data["editing"] = "nos_services"
+    current_text = data.get("nos_services", "💼 Nos Services :\n1️⃣ Développement Web\n2️⃣ Design\n3️⃣ Marketing Digital")
+    current_photo = data.get("nos_services_photo")
+    photo_status = "✅ Photo définie" if current_photo else "❌ Aucune photo"
     
-    elif query.data == "admin_edit_nos_services_photo":
-        keyboard = [[InlineKeyboardButton("🔙 Retour", callback_data="admin_manage_nos_services")]]
-        markup = InlineKeyboardMarkup(keyboard)
-        await safe_edit_message(
-            query,
-            "🖼️ **Modification de la photo Nos Services**\n\n"
-            "Envoie la nouvelle photo pour *Nos Services* :\n\n"
-            "*Note :* Envoie une image en tant que photo (pas en tant que fichier)",
-            reply_markup=markup,
-            parse_mode="Markdown"
-        )
-        context.user_data["editing"] = "nos_services_photo"
+    keyboard = [
+        [InlineKeyboardButton("✏️ Modifier le texte", callback_data="admin_edit_nos_services_text")],
+        [InlineKeyboardButton("🖼️ Modifier la photo", callback_data="admin_edit_nos_services_photo")],
+        [InlineKeyboardButton("🗑️ Supprimer la photo", callback_data="admin_delete_nos_services_photo")],
+        [InlineKeyboardButton("🔙 Retour au menu", callback_data="admin_menu")]
+    ]
+    markup = InlineKeyboardMarkup(keyboard)
+    await safe_edit_message(
+        query,
+        f"💼 **Gestion de Nos Services**\n\n"
+        f"*Texte actuel :*\n{current_text}\n\n"
+        f"*Photo :* {photo_status}",
+        reply_markup=markup,
+        parse_mode="Markdown"
+    )
+
+
+@admin_router.exact("admin_edit_nos_services_text")
+async def admin_edit_nos_services_text(query, context: ContextTypes.DEFAULT_TYPE):
+    data = content_store.get()
     
-    elif query.data == "admin_delete_nos_services_photo":
+    keyboard = [[InlineKeyboardButton("🔙 Retour", callback_data="admin_manage_nos_services")]]
+    markup = InlineKeyboardMarkup(keyboard)
+    await safe_edit_message(
+        query,
+        "✏️ **Modification du texte Nos Services**\n\n"
+        "Envoie le nouveau texte pour *Nos Services* :\n\n"
+        f"*Texte actuel :*\n{data.get('nos_services', 'Aucun texte défini')}",
+        reply_markup=markup,
+        parse_mode="Markdown"
+    )
+    context.user_data["editing"] = "nos_services"
+
+
+@admin_router.exact("admin_edit_nos_services_photo")
+async def admin_edit_nos_services_photo(query, context: ContextTypes.DEFAULT_TYPE):
+    keyboard = [[InlineKeyboardButton("🔙 Retour", callback_data="admin_manage_nos_services")]]
+    markup = InlineKeyboardMarkup(keyboard)
+    await safe_edit_message(
+        query,
+        "🖼️ **Modification de la photo Nos Services**\n\n"
+        "Envoie la nouvelle photo pour *Nos Services* :\n\n"
+        "*Note :* Envoie une image en tant que photo (pas en tant que fichier)",
+        reply_markup=markup,
+        parse_mode="Markdown"
+    )
+    context.user_data["editing"] = "nos_services_photo"
+
+
+@admin_router.exact("admin_delete_nos_services_photo")
+async def admin_delete_nos_services_photo(query, context: ContextTypes.DEFAULT_TYPE):
+    async with content_store.edit() as data:
         data["nos_services_photo"] = None
-        save_data(data)
-        keyboard = [
-            [InlineKeyboardButton("✏️ Modifier le texte", callback_data="admin_edit_nos_services_text")],
-            [InlineKeyboardButton("🖼️ Modifier la photo", callback_data="admin_edit_nos_services_photo")],
-            [InlineKeyboardButton("🗑️ Supprimer la photo", callback_data="admin_delete_nos_services_photo")],
-            [InlineKeyboardButton("🔙 Retour au menu", callback_data="admin_menu")]
-        ]
-        markup = InlineKeyboardMarkup(keyboard)
-        await safe_edit_message(
-            query,
-            "✅ **Photo Nos Services supprimée !**\n\n"
-            f"*Texte actuel :*\n{data.get('nos_services', 'Aucun texte défini')}\n\n"
-            f"*Photo :* ❌ Aucune photo",
-            reply_markup=markup,
-            parse_mode="Markdown"
-        )
-    
-    elif query.data == "admin_manage_contact":
-        # Gestion de Contact
-        data = load_data()
-        current_text = data.get("contact", "📞 Contactez-nous : contact@monentreprise.com\nTéléphone : +33 6 12 34 56 78")
-        current_photo = data.get("contact_photo")
-        photo_status = "✅ Photo définie" if current_photo else "❌ Aucune photo"
-        
-        keyboard = [
-            [InlineKeyboardButton("✏️ Modifier le texte", callback_data="admin_edit_contact_text")],
-            [InlineKeyboardButton("🖼️ Modifier la photo", callback_data="admin_edit_contact_photo")],
-            [InlineKeyboardButton("🗑️ Supprimer la photo", callback_data="admin_delete_contact_photo")],
-            [InlineKeyboardButton("🔙 Retour au menu", callback_data="admin_menu")]
-        ]
-        markup = InlineKeyboardMarkup(keyboard)
-        await safe_edit_message(
-            query,
-            f"📞 **Gestion de Contact**\n\n"
-            f"*Texte actuel :*\n{current_text}\n\n"
-            f"*Photo :* {photo_status}",
-            reply_markup=markup,
-            parse_mode="Markdown"
-        )
+    keyboard = [
+        [InlineKeyboardButton("✏️ Modifier le texte", callback_data="admin_edit_nos_services_text")],
+        [InlineKeyboardButton("🖼️ Modifier la photo", callback_data="admin_edit_nos_services_photo")],
+        [InlineKeyboardButton("🗑️ Supprimer la photo", callback_data="admin_delete_nos_services_photo")],
+        [InlineKeyboardButton("🔙 Retour au menu", callback_data="admin_menu")]
+    ]
+    markup = InlineKeyboardMarkup(keyboard)
+    await safe_edit_message(
+        query,
+        "✅ **Photo Nos Services supprimée !**\n\n"
+        f"*Texte actuel :*\n{data.get('nos_services', 'Aucun texte défini')}\n\n"
+        f"*Photo :* ❌ Aucune photo",
+        reply_markup=markup,
+        parse_mode="Markdown"
+    )
+
+
+@admin_router.exact("admin_manage_contact")
+async def admin_manage_contact(query, context: ContextTypes.DEFAULT_TYPE):
+    """Gestion de Contact"""
+    data = content_store.get()
     
-    elif query.data == "admin_edit_contact_text":
-        keyboard = [[InlineKeyboardButton("🔙 Retour", callback_data="admin_manage_contact")]]
-        markup = InlineKeyboardMarkup(keyboard)
-        await safe_edit_message(
-            query,
-            "✏️ **Modification du texte Contact**\n\n"
-            "Envoie le nouveau texte pour *Contact* :\n\n"
-            f"*Texte actuel :*\n{data.get('contact', 'Aucun texte défini')}",
-            reply_markup=markup,
-            parse_mode="Markdown"
-        )
-        context.user_data["editing"] = "contact"
+    current_text = data.get("contact", "📞 Contactez-nous : contact@monentreprise.com\nTéléphone : +33 6 12 34 56 78")
+    current_photo = data.get("contact_photo")
+    photo_status = "✅ Photo définie" if current_photo else "❌ Aucune photo"
     
-    elif query.data == "admin_edit_contact_photo":
-        keyboard = [[InlineKeyboardButton("🔙 Retour", callback_data="admin_manage_contact")]]
-        markup = InlineKeyboardMarkup(keyboard)
-        await safe_edit_message(
-            query,
-            "🖼️ **Modification de la photo Contact**\n\n"
-            "Envoie la nouvelle photo pour *Contact* :\n\n"
-            "*Note :* Envoie une image en tant que photo (pas en tant que fichier)",
-            reply_markup=markup,
-            parse_mode="Markdown"
-        )
-        context.user_data["editing"] = "contact_photo"
+    keyboard = [
+        [InlineKeyboardButton("✏️ Modifier le texte", callback_data="admin_edit_contact_text")],
+        [InlineKeyboardButton("🖼️ Modifier la photo", callback_data="admin_edit_contact_photo")],
+        [InlineKeyboardButton("🗑️ Supprimer la photo", callback_data="admin_delete_contact_photo")],
+        [InlineKeyboardButton("🔙 Retour au menu", callback_data="admin_menu")]
+    ]
+    markup = InlineKeyboardMarkup(keyboard)
+    await safe_edit_message(
+        query,
+        f"📞 **Gestion de Contact**\n\n"
+        f"*Texte actuel :*\n{current_text}\n\n"
+        f"*Photo :* {photo_status}",
+        reply_markup=markup,
+        parse_mode="Markdown"
+    )
+
+
+@admin_router.exact("admin_edit_contact_text")
+async def admin_edit_contact_text(query, context: ContextTypes.DEFAULT_TYPE):
+    data = content_store.get()
     
-    elif query.data == "admin_delete_contact_photo":
+    keyboard = [[InlineKeyboardButton("🔙 Retour", callback_data="admin_manage_contact")]]
+    markup = InlineKeyboardMarkup(keyboard)
+    await safe_edit_message(
+        query,
+        "✏️ **Modification du texte Contact**\n\n"
+        "Envoie le nouveau texte pour *Contact* :\n\n"
+        f"*Texte actuel :*\n{data.get('contact', 'Aucun texte défini')}",
+        reply_markup=markup,
+        parse_mode="Markdown"
+    )
+    context.user_data["editing"] = "contact"
+
+
+@admin_router.exact("admin_edit_contact_photo")
+async def admin_edit_contact_photo(query, context: ContextTypes.DEFAULT_TYPE):
+    keyboard = [[InlineKeyboardButton("🔙 Retour", callback_data="admin_manage_contact")]]
+    markup = InlineKeyboardMarkup(keyboard)
+    await safe_edit_message(
+        query,
+        "🖼️ **Modification de la photo Contact**\n\n"
+        "Envoie la nouvelle photo pour *Contact* :\n\n"
+        "*Note :* Envoie une image en tant que photo (pas en tant que fichier)",
+        reply_markup=markup,
+        parse_mode="Markdown"
+    )
+    context.user_data["editing"] = "contact_photo"
+
+
+@admin_router.exact("admin_delete_contact_photo")
+async def admin_delete_contact_photo(query, context: ContextTypes.DEFAULT_TYPE):
+    async with content_store.edit() as data:
         data["contact_photo"] = None
-        save_data(data)
-        keyboard = [
-            [InlineKeyboardButton("✏️ Modifier le texte", callback_data="admin_edit_contact_text")],
-            [InlineKeyboardButton("🖼️ Modifier la photo", callback_data="admin_edit_contact_photo")],
-            [InlineKeyboardButton("🗑️ Supprimer la photo", callback_data="admin_delete_contact_photo")],
-            [InlineKeyboardButton("🔙 Retour au menu", callback_data="admin_menu")]
-        ]
-        markup = InlineKeyboardMarkup(keyboard)
-        await safe_edit_message(
-            query,
-            "✅ **Photo Contact supprimée !**\n\n"
-            f"*Texte actuel :*\n{data.get('contact', 'Aucun texte défini')}\n\n"
-            f"*Photo :* ❌ Aucune photo",
-            reply_markup=markup,
-            parse_mode="Markdown"
-        )
+    keyboard = [
+        [InlineKeyboardButton("✏️ Modifier le texte", callback_data="admin_edit_contact_text")],
+        [InlineKeyboardButton("🖼️ Modifier la photo", callback_data="admin_edit_contact_photo")],
+        [InlineKeyboardButton("🗑️ Supprimer la photo", callback_data="admin_delete_contact_photo")],
+        [InlineKeyboardButton("🔙 Retour au menu", callback_data="admin_menu")]
+    ]
+    markup = InlineKeyboardMarkup(keyboard)
+    await safe_edit_message(
+        query,
+        "✅ **Photo Contact supprimée !**\n\n"
+        f"*Texte actuel :*\n{data.get('contact', 'Aucun texte défini')}\n\n"
+        f"*Photo :* ❌ Aucune photo",
+        reply_markup=markup,
+        parse_mode="Markdown"
+    )
+
+
+@admin_router.exact("admin_manage_nous_contacter")
+async def admin_manage_nous_contacter(query, context: ContextTypes.DEFAULT_TYPE):
+    """Gestion de Nous Contacter"""
+    data = content_store.get()
     
-    elif query.data == "admin_manage_nous_contacter":
-        # Gestion de Nous Contacter
-        data = load_data()
-        current_text = data.get("nous_contacter", "✉️ Nous Contacter :\n\nEnvoyez-nous un message et nous vous répondrons rapidement !")
-        current_photo = data.get("nous_contacter_photo")
-        photo_status = "✅ Photo définie" if current_photo else "❌ Aucune photo"
-        
-        keyboard = [
-            [InlineKeyboardButton("✏️ Modifier le texte", callback_data="admin_edit_nous_contacter_text")],
-            [InlineKeyboardButton("🖼️ Modifier la photo", callback_data="admin_edit_nous_contacter_photo")],
-            [InlineKeyboardButton("🗑️ Supprimer la photo", callback_data="admin_delete_nous_contacter_photo")],
-            [InlineKeyboardButton("🔙 Retour au menu", callback_data="admin_menu")]
-        ]
-        markup = InlineKeyboardMarkup(keyboard)
-        await safe_edit_message(
-            query,
-            f"✉️ **Gestion de Nous Contacter**\n\n"
-            f"*Texte actuel :*\n{current_text}\n\n"
-            f"*Photo :* {photo_status}",
-            reply_markup=markup,
-            parse_mode="Markdown"
-        )
+    current_text = data.get("nous_contacter", "✉️ Nous Contacter :\n\nEnvoyez-nous un message et nous vous répondrons rapidement !")
+    current_photo = data.get("nous_contacter_photo")
+    photo_status = "✅ Photo définie" if current_photo else "❌ Aucune photo"
     
-    elif query.data == "admin_edit_nous_contacter_text":
-        keyboard = [[InlineKeyboardButton("🔙 Retour", callback_data="admin_manage_nous_contacter")]]
-        markup = InlineKeyboardMarkup(keyboard)
-        await safe_edit_message(
-            query,
-            "✏️ **Modification du texte Nous Contacter**\n\n"
-            "Envoie le nouveau texte pour *Nous Contacter* :\n\n"
-            f"*Texte actuel :*\n{data.get('nous_contacter', 'Aucun texte défini')}",
-            reply_markup=markup,
-            parse_mode="Markdown"
-        )
-        context.user_data["editing"] = "nous_contacter"
-    
-    elif query.data == "admin_edit_nous_contacter_photo":
-        keyboard = [[InlineKeyboardButton("🔙 Retour", callback_data="admin_manage_nous_contacter")]]
-        markup = InlineKeyboardMarkup(keyboard)
-        await safe_edit_message(
-            query,
-            "🖼️ **Modification de la photo Nous Contacter**\n\n"
-            "Envoie la nouvelle photo pour *Nous Contacter* :\n\n"
-            "*Note :* Envoie une image en tant que photo (pas en tant que fichier)",
-            reply_markup=markup,
-            parse_mode="Markdown"
-        )
-        context.user_data["editing"] = "nous_contacter_photo"
+    keyboard = [
+        [InlineKeyboardButton("✏️ Modifier le texte", callback_data="admin_edit_nous_contacter_text")],
+        [InlineKeyboardButton("🖼️ Modifier la photo", callback_data="admin_edit_nous_contacter_photo")],
+        [InlineKeyboardButton("🗑️ Supprimer la photo", callback_data="admin_delete_nous_contacter_photo")],
+        [InlineKeyboardButton("🔙 Retour au menu", callback_data="admin_menu")]
+    ]
+    markup = InlineKeyboardMarkup(keyboard)
+    await safe_edit_message(
+        query,
+        f"✉️ **Gestion de Nous Contacter**\n\n"
+        f"*Texte actuel :*\n{current_text}\n\n"
+        f"*Photo :* {photo_status}",
+        reply_markup=markup,
+        parse_mode="Markdown"
+    )
+
+
+@admin_router.exact("admin_edit_nous_contacter_text")
+async def admin_edit_nous_contacter_text(query, context: ContextTypes.DEFAULT_TYPE):
+    data = content_store.get()
     
-    elif query.data == "admin_delete_nous_contacter_photo":
+    keyboard = [[InlineKeyboardButton("🔙 Retour", callback_data="admin_manage_nous_contacter")]]
+    markup = InlineKeyboardMarkup(keyboard)
+    await safe_edit_message(
+        query,
+        "✏️ **Modification du texte Nous Contacter**\n\n"
+        "Envoie le nouveau texte pour *Nous Contacter* :\n\n"
+        f"*Texte actuel :*\n{data.get('nous_contacter', 'Aucun texte défini')}",
+        reply_markup=markup,
+        parse_mode="Markdown"
+    )
+    context.user_data["editing"] = "nous_contacter"
+
+
+@admin_router.exact("admin_edit_nous_contacter_photo")
+async def admin_edit_nous_contacter_photo(query, context: ContextTypes.DEFAULT_TYPE):
+    keyboard = [[InlineKeyboardButton("🔙 Retour", callback_data="admin_manage_nous_contacter")]]
+    markup = InlineKeyboardMarkup(keyboard)
+    await safe_edit_message(
+        query,
+        "🖼️ **Modification de la photo Nous Contacter**\n\n"
+        "Envoie la nouvelle photo pour *Nous Contacter* :\n\n"
+        "*Note :* Envoie une image en tant que photo (pas en tant que fichier)",
+        reply_markup=markup,
+        parse_mode="Markdown"
+    )
+    context.user_data["editing"] = "nous_contacter_photo"
+
+
+@admin_router.exact("admin_delete_nous_contacter_photo")
+async def admin_delete_nous_contacter_photo(query, context: ContextTypes.DEFAULT_TYPE):
+    async with content_store.edit() as data:
         data["nous_contacter_photo"] = None
-        save_data(data)
-        keyboard = [
-            [InlineKeyboardButton("✏️ Modifier le texte", callback_data="admin_edit_nous_contacter_text")],
-            [InlineKeyboardButton("🖼️ Modifier la photo", callback_data="admin_edit_nous_contacter_photo")],
-            [InlineKeyboardButton("🗑️ Supprimer la photo", callback_data="admin_delete_nous_contacter_photo")],
-            [InlineKeyboardButton("🔙 Retour au menu", callback_data="admin_menu")]
-        ]
-        markup = InlineKeyboardMarkup(keyboard)
-        await safe_edit_message(
-            query,
-            "✅ **Photo Nous Contacter supprimée !**\n\n"
-            f"*Texte actuel :*\n{data.get('nous_contacter', 'Aucun texte défini')}\n\n"
-            f"*Photo :* ❌ Aucune photo",
-            reply_markup=markup,
-            parse_mode="Markdown"
-        )
-    
-    elif query.data == "admin_view_menus":
-        # Afficher les menus actuels
-        data = load_data()
-        services = data.get("services", [])
-        
-        # Si services est une chaîne, la convertir en liste
-        if isinstance(services, str):
-            services = []
-        
-        if not services:
-            message_text = "📋 **Menus actuels**\n\n❌ Aucun menu configuré"
-        else:
-            message_text = "📋 **Menus actuels**\n\n"
-            for i, service in enumerate(services, 1):
-                message_text += f"**{i}.** {service}\n"
-        
-        keyboard = [[InlineKeyboardButton("🔙 Retour au Service", callback_data="admin_service")]]
-        markup = InlineKeyboardMarkup(keyboard)
-        await safe_edit_message(query, message_text, reply_markup=markup, parse_mode="Markdown")
-    
-    elif query.data == "admin_add_menu":
-        # Ajouter un nouveau menu
-        keyboard = [[InlineKeyboardButton("🔙 Retour au Service", callback_data="admin_service")]]
-        markup = InlineKeyboardMarkup(keyboard)
-        await safe_edit_message(
-            query,
-            "➕ **Ajouter un Menu**\n\n"
-            "Envoyez le texte du nouveau menu que vous voulez ajouter :",
-            reply_markup=markup,
-            parse_mode="Markdown"
-        )
-        context.user_data["editing"] = "add_menu"
-    
-    elif query.data == "admin_edit_menu":
-        # Modifier un menu existant
-        data = load_data()
-        services = data.get("services", [])
-        
-        # Si services est une chaîne, la convertir en liste
-        if isinstance(services, str):
-            services = []
-        
-        if not services:
-            keyboard = [[InlineKeyboardButton("🔙 Retour au Service", callback_data="admin_service")]]
-            markup = InlineKeyboardMarkup(keyboard)
-            await safe_edit_message(
-                query,
-                "✏️ **Modifier un Menu**\n\n❌ Aucun menu à modifier",
-                reply_markup=markup,
-                parse_mode="Markdown"
-            )
-            return
-        
-        # Créer les boutons pour chaque menu
-        keyboard = []
-        for i, service in enumerate(services):
-            # Si c'est un dictionnaire, afficher le nom, sinon le texte complet
-            if isinstance(service, dict):
-                service_name = service.get("name", f"Menu {i+1}")
-            else:
-                service_name = str(service)
-            keyboard.append([InlineKeyboardButton(f"✏️ {service_name[:30]}...", callback_data=f"admin_edit_menu_{i}")])
-        keyboard.append([InlineKeyboardButton("🔙 Retour au Service", callback_data="admin_service")])
-        
-        markup = InlineKeyboardMarkup(keyboard)
-        message_text = "✏️ **Modifier un Menu**\n\nChoisissez le menu à modifier :"
-        await safe_edit_message(query, message_text, reply_markup=markup, parse_mode="Markdown")
-    
-    elif query.data == "admin_delete_menu":
-        # Supprimer un menu
-        data = load_data()
-        services = data.get("services", [])
-        
-        # Si services est une chaîne, la convertir en liste
-        if isinstance(services, str):
-            services = []
-        
-        if not services:
-            keyboard = [[InlineKeyboardButton("🔙 Retour au Service", callback_data="admin_service")]]
-            markup = InlineKeyboardMarkup(keyboard)
-            await safe_edit_message(
-                query,
-                "🗑️ **Supprimer un Menu**\n\n❌ Aucun menu à supprimer",
-                reply_markup=markup,
-                parse_mode="Markdown"
-            )
-            return
-        
-        # Créer les boutons pour chaque menu
-        keyboard = []
-        for i, service in enumerate(services):
-            if isinstance(service, dict):
-                service_name = service.get("name", f"Menu {i+1}")
-            else:
-                service_name = str(service)
-            keyboard.append([InlineKeyboardButton(f"🗑️ {service_name[:30]}...", callback_data=f"admin_delete_menu_{i}")])
-        keyboard.append([InlineKeyboardButton("🔙 Retour au Service", callback_data="admin_service")])
-        
-        markup = InlineKeyboardMarkup(keyboard)
-        message_text = "🗑️ **Supprimer un Menu**\n\nChoisissez le menu à supprimer :"
-        await safe_edit_message(query, message_text, reply_markup=markup, parse_mode="Markdown")
-    
-    elif query.data.startswith("admin_edit_menu_"):
-        # Modifier un menu spécifique
-        menu_index = int(query.data.split("_")[-1])
-        data = load_data()
-        services = data.get("services", [])
-        
-        # Si services est une chaîne, la convertir en liste
-        if isinstance(services, str):
-            services = []
-        
-        if 0 <= menu_index < len(services):
-            context.user_data["editing_menu_index"] = menu_index
-            
-            # Afficher les options de modification
-            current_service = services[menu_index]
-            if isinstance(current_service, dict):
-                service_name = current_service.get("name", "Sans nom")
-                service_text = current_service.get("text", "Aucun texte")
-                service_photo = current_service.get("photo", None)
-            else:
-                service_name = str(current_service)
-                service_text = str(current_service)
-                service_photo = None
-            
-            keyboard = [
-                [InlineKeyboardButton("📝 Modifier le nom", callback_data=f"admin_edit_menu_name_{menu_index}")],
-                [InlineKeyboardButton("📄 Modifier le texte", callback_data=f"admin_edit_menu_text_{menu_index}")],
-                [InlineKeyboardButton("🖼️ Modifier la photo", callback_data=f"admin_edit_menu_photo_{menu_index}")],
-                [InlineKeyboardButton("🔙 Retour au Service", callback_data="admin_service")]
-            ]
-            markup = InlineKeyboardMarkup(keyboard)
-            
-            photo_info = "\n🖼️ Photo : Oui" if service_photo else "\n🖼️ Photo : Non"
-            await safe_edit_message(
-                query,
-                f"✏️ **Modifier le Menu**\n\n"
-                f"**Nom actuel :** {service_name}\n"
-                f"**Texte actuel :** {service_text[:100]}{'...' if len(service_text) > 100 else ''}{photo_info}\n\n"
-                f"Choisissez ce que vous voulez modifier :",
-                reply_markup=markup,
-                parse_mode="Markdown"
-            )
-        else:
-            await query.answer("❌ Menu introuvable")
+    keyboard = [
+        [InlineKeyboardButton("✏️ Modifier le texte", callback_data="admin_edit_nous_contacter_text")],
+        [InlineKeyboardButton("🖼️ Modifier la photo", callback_data="admin_edit_nous_contacter_photo")],
+        [InlineKeyboardButton("🗑️ Supprimer la photo", callback_data="admin_delete_nous_contacter_photo")],
+        [InlineKeyboardButton("🔙 Retour au menu", callback_data="admin_menu")]
+    ]
+    markup = InlineKeyboardMarkup(keyboard)
+    await safe_edit_message(
+        query,
+        "✅ **Photo Nous Contacter supprimée !**\n\n"
+        f"*Texte actuel :*\n{data.get('nous_contacter', 'Aucun texte défini')}\n\n"
+        f"*Photo :* ❌ Aucune photo",
+        reply_markup=markup,
+        parse_mode="Markdown"
+    )
+
+
+@admin_router.exact("admin_view_menus")
+async def admin_view_menus(query, context: ContextTypes.DEFAULT_TYPE):
+    """Afficher les menus actuels"""
+    data = content_store.get()
     
-    elif query.data.startswith("admin_edit_menu_name_"):
-        # Modifier le nom d'un menu
-        menu_index = int(query.data.split("_")[-1])
-        context.user_data["editing_menu_index"] = menu_index
-        context.user_data["editing_menu_field"] = "name"
-        
-        keyboard = [[InlineKeyboardButton("🔙 Retour", callback_data=f"admin_edit_menu_{menu_index}")]]
+    services = data.get("services", [])
+    
+    # Si services est une chaîne, la convertir en liste
+    if isinstance(services, str):
+        services = []
+    
+    if not services:
+        message_text = "📋 **Menus actuels**\n\n❌ Aucun menu configuré"
+    else:
+        message_text = "📋 **Menus actuels**\n\n"
+        for i, service in enumerate(services, 1):
+            message_text += f"**{i}.** {service}\n"
+    
+    keyboard = [[InlineKeyboardButton("🔙 Retour au Service", callback_data="admin_service")]]
+    markup = InlineKeyboardMarkup(keyboard)
+    await safe_edit_message(query, message_text, reply_markup=markup, parse_mode="Markdown")
+
+
+@admin_router.exact("admin_add_menu")
+async def admin_add_menu(query, context: ContextTypes.DEFAULT_TYPE):
+    """Ajouter un nouveau menu"""
+    keyboard = [[InlineKeyboardButton("🔙 Retour au Service", callback_data="admin_service")]]
+    markup = InlineKeyboardMarkup(keyboard)
+    await safe_edit_message(
+        query,
+        "➕ **Ajouter un Menu**\n\n"
+        "Envoyez le texte du nouveau menu que vous voulez ajouter :",
+        reply_markup=markup,
+        parse_mode="Markdown"
+    )
+    context.user_data["editing"] = "add_menu"
+
+
+@admin_router.exact("admin_edit_menu")
+async def admin_edit_menu(query, context: ContextTypes.DEFAULT_TYPE):
+    """Modifier un menu existant"""
+    data = content_store.get()
+    
+    services = data.get("services", [])
+    
+    # Si services est une chaîne, la convertir en liste
+    if isinstance(services, str):
+        services = []
+    
+    if not services:
+        keyboard = [[InlineKeyboardButton("🔙 Retour au Service", callback_data="admin_service")]]
         markup = InlineKeyboardMarkup(keyboard)
         await safe_edit_message(
             query,
-            "📝 **Modifier le nom du menu**\n\nEnvoyez le nouveau nom pour ce menu :",
+            "✏️ **Modifier un Menu**\n\n❌ Aucun menu à modifier",
             reply_markup=markup,
             parse_mode="Markdown"
         )
-        context.user_data["editing"] = "edit_menu_field"
+        return
     
-    elif query.data.startswith("admin_edit_menu_text_"):
-        # Modifier le texte d'un menu
-        menu_index = int(query.data.split("_")[-1])
-        context.user_data["editing_menu_index"] = menu_index
-        context.user_data["editing_menu_field"] = "text"
-        
-        keyboard = [[InlineKeyboardButton("🔙 Retour", callback_data=f"admin_edit_menu_{menu_index}")]]
+    # Créer les boutons pour chaque menu
+    keyboard = []
+    for i, service in enumerate(services):
+        # Si c'est un dictionnaire, afficher le nom, sinon le texte complet
+        if isinstance(service, dict):
+            service_name = service.get("name", f"Menu {i+1}")
+        else:
+            service_name = str(service)
+        keyboard.append([InlineKeyboardButton(f"✏️ {service_name[:30]}...", callback_data=f"admin_edit_menu_{i}")])
+    keyboard.append([InlineKeyboardButton("🔙 Retour au Service", callback_data="admin_service")])
+    
+    markup = InlineKeyboardMarkup(keyboard)
+    message_text = "✏️ **Modifier un Menu**\n\nChoisissez le menu à modifier :"
+    await safe_edit_message(query, message_text, reply_markup=markup, parse_mode="Markdown")
+
+
+@admin_router.exact("admin_delete_menu")
+async def admin_delete_menu(query, context: ContextTypes.DEFAULT_TYPE):
+    """Supprimer un menu"""
+    data = content_store.get()
+    
+    services = data.get("services", [])
+    
+    # Si services est une chaîne, la convertir en liste
+    if isinstance(services, str):
+        services = []
+    
+    if not services:
+        keyboard = [[InlineKeyboardButton("🔙 Retour au Service", callback_data="admin_service")]]
         markup = InlineKeyboardMarkup(keyboard)
         await safe_edit_message(
             query,
-            "📄 **Modifier le texte du menu**\n\nEnvoyez le nouveau texte pour ce menu :",
+            "🗑️ **Supprimer un Menu**\n\n❌ Aucun menu à supprimer",
             reply_markup=markup,
             parse_mode="Markdown"
         )
-        context.user_data["editing"] = "edit_menu_field"
+        return
+    
+    # Créer les boutons pour chaque menu
+    keyboard = []
+    for i, service in enumerate(services):
+        if isinstance(service, dict):
+            service_name = service.get("name", f"Menu {i+1}")
+        else:
+            service_name = str(service)
+        keyboard.append([InlineKeyboardButton(f"🗑️ {service_name[:30]}...", callback_data=f"admin_delete_menu_{i}")])
+    keyboard.append([InlineKeyboardButton("🔙 Retour au Service", callback_data="admin_service")])
+    
+    markup = InlineKeyboardMarkup(keyboard)
+    message_text = "🗑️ **Supprimer un Menu**\n\nChoisissez le menu à supprimer :"
+    await safe_edit_message(query, message_text, reply_markup=markup, parse_mode="Markdown")
+
+
+@admin_router.prefix("admin_edit_menu_")
+async def admin_edit_menu_item(query, context: ContextTypes.DEFAULT_TYPE, menu_index: int):
+    """Modifier un menu spécifique"""
+    data = content_store.get()
+    
+    services = data.get("services", [])
+    
+    # Si services est une chaîne, la convertir en liste
+    if isinstance(services, str):
+        services = []
     
-    elif query.data.startswith("admin_edit_menu_photo_"):
-        # Modifier la photo d'un menu
-        menu_index = int(query.data.split("_")[-1])
+    if 0 <= menu_index < len(services):
         context.user_data["editing_menu_index"] = menu_index
-        context.user_data["editing_menu_field"] = "photo"
         
-        keyboard = [[InlineKeyboardButton("🔙 Retour", callback_data=f"admin_edit_menu_{menu_index}")]]
+        # Afficher les options de modification
+        current_service = services[menu_index]
+        if isinstance(current_service, dict):
+            service_name = current_service.get("name", "Sans nom")
+            service_text = current_service.get("text", "Aucun texte")
+            service_photo = current_service.get("photo", None)
+        else:
+            service_name = str(current_service)
+            service_text = str(current_service)
+            service_photo = None
+        
+        keyboard = [
+            [InlineKeyboardButton("📝 Modifier le nom", callback_data=f"admin_edit_menu_name_{menu_index}")],
+            [InlineKeyboardButton("📄 Modifier le texte", callback_data=f"admin_edit_menu_text_{menu_index}")],
+            [InlineKeyboardButton("🖼️ Modifier la photo", callback_data=f"admin_edit_menu_photo_{menu_index}")],
+            [InlineKeyboardButton("🔙 Retour au Service", callback_data="admin_service")]
+        ]
         markup = InlineKeyboardMarkup(keyboard)
+        
+        photo_info = "\n🖼️ Photo : Oui" if service_photo else "\n🖼️ Photo : Non"
         await safe_edit_message(
             query,
-            "🖼️ **Modifier la photo du menu**\n\nEnvoyez la nouvelle photo pour ce menu :",
+            f"✏️ **Modifier le Menu**\n\n"
+            f"**Nom actuel :** {service_name}\n"
+            f"**Texte actuel :** {service_text[:100]}{'...' if len(service_text) > 100 else ''}{photo_info}\n\n"
+            f"Choisissez ce que vous voulez modifier :",
             reply_markup=markup,
             parse_mode="Markdown"
         )
-        context.user_data["editing"] = "edit_menu_field"
+    else:
+        await query.answer("❌ Menu introuvable")
+
+
+@admin_router.prefix("admin_edit_menu_name_")
+async def admin_edit_menu_name(query, context: ContextTypes.DEFAULT_TYPE, menu_index: int):
+    """Modifier le nom d'un menu"""
+    context.user_data["editing_menu_index"] = menu_index
+    context.user_data["editing_menu_field"] = "name"
+    
+    keyboard = [[InlineKeyboardButton("🔙 Retour", callback_data=f"admin_edit_menu_{menu_index}")]]
+    markup = InlineKeyboardMarkup(keyboard)
+    await safe_edit_message(
+        query,
+        "📝 **Modifier le nom du menu**\n\nEnvoyez le nouveau nom pour ce menu :",
+        reply_markup=markup,
+        parse_mode="Markdown"
+    )
+    context.user_data["editing"] = "edit_menu_field"
+
+
+@admin_router.prefix("admin_edit_menu_text_")
+async def admin_edit_menu_text(query, context: ContextTypes.DEFAULT_TYPE, menu_index: int):
+    """Modifier le texte d'un menu"""
+    context.user_data["editing_menu_index"] = menu_index
+    context.user_data["editing_menu_field"] = "text"
+    
+    keyboard = [[InlineKeyboardButton("🔙 Retour", callback_data=f"admin_edit_menu_{menu_index}")]]
+    markup = InlineKeyboardMarkup(keyboard)
+    await safe_edit_message(
+        query,
+        "📄 **Modifier le texte du menu**\n\nEnvoyez le nouveau texte pour ce menu :",
+        reply_markup=markup,
+        parse_mode="Markdown"
+    )
+    context.user_data["editing"] = "edit_menu_field"
+
+
+@admin_router.prefix("admin_edit_menu_photo_")
+async def admin_edit_menu_photo(query, context: ContextTypes.DEFAULT_TYPE, menu_index: int):
+    """Modifier la photo d'un menu"""
+    context.user_data["editing_menu_index"] = menu_index
+    context.user_data["editing_menu_field"] = "photo"
     
-    elif query.data.startswith("admin_delete_menu_"):
-        # Supprimer un menu spécifique
-        menu_index = int(query.data.split("_")[-1])
-        data = load_data()
+    keyboard = [[InlineKeyboardButton("🔙 Retour", callback_data=f"admin_edit_menu_{menu_index}")]]
+    markup = InlineKeyboardMarkup(keyboard)
+    await safe_edit_message(
+        query,
+        "🖼️ **Modifier la photo du menu**\n\nEnvoyez la nouvelle photo pour ce menu :",
+        reply_markup=markup,
+        parse_mode="Markdown"
+    )
+    context.user_data["editing"] = "edit_menu_field"
+
+
+@admin_router.prefix("admin_delete_menu_")
+async def admin_delete_menu_item(query, context: ContextTypes.DEFAULT_TYPE, menu_index: int):
+    """Supprimer un menu spécifique"""
+    deleted_menu = None
+    async with content_store.edit() as data:
         services = data.get("services", [])
         
         # Si services est une chaîne, la convertir en liste
@@ -1603,354 +3715,337 @@ async def handle_admin_callback_internal(query, context: ContextTypes.DEFAULT_TY
         if 0 <= menu_index < len(services):
             # Supprimer le menu
             deleted_menu = services.pop(menu_index)
-            data["services"] = services
-            save_data(data)
-            
-            # Recharger les données pour s'assurer de la cohérence
-            data = load_data()
-            
-            keyboard = [[InlineKeyboardButton("🔙 Retour au Service", callback_data="admin_service")]]
-            markup = InlineKeyboardMarkup(keyboard)
-            await safe_edit_message(
-                query,
-                f"✅ **Menu supprimé**\n\n"
-                f"Le menu '{deleted_menu}' a été supprimé avec succès !",
-                reply_markup=markup,
-                parse_mode="Markdown"
-            )
-        else:
-            await query.answer("❌ Menu introuvable")
-    
-    elif query.data == "admin_manage_admins":
-        # Vérifier les permissions
-        if not is_admin_or_higher(user_id):
-            await query.answer("❌ Vous n'avez pas les permissions pour gérer les administrateurs.")
-            return
-        
-        admins_data = load_admins()
-        message_text = "👥 **Gestion des Administrateurs**\n\n"
-        
-        # Afficher la liste des admins
-        if admins_data:
-            for admin_id, admin_info in admins_data.items():
-                role = admin_info.get("role", "STAFF")
-                username = admin_info.get("username", "N/A")
-                name = admin_info.get("name", "N/A")
-                message_text += f"• **{name}** (@{username})\n"
-                message_text += f"  ID: `{admin_id}` | Rôle: **{role}**\n\n"
-        else:
-            message_text += "Aucun administrateur enregistré.\n\n"
-        
-        keyboard = [
-            [InlineKeyboardButton("➕ Ajouter Admin", callback_data="admin_add_admin")],
-            [InlineKeyboardButton("❌ Supprimer Admin", callback_data="admin_remove_admin")],
-            [InlineKeyboardButton("🔙 Retour au panel admin", callback_data="admin_panel")]
-        ]
-        markup = InlineKeyboardMarkup(keyboard)
-        await safe_edit_message(query, message_text, reply_markup=markup, parse_mode="Markdown")
+        data["services"] = services
     
-    elif query.data == "admin_add_admin":
-        if not is_admin_or_higher(user_id):
-            await query.answer("❌ Vous n'avez pas les permissions.")
-            return
-        
-        # Afficher la liste des utilisateurs récents pour sélection
-        users_data = load_users()
-        users = users_data.get("users", [])
-        
-        if not users:
-            keyboard = [[InlineKeyboardButton("🔙 Retour", callback_data="admin_manage_admins")]]
-            markup = InlineKeyboardMarkup(keyboard)
-            await safe_edit_message(
-                query,
-                "➕ **Ajouter un Administrateur**\n\n"
-                "❌ Aucun utilisateur trouvé pour ajouter comme admin.",
-                reply_markup=markup,
-                parse_mode="Markdown"
-            )
-            return
-        
-        # Créer les boutons pour chaque utilisateur
-        keyboard = []
-        for user in users[:10]:  # Limiter à 10 utilisateurs récents
-            user_id = user["user_id"]
-            username = user.get("username", "N/A")
-            name = user.get("name", "N/A")
-            button_text = f"➕ {name} (@{username})"
-            keyboard.append([InlineKeyboardButton(button_text, callback_data=f"admin_add_user_{user_id}")])
-        
-        keyboard.append([InlineKeyboardButton("🔙 Retour", callback_data="admin_manage_admins")])
+    if deleted_menu is not None:
+        keyboard = [[InlineKeyboardButton("🔙 Retour au Service", callback_data="admin_service")]]
         markup = InlineKeyboardMarkup(keyboard)
-        
         await safe_edit_message(
             query,
-            "➕ **Ajouter un Administrateur**\n\n"
-            "Choisissez un utilisateur à ajouter comme administrateur :",
+            f"✅ **Menu supprimé**\n\n"
+            f"Le menu '{deleted_menu}' a été supprimé avec succès !",
             reply_markup=markup,
             parse_mode="Markdown"
         )
+    else:
+        await query.answer("❌ Menu introuvable")
+
+
+@admin_router.exact("admin_manage_admins")
+async def admin_manage_admins(query, context: ContextTypes.DEFAULT_TYPE):
+    user_id = query.from_user.id
     
-    elif query.data == "admin_remove_admin":
-        if not is_chef(user_id):
-            await query.answer("❌ Seul le Chef peut supprimer des administrateurs.")
-            return
-        
-        # Afficher la liste des administrateurs pour sélection
-        admins_data = load_admins()
-        
-        if not admins_data:
-            keyboard = [[InlineKeyboardButton("🔙 Retour", callback_data="admin_manage_admins")]]
-            markup = InlineKeyboardMarkup(keyboard)
-            await safe_edit_message(
-                query,
-                "❌ **Supprimer un Administrateur**\n\n"
-                "❌ Aucun administrateur à supprimer.",
-                reply_markup=markup,
-                parse_mode="Markdown"
-            )
-            return
-        
-        # Créer les boutons pour chaque admin
-        keyboard = []
+    # Vérifier les permissions
+    if not is_admin_or_higher(user_id):
+        await query.answer("❌ Vous n'avez pas les permissions pour gérer les administrateurs.")
+        return
+    
+    admins_data = load_admins()
+    message_text = "👥 **Gestion des Administrateurs**\n\n"
+    
+    # Afficher la liste des admins
+    if admins_data:
         for admin_id, admin_info in admins_data.items():
             role = admin_info.get("role", "STAFF")
             username = admin_info.get("username", "N/A")
             name = admin_info.get("name", "N/A")
-            button_text = f"❌ {name} (@{username}) - {role}"
-            keyboard.append([InlineKeyboardButton(button_text, callback_data=f"admin_remove_user_{admin_id}")])
-        
-        keyboard.append([InlineKeyboardButton("🔙 Retour", callback_data="admin_manage_admins")])
-        markup = InlineKeyboardMarkup(keyboard)
-        
-        await safe_edit_message(
-            query,
-            "❌ **Supprimer un Administrateur**\n\n"
-            "Choisissez un administrateur à supprimer :",
-            reply_markup=markup,
-            parse_mode="Markdown"
-        )
+            message_text += f"• **{name}** (@{username})\n"
+            message_text += f"  ID: `{admin_id}` | Rôle: **{role}**\n\n"
+    else:
+        message_text += "Aucun administrateur enregistré.\n\n"
     
-    elif query.data.startswith("admin_add_user_"):
-        # Ajouter un utilisateur comme administrateur
-        target_user_id = int(query.data.split("_")[-1])
-        
-        # Récupérer les informations de l'utilisateur
-        users_data = load_users()
-        target_user = None
-        for user in users_data.get("users", []):
-            if user["user_id"] == target_user_id:
-                target_user = user
-                break
-        
-        if not target_user:
-            await query.answer("❌ Utilisateur introuvable")
-            return
-        
-        # Ajouter comme administrateur
-        admins_data = load_admins()
-        admins_data[str(target_user_id)] = {
-            "username": target_user.get("username", "N/A"),
-            "name": target_user.get("name", "N/A"),
-            "role": "STAFF",
-            "added_by": user_id,
-            "added_date": str(update.effective_message.date)
-        }
-        save_admins(admins_data)
-        
-        # Mettre à jour la liste des admins en mémoire
-        admins.add(target_user_id)
-        
+    keyboard = [
+        [InlineKeyboardButton("➕ Ajouter Admin", callback_data="admin_add_admin")],
+        [InlineKeyboardButton("❌ Supprimer Admin", callback_data="admin_remove_admin")],
+        [InlineKeyboardButton("🔙 Retour au panel admin", callback_data="admin_panel")]
+    ]
+    markup = InlineKeyboardMarkup(keyboard)
+    await safe_edit_message(query, message_text, reply_markup=markup, parse_mode="Markdown")
+
+
+@admin_router.exact("admin_add_admin")
+async def admin_add_admin(query, context: ContextTypes.DEFAULT_TYPE):
+    user_id = query.from_user.id
+    
+    if not is_admin_or_higher(user_id):
+        await query.answer("❌ Vous n'avez pas les permissions.")
+        return
+    
+    # Afficher la liste des utilisateurs récents pour sélection
+    users = user_store.list_users(limit=10)
+    
+    if not users:
         keyboard = [[InlineKeyboardButton("🔙 Retour", callback_data="admin_manage_admins")]]
         markup = InlineKeyboardMarkup(keyboard)
         await safe_edit_message(
             query,
-            f"✅ **Administrateur ajouté !**\n\n"
-            f"**{target_user.get('name', 'N/A')}** (@{target_user.get('username', 'N/A')})\n"
-            f"ID: `{target_user_id}`\n"
-            f"Rôle: **STAFF**",
+            "➕ **Ajouter un Administrateur**\n\n"
+            "❌ Aucun utilisateur trouvé pour ajouter comme admin.",
             reply_markup=markup,
             parse_mode="Markdown"
         )
+        return
     
-    elif query.data.startswith("admin_remove_user_"):
-        # Supprimer un administrateur
-        target_user_id = int(query.data.split("_")[-1])
-        
-        # Vérifier que ce n'est pas le chef qui se supprime lui-même
-        if target_user_id == user_id:
-            await query.answer("❌ Vous ne pouvez pas vous supprimer vous-même")
-            return
-        
-        # Récupérer les informations de l'admin
-        admins_data = load_admins()
-        admin_info = admins_data.get(str(target_user_id))
-        
-        if not admin_info:
-            await query.answer("❌ Administrateur introuvable")
-            return
-        
-        # Supprimer l'administrateur
-        del admins_data[str(target_user_id)]
-        save_admins(admins_data)
-        
-        # Mettre à jour la liste des admins en mémoire
-        admins.discard(target_user_id)
-        
+    # Créer les boutons pour chaque utilisateur
+    keyboard = []
+    for user in users:  # Limité à 10 utilisateurs
+        user_id = user["user_id"]
+        username = user.get("username", "N/A")
+        name = user.get("name", "N/A")
+        button_text = f"➕ {name} (@{username})"
+        keyboard.append([InlineKeyboardButton(button_text, callback_data=f"admin_add_user_{user_id}")])
+    
+    keyboard.append([InlineKeyboardButton("🔙 Retour", callback_data="admin_manage_admins")])
+    markup = InlineKeyboardMarkup(keyboard)
+    
+    await safe_edit_message(
+        query,
+        "➕ **Ajouter un Administrateur**\n\n"
+        "Choisissez un utilisateur à ajouter comme administrateur :",
+        reply_markup=markup,
+        parse_mode="Markdown"
+    )
+
+
+@admin_router.exact("admin_remove_admin")
+async def admin_remove_admin(query, context: ContextTypes.DEFAULT_TYPE):
+    user_id = query.from_user.id
+    
+    if not is_chef(user_id):
+        await query.answer("❌ Seul le Chef peut supprimer des administrateurs.")
+        return
+    
+    # Afficher la liste des administrateurs pour sélection
+    admins_data = load_admins()
+    
+    if not admins_data:
         keyboard = [[InlineKeyboardButton("🔙 Retour", callback_data="admin_manage_admins")]]
         markup = InlineKeyboardMarkup(keyboard)
         await safe_edit_message(
             query,
-            f"✅ **Administrateur supprimé !**\n\n"
-            f"**{admin_info.get('name', 'N/A')}** (@{admin_info.get('username', 'N/A')})\n"
-            f"ID: `{target_user_id}`\n"
-            f"Rôle: **{admin_info.get('role', 'STAFF')}**",
+            "❌ **Supprimer un Administrateur**\n\n"
+            "❌ Aucun administrateur à supprimer.",
             reply_markup=markup,
             parse_mode="Markdown"
         )
+        return
     
-    elif query.data.startswith("select_msg_"):
-        # Gérer la sélection d'un message
-        msg_index = int(query.data.split("_")[2]) - 1  # Convertir en index 0-based
-        user_id = query.from_user.id
-        
-        print(f"DEBUG: Sélection du message {msg_index} par l'utilisateur {user_id}")
-        
-        if not is_admin_or_higher(user_id):
-            await query.answer("❌ Vous n'avez pas les permissions.")
-            return
-        
-        # Initialiser la liste des messages sélectionnés si elle n'existe pas
-        if "selected_messages" not in context.user_data:
-            context.user_data["selected_messages"] = []
-        
-        print(f"DEBUG: Avant sélection - selected_messages = {context.user_data['selected_messages']}")
-        
-        # Ajouter ou retirer le message de la sélection
-        if msg_index in context.user_data["selected_messages"]:
-            context.user_data["selected_messages"].remove(msg_index)
-            await query.answer("❌ Message désélectionné")
-            print(f"DEBUG: Message {msg_index} désélectionné")
-        else:
-            context.user_data["selected_messages"].append(msg_index)
-            await query.answer("✅ Message sélectionné")
-            print(f"DEBUG: Message {msg_index} sélectionné")
-        
-        print(f"DEBUG: Après sélection - selected_messages = {context.user_data['selected_messages']}")
-        
-        # Mettre à jour l'affichage
-        try:
-            await update_message_display(query, context)
-            print("DEBUG: update_message_display appelé avec succès")
-        except Exception as e:
-            print(f"DEBUG: Erreur dans update_message_display: {e}")
-            await query.answer("Erreur lors de la mise à jour")
+    # Créer les boutons pour chaque admin
+    keyboard = []
+    for admin_id, admin_info in admins_data.items():
+        role = admin_info.get("role", "STAFF")
+        username = admin_info.get("username", "N/A")
+        name = admin_info.get("name", "N/A")
+        button_text = f"❌ {name} (@{username}) - {role}"
+        keyboard.append([InlineKeyboardButton(button_text, callback_data=f"admin_remove_user_{admin_id}")])
     
-    elif query.data == "select_all_messages":
-        # Sélectionner tous les messages
-        user_id = query.from_user.id
-        
-        if not is_admin_or_higher(user_id):
-            await query.answer("❌ Vous n'avez pas les permissions.")
-            return
-        
-        users_data = load_users()
-        messages = users_data.get("messages", [])
-        recent_messages = messages[-10:]
-        
-        # Sélectionner tous les messages
-        context.user_data["selected_messages"] = list(range(len(recent_messages)))
-        await query.answer(f"✅ {len(recent_messages)} messages sélectionnés")
-        
-        # Mettre à jour l'affichage
+    keyboard.append([InlineKeyboardButton("🔙 Retour", callback_data="admin_manage_admins")])
+    markup = InlineKeyboardMarkup(keyboard)
+    
+    await safe_edit_message(
+        query,
+        "❌ **Supprimer un Administrateur**\n\n"
+        "Choisissez un administrateur à supprimer :",
+        reply_markup=markup,
+        parse_mode="Markdown"
+    )
+
+
+@admin_router.prefix("admin_add_user_")
+async def admin_add_user(query, context: ContextTypes.DEFAULT_TYPE, target_user_id: int):
+    """Ajouter un utilisateur comme administrateur"""
+    user_id = query.from_user.id
+    
+    # Récupérer les informations de l'utilisateur
+    target_user = user_store.get_user(target_user_id)
+    
+    if not target_user:
+        await query.answer("❌ Utilisateur introuvable")
+        return
+    
+    # Ajouter comme administrateur
+    async with role_registry.edit() as admins_data:
+        admins_data[str(target_user_id)] = {
+            "username": target_user.get("username", "N/A"),
+            "name": target_user.get("name", "N/A"),
+            "role": "STAFF",
+            "added_by": user_id,
+            "added_date": str(datetime.now())
+        }
+    
+    # Mettre à jour la liste des admins en mémoire
+    role_registry.login(target_user_id)
+    
+    keyboard = [[InlineKeyboardButton("🔙 Retour", callback_data="admin_manage_admins")]]
+    markup = InlineKeyboardMarkup(keyboard)
+    await safe_edit_message(
+        query,
+        f"✅ **Administrateur ajouté !**\n\n"
+        f"**{target_user.get('name', 'N/A')}** (@{target_user.get('username', 'N/A')})\n"
+        f"ID: `{target_user_id}`\n"
+        f"Rôle: **STAFF**",
+        reply_markup=markup,
+        parse_mode="Markdown"
+    )
+
+
+@admin_router.prefix("admin_remove_user_")
+async def admin_remove_user(query, context: ContextTypes.DEFAULT_TYPE, target_user_id: int):
+    """Supprimer un administrateur"""
+    user_id = query.from_user.id
+    
+    # Vérifier que ce n'est pas le chef qui se supprime lui-même
+    if target_user_id == user_id:
+        await query.answer("❌ Vous ne pouvez pas vous supprimer vous-même")
+        return
+    
+    # Récupérer les informations de l'admin et le supprimer
+    async with role_registry.edit() as admins_data:
+        admin_info = admins_data.pop(str(target_user_id), None)
+    
+    if not admin_info:
+        await query.answer("❌ Administrateur introuvable")
+        return
+    
+    # Mettre à jour la liste des admins en mémoire
+    role_registry.logout(target_user_id)
+    
+    keyboard = [[InlineKeyboardButton("🔙 Retour", callback_data="admin_manage_admins")]]
+    markup = InlineKeyboardMarkup(keyboard)
+    await safe_edit_message(
+        query,
+        f"✅ **Administrateur supprimé !**\n\n"
+        f"**{admin_info.get('name', 'N/A')}** (@{admin_info.get('username', 'N/A')})\n"
+        f"ID: `{target_user_id}`\n"
+        f"Rôle: **{admin_info.get('role', 'STAFF')}**",
+        reply_markup=markup,
+        parse_mode="Markdown"
+    )
+
+
+@admin_router.prefix("select_msg_")
+async def select_msg(query, context: ContextTypes.DEFAULT_TYPE, msg_id: int):
+    """Gérer la sélection d'un message (par son id dans le journal)"""
+    user_id = query.from_user.id
+    
+    messages_log.debug("Sélection du message %s par l'utilisateur %s", msg_id, user_id)
+    
+    if not is_admin_or_higher(user_id):
+        await query.answer("❌ Vous n'avez pas les permissions.")
+        return
+    
+    # Ensemble des ids sélectionnés : il reste valable si de nouveaux messages arrivent
+    selected_messages = context.user_data.setdefault("selected_messages", set())
+    
+    # Ajouter ou retirer le message de la sélection
+    if msg_id in selected_messages:
+        selected_messages.discard(msg_id)
+        await query.answer("❌ Message désélectionné")
+        messages_log.debug("Message %s désélectionné", msg_id)
+    else:
+        selected_messages.add(msg_id)
+        await query.answer("✅ Message sélectionné")
+        messages_log.debug("Message %s sélectionné", msg_id)
+    
+    # Mettre à jour l'affichage
+    try:
+        await update_message_display(query, context)
+        messages_log.debug("update_message_display appelé avec succès")
+    except Exception as e:
+        messages_log.error("Erreur dans update_message_display: %s", e)
+        await query.answer("Erreur lors de la mise à jour")
+
+
+@admin_router.exact("select_all_messages")
+async def select_all_messages(query, context: ContextTypes.DEFAULT_TYPE):
+    """Sélectionner tous les messages de la page affichée"""
+    user_id = query.from_user.id
+    
+    if not is_admin_or_higher(user_id):
+        await query.answer("❌ Vous n'avez pas les permissions.")
+        return
+    
+    page_ids = context.user_data.get("message_page_ids", [])
+    
+    # Les sélections faites sur les autres pages sont conservées
+    selected_messages = context.user_data.setdefault("selected_messages", set())
+    selected_messages.update(page_ids)
+    await query.answer(f"✅ {len(selected_messages)} messages sélectionnés")
+    
+    # Mettre à jour l'affichage
+    await update_message_display(query, context)
+
+
+@admin_router.exact("delete_selected_messages")
+async def delete_selected_messages(query, context: ContextTypes.DEFAULT_TYPE):
+    """Supprimer les messages sélectionnés"""
+    user_id = query.from_user.id
+    
+    messages_log.debug("Tentative de suppression par l'utilisateur %s", user_id)
+    
+    if not is_admin_or_higher(user_id):
+        await query.answer("❌ Vous n'avez pas les permissions.")
+        return
+    
+    selected_messages = context.user_data.get("selected_messages", set())
+    messages_log.debug("Messages sélectionnés: %s", len(selected_messages))
+    
+    if not selected_messages:
+        await query.answer("❌ Aucun message sélectionné")
+        return
+    
+    messages_log.debug("Nombre total de messages: %s", message_journal.count())
+    
+    # Suppression par id : un message arrivé entre-temps ne peut pas être supprimé à la place
+    ids_to_delete = sorted(selected_messages)
+    
+    # Suppression dans le journal (pierres tombales, compaction en arrière-plan)
+    deleted_count = message_journal.delete(ids_to_delete)
+    
+    messages_log.debug("Nombre de messages supprimés: %s", deleted_count)
+    messages_log.debug("Nouveau nombre total de messages: %s", message_journal.count())
+    
+    # Nettoyer la sélection
+    context.user_data["selected_messages"] = set()
+    
+    await query.answer(f"✅ {deleted_count} messages supprimés")
+    
+    # Mettre à jour l'affichage
+    try:
         await update_message_display(query, context)
+        messages_log.debug("Affichage mis à jour avec succès")
+    except Exception as e:
+        messages_log.error("Erreur lors de la mise à jour de l'affichage: %s", e)
+        await query.answer("Erreur lors de la mise à jour")
+
+
+@admin_router.prefix("role_", str)
+async def choose_role(query, context: ContextTypes.DEFAULT_TYPE, role: str):
+    """Gérer la sélection de rôle"""
+    user_id = query.from_user.id
     
-    elif query.data == "delete_selected_messages":
-        # Supprimer les messages sélectionnés
-        user_id = query.from_user.id
-        
-        print(f"DEBUG: Tentative de suppression par l'utilisateur {user_id}")
-        
-        if not is_admin_or_higher(user_id):
-            await query.answer("❌ Vous n'avez pas les permissions.")
-            return
-        
-        selected_messages = context.user_data.get("selected_messages", [])
-        print(f"DEBUG: Messages sélectionnés: {selected_messages}")
-        
-        if not selected_messages:
-            await query.answer("❌ Aucun message sélectionné")
-            return
-        
-        # Charger les données
-        users_data = load_users()
-        messages = users_data.get("messages", [])
-        recent_messages = messages[-10:]
-        
-        print(f"DEBUG: Nombre total de messages: {len(messages)}")
-        print(f"DEBUG: Messages récents: {len(recent_messages)}")
-        
-        # Supprimer les messages sélectionnés (en ordre inverse pour éviter les problèmes d'index)
-        deleted_count = 0
-        for index in sorted(selected_messages, reverse=True):
-            print(f"DEBUG: Traitement de l'index {index}")
-            if 0 <= index < len(recent_messages):
-                # Trouver l'index dans la liste complète
-                # Les messages récents sont les 10 derniers, donc l'index dans la liste complète est :
-                full_index = len(messages) - len(recent_messages) + index
-                print(f"DEBUG: Index complet calculé: {full_index} (len(messages)={len(messages)}, len(recent)={len(recent_messages)}, index={index})")
-                if 0 <= full_index < len(messages):
-                    print(f"DEBUG: Suppression du message à l'index {full_index}")
-                    messages.pop(full_index)
-                    deleted_count += 1
-                    print(f"DEBUG: Message supprimé, count = {deleted_count}")
-                else:
-                    print(f"DEBUG: Index {full_index} hors limites")
-            else:
-                print(f"DEBUG: Index {index} hors limites des messages récents")
-        
-        print(f"DEBUG: Nombre de messages supprimés: {deleted_count}")
-        print(f"DEBUG: Nouveau nombre total de messages: {len(messages)}")
-        
-        # Sauvegarder les modifications
-        users_data["messages"] = messages
-        save_users(users_data)
-        print("DEBUG: Données sauvegardées")
-        
-        # Nettoyer la sélection
-        context.user_data["selected_messages"] = []
-        
-        await query.answer(f"✅ {deleted_count} messages supprimés")
-        
-        # Mettre à jour l'affichage
-        try:
-            await update_message_display(query, context)
-            print("DEBUG: Affichage mis à jour avec succès")
-        except Exception as e:
-            print(f"DEBUG: Erreur lors de la mise à jour de l'affichage: {e}")
-            await query.answer("Erreur lors de la mise à jour")
+    if not is_admin_or_higher(user_id):
+        await query.answer("❌ Vous n'avez pas les permissions.")
+        return
     
-    elif query.data.startswith("role_"):
-        # Gérer la sélection de rôle
-        role = query.data.split("_")[1]
-        user_id = query.from_user.id
-        
-        if not is_admin_or_higher(user_id):
-            await query.answer("❌ Vous n'avez pas les permissions.")
-            return
-        
-        if not context.user_data.get("choosing_role"):
-            await query.answer("❌ Aucun administrateur en cours d'ajout.")
-            return
-        
-        target_user_id = context.user_data.get("pending_admin_id")
-        target_username = context.user_data.get("pending_admin_username")
-        
-        if not target_user_id:
-            await query.answer("❌ Erreur: ID utilisateur manquant.")
-            return
-        
-        # Ajouter l'administrateur
-        admins_data = load_admins()
+    # La valeur vient du bouton : ne jamais enregistrer un rôle inconnu ou supérieur au sien
+    if role not in ROLES or role not in grantable_roles(user_id):
+        await query.answer("❌ Vous ne pouvez pas attribuer ce rôle.")
+        return
+    
+    if not context.user_data.get("choosing_role"):
+        await query.answer("❌ Aucun administrateur en cours d'ajout.")
+        return
+    
+    target_user_id = context.user_data.get("pending_admin_id")
+    target_username = context.user_data.get("pending_admin_username")
+    
+    if not target_user_id:
+        await query.answer("❌ Erreur: ID utilisateur manquant.")
+        return
+    
+    # Ajouter l'administrateur
+    async with role_registry.edit() as admins_data:
         admins_data[str(target_user_id)] = {
             "role": role,
             "username": target_username,
@@ -1958,65 +4053,41 @@ async def handle_admin_callback_internal(query, context: ContextTypes.DEFAULT_TY
             "added_by": user_id,
             "added_date": str(datetime.now())
         }
-        save_admins(admins_data)
-        
-        # Nettoyer les données temporaires
-        context.user_data.pop("choosing_role", None)
-        context.user_data.pop("pending_admin_id", None)
-        context.user_data.pop("pending_admin_username", None)
-        
-        await query.answer(f"✅ Administrateur ajouté avec le rôle {role}!")
-        
-        # Retourner au menu de gestion des admins
-        await query.message.reply_text(
-            f"✅ **Administrateur ajouté avec succès !**\n\n"
-            f"ID: `{target_user_id}`\n"
-            f"Username: @{target_username or 'N/A'}\n"
-            f"Rôle: **{role}**",
-            parse_mode="Markdown"
-        )
     
-    elif query.data == "admin_quit":
-        user_id = query.from_user.id
-        admins.discard(user_id)
-        context.user_data.clear()
-        
-        # Charger les données
-        data = load_data()
-        
-        # Construire le clavier avec les boutons principaux
-        keyboard = []
-        
-        # Ajouter les boutons principaux
-        keyboard.append([InlineKeyboardButton("💼 Nos Services", callback_data="nos_services")])
-        keyboard.append([InlineKeyboardButton("📞 Contact", callback_data="contact")])
-        keyboard.append([InlineKeyboardButton("✉️ Nous Contacter", callback_data="nous_contacter")])
-        
-        # Ajouter les menus du Service
-        services = data.get("services", [])
-        if isinstance(services, str):
-            services = []
-        
-        if services:
-            # Ajouter chaque menu comme un bouton séparé
-            for i, service in enumerate(services):
-                if isinstance(service, dict):
-                    service_name = service.get("name", f"Menu {i+1}")
-                else:
-                    service_name = str(service)
-                keyboard.append([InlineKeyboardButton(service_name, callback_data=f"service_menu_{i}")])
-        else:
-            # Si pas de menus, afficher un message
-            keyboard.append([InlineKeyboardButton("📋 Aucun menu disponible", callback_data="no_menus")])
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        await safe_edit_message(
-            query,
-            "✅ Déconnecté du mode admin.\n\n👋 Bonjour et bienvenue sur notre bot !\nChoisissez une option :",
-            reply_markup=reply_markup
-        )
+    # Nettoyer les données temporaires
+    context.user_data.pop("choosing_role", None)
+    context.user_data.pop("pending_admin_id", None)
+    context.user_data.pop("pending_admin_username", None)
+    
+    await query.answer(f"✅ Administrateur ajouté avec le rôle {role}!")
+    
+    # Retourner au menu de gestion des admins
+    await query.message.reply_text(
+        f"✅ **Administrateur ajouté avec succès !**\n\n"
+        f"ID: `{target_user_id}`\n"
+        f"Username: @{target_username or 'N/A'}\n"
+        f"Rôle: **{role}**",
+        parse_mode="Markdown"
+    )
+
+
+@admin_router.exact("admin_quit")
+async def admin_quit(query, context: ContextTypes.DEFAULT_TYPE):
+    user_id = query.from_user.id
+    role_registry.logout(user_id)
+    context.user_data.clear()
+    
+    # Clavier du menu principal (mis en cache par version du contenu)
+    reply_markup = menu_renderer.main_keyboard()
+    await safe_edit_message(
+        query,
+        "✅ Déconnecté du mode admin.\n\n👋 Bonjour et bienvenue sur notre bot !\nChoisissez une option :",
+        reply_markup=reply_markup
+    )
 
 
 # --- Gestion des actions admin (texte) ---
+@instrumented
 async def admin_actions(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.message.from_user.id
     if user_id not in admins:
@@ -2030,8 +4101,8 @@ async def admin_actions(update: Update, context: ContextTypes.DEFAULT_TYPE):
             if update.message.photo:
                 # Prendre la photo de plus haute qualité
                 photo = update.message.photo[-1]
-                data["welcome_photo"] = photo.file_id
-                save_data(data)
+                async with content_store.edit() as data:
+                    data["welcome_photo"] = photo.file_id
                 context.user_data["editing"] = None
                 
                 # Retour au panel photo
@@ -2052,8 +4123,8 @@ async def admin_actions(update: Update, context: ContextTypes.DEFAULT_TYPE):
             # Gestion de la photo Nos Services
             if update.message.photo:
                 photo = update.message.photo[-1]
-                data["nos_services_photo"] = photo.file_id
-                save_data(data)
+                async with content_store.edit() as data:
+                    data["nos_services_photo"] = photo.file_id
                 context.user_data["editing"] = None
                 
                 # Retour au panel Nos Services
@@ -2074,8 +4145,8 @@ async def admin_actions(update: Update, context: ContextTypes.DEFAULT_TYPE):
             # Gestion de la photo Contact
             if update.message.photo:
                 photo = update.message.photo[-1]
-                data["contact_photo"] = photo.file_id
-                save_data(data)
+                async with content_store.edit() as data:
+                    data["contact_photo"] = photo.file_id
                 context.user_data["editing"] = None
                 
                 # Retour au panel Contact
@@ -2096,8 +4167,8 @@ async def admin_actions(update: Update, context: ContextTypes.DEFAULT_TYPE):
             # Gestion de la photo Nous Contacter
             if update.message.photo:
                 photo = update.message.photo[-1]
-                data["nous_contacter_photo"] = photo.file_id
-                save_data(data)
+                async with content_store.edit() as data:
+                    data["nous_contacter_photo"] = photo.file_id
                 context.user_data["editing"] = None
                 
                 # Retour au panel Nous Contacter
@@ -2115,64 +4186,60 @@ async def admin_actions(update: Update, context: ContextTypes.DEFAULT_TYPE):
             else:
                 await update.message.reply_text("❌ Veuillez envoyer une photo (pas un fichier).")
         elif section == "broadcast_message":
-            # Envoi du message à tous les utilisateurs
-            users_data = load_users()
-            users = users_data["users"]
+            # Diffusion en tâche de fond : le handler rend la main tout de suite
             message_text = update.message.text
             context.user_data["editing"] = None
             
-            sent_count = 0
-            failed_count = 0
-            
-            for user in users:
-                try:
-                    await context.bot.send_message(
-                        chat_id=user["user_id"],
-                        text=message_text
-                    )
-                    sent_count += 1
-                except Exception as e:
-                    failed_count += 1
-                    print(f"Erreur envoi à {user['user_id']}: {e}")
-            
-            # Retour au panel message
-            keyboard = [
-                [InlineKeyboardButton("📤 Envoyer Message à tous", callback_data="admin_broadcast_message")],
-                [InlineKeyboardButton("📊 Voir les messages reçus", callback_data="admin_view_messages")],
-                [InlineKeyboardButton("🔙 Retour au panneau admin", callback_data="admin_panel")]
-            ]
+            job = broadcast_engine.create(
+                message_text,
+                admin_chat_id=update.effective_chat.id
+            )
+            status_message = await update.message.reply_text(
+                job.status_text(),
+                parse_mode="Markdown"
+            )
+            job.status_message_id = status_message.message_id
+            broadcast_engine.checkpoint(job)
+            broadcast_engine.launch(job, context.bot)
+        elif section == "message_filter":
+            # Filtre du visualiseur de messages reçus
+            try:
+                message_filter = parse_message_filter(update.message.text)
+            except ValueError:
+                await update.message.reply_text(
+                    "❌ Filtre invalide. Exemple : `123456789 2024-01-01 2024-01-31`",
+                    parse_mode="Markdown"
+                )
+                return
+            context.user_data["editing"] = None
+            context.user_data["message_filter"] = message_filter
+            context.user_data["message_cursor"] = {}
+            context.user_data["selected_messages"] = set()
+            keyboard = [[InlineKeyboardButton("📊 Voir les messages", callback_data="admin_view_messages")]]
             markup = InlineKeyboardMarkup(keyboard)
+            description = describe_message_filter(message_filter) or "aucun"
             await update.message.reply_text(
-                f"✅ **Message diffusé !**\n\n"
-                f"*Envoyé à :* {sent_count} utilisateurs\n"
-                f"*Échecs :* {failed_count} utilisateurs\n\n"
-                "📢 **Panel Message**",
-                parse_mode="Markdown",
+                f"✅ Filtre appliqué : {description}",
                 reply_markup=markup
             )
         elif section == "add_menu":
             # Ajouter un nouveau menu
             new_menu_text = update.message.text
-            data = load_data()
-            if "services" not in data:
-                data["services"] = []
-            # Si services est une chaîne, la convertir en liste
-            if isinstance(data["services"], str):
-                data["services"] = []
-            
             # Créer un menu avec la nouvelle structure
             new_menu = {
                 "name": new_menu_text,
                 "text": new_menu_text,
                 "photo": None
             }
-            data["services"].append(new_menu)
-            save_data(data)
+            async with content_store.edit() as data:
+                if "services" not in data:
+                    data["services"] = []
+                # Si services est une chaîne, la convertir en liste
+                if isinstance(data["services"], str):
+                    data["services"] = []
+                data["services"].append(new_menu)
             context.user_data["editing"] = None
             
-            # Recharger les données pour s'assurer de la cohérence
-            data = load_data()
-            
             # Retour au menu Service
             keyboard = [
                 [InlineKeyboardButton("📋 Voir les menus actuels", callback_data="admin_view_menus")],
@@ -2200,24 +4267,23 @@ async def admin_actions(update: Update, context: ContextTypes.DEFAULT_TYPE):
             # Modifier un menu existant (ancienne méthode)
             new_text = update.message.text
             menu_index = context.user_data.get("editing_menu_index")
-            data = load_data()
-            services = data.get("services", [])
-            
-            # Si services est une chaîne, la convertir en liste
-            if isinstance(services, str):
-                services = []
-            
-            if 0 <= menu_index < len(services):
-                old_menu = services[menu_index]
-                services[menu_index] = new_text
+            old_menu = None
+            async with content_store.edit() as data:
+                services = data.get("services", [])
+                
+                # Si services est une chaîne, la convertir en liste
+                if isinstance(services, str):
+                    services = []
+                
+                if 0 <= menu_index < len(services):
+                    old_menu = services[menu_index]
+                    services[menu_index] = new_text
                 data["services"] = services
-                save_data(data)
+            
+            if old_menu is not None:
                 context.user_data["editing"] = None
                 context.user_data["editing_menu_index"] = None
                 
-                # Recharger les données pour s'assurer de la cohérence
-                data = load_data()
-                
                 # Retour au menu Service
                 keyboard = [
                     [InlineKeyboardButton("📋 Voir les menus actuels", callback_data="admin_view_menus")],
@@ -2250,42 +4316,41 @@ async def admin_actions(update: Update, context: ContextTypes.DEFAULT_TYPE):
             new_value = update.message.text
             menu_index = context.user_data.get("editing_menu_index")
             field = context.user_data.get("editing_menu_field")
-            data = load_data()
-            services = data.get("services", [])
-            
-            # Si services est une chaîne, la convertir en liste
-            if isinstance(services, str):
-                services = []
+            if field == "photo" and not update.message.photo:
+                await update.message.reply_text("❌ Veuillez envoyer une photo valide.")
+                return
             
-            if 0 <= menu_index < len(services):
-                # Convertir en dictionnaire si c'est une chaîne
-                if isinstance(services[menu_index], str):
-                    services[menu_index] = {
-                        "name": services[menu_index],
-                        "text": services[menu_index],
-                        "photo": None
-                    }
+            updated = False
+            async with content_store.edit() as data:
+                services = data.get("services", [])
+                
+                # Si services est une chaîne, la convertir en liste
+                if isinstance(services, str):
+                    services = []
                 
-                # Mettre à jour le champ spécifique
-                if field == "photo":
-                    # Pour les photos, on stocke l'ID de la photo
-                    if update.message.photo:
+                if 0 <= menu_index < len(services):
+                    # Convertir en dictionnaire si c'est une chaîne
+                    if isinstance(services[menu_index], str):
+                        services[menu_index] = {
+                            "name": services[menu_index],
+                            "text": services[menu_index],
+                            "photo": None
+                        }
+                    
+                    # Mettre à jour le champ spécifique
+                    if field == "photo":
+                        # Pour les photos, on stocke l'ID de la photo
                         services[menu_index][field] = update.message.photo[-1].file_id
                     else:
-                        await update.message.reply_text("❌ Veuillez envoyer une photo valide.")
-                        return
-                else:
-                    services[menu_index][field] = new_value
-                
+                        services[menu_index][field] = new_value
+                    updated = True
                 data["services"] = services
-                save_data(data)
+            
+            if updated:
                 context.user_data["editing"] = None
                 context.user_data["editing_menu_index"] = None
                 context.user_data["editing_menu_field"] = None
                 
-                # Recharger les données pour s'assurer de la cohérence
-                data = load_data()
-                
                 # Retour au menu Service
                 keyboard = [
                     [InlineKeyboardButton("📋 Voir les menus actuels", callback_data="admin_view_menus")],
@@ -2314,8 +4379,8 @@ async def admin_actions(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 await update.message.reply_text("❌ Erreur : Menu introuvable")
         else:
             # Gestion du texte (contact, services, welcome_text)
-            data[section] = update.message.text
-            save_data(data)
+            async with content_store.edit() as data:
+                data[section] = update.message.text
             context.user_data["editing"] = None
             
             if section == "welcome_text":
@@ -2397,6 +4462,7 @@ async def admin_actions(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 # --- Gestion du texte et des photos (mot de passe ou actions admin) ---
+@instrumented
 async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if await check_password(update, context):
         return
@@ -2455,6 +4521,7 @@ async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
 
 # --- Gestion des photos ---
+@instrumented
 async def handle_photo(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.message.from_user.id
     if user_id not in admins:
@@ -2464,8 +4531,8 @@ async def handle_photo(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if section == "welcome_photo":
         # Prendre la photo de plus haute qualité
         photo = update.message.photo[-1]
-        data["welcome_photo"] = photo.file_id
-        save_data(data)
+        async with content_store.edit() as data:
+            data["welcome_photo"] = photo.file_id
         context.user_data["editing"] = None
         
         # Retour au panel photo
@@ -2483,8 +4550,8 @@ async def handle_photo(update: Update, context: ContextTypes.DEFAULT_TYPE):
     elif section == "nos_services_photo":
         # Gestion de la photo Nos Services
         photo = update.message.photo[-1]
-        data["nos_services_photo"] = photo.file_id
-        save_data(data)
+        async with content_store.edit() as data:
+            data["nos_services_photo"] = photo.file_id
         context.user_data["editing"] = None
         
         # Retour au panel Nos Services
@@ -2502,8 +4569,8 @@ async def handle_photo(update: Update, context: ContextTypes.DEFAULT_TYPE):
     elif section == "contact_photo":
         # Gestion de la photo Contact
         photo = update.message.photo[-1]
-        data["contact_photo"] = photo.file_id
-        save_data(data)
+        async with content_store.edit() as data:
+            data["contact_photo"] = photo.file_id
         context.user_data["editing"] = None
         
         # Retour au panel Contact
@@ -2521,8 +4588,8 @@ async def handle_photo(update: Update, context: ContextTypes.DEFAULT_TYPE):
     elif section == "nous_contacter_photo":
         # Gestion de la photo Nous Contacter
         photo = update.message.photo[-1]
-        data["nous_contacter_photo"] = photo.file_id
-        save_data(data)
+        async with content_store.edit() as data:
+            data["nous_contacter_photo"] = photo.file_id
         context.user_data["editing"] = None
         
         # Retour au panel Nous Contacter
@@ -2539,19 +4606,791 @@ async def handle_photo(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
 
 
-# --- Fonction principale ---
-def main():
-    app = ApplicationBuilder().token(TOKEN).build()
+# --- Persistance de context.user_data ---
+class SQLitePersistence(BasePersistence):
+    """Persistance PTB de context.user_data dans SQLite (mode WAL).
+
+    Une ligne par utilisateur (user_data sérialisé avec pickle). Rien n'est lu
+    au démarrage : les données d'un utilisateur sont chargées à sa première
+    update (refresh_user_data). Toutes les update_interval secondes, PTB
+    appelle update_user_data pour les utilisateurs actifs ; seules les lignes
+    dont le contenu a changé sont réécrites. Les requêtes SQLite et pickle
+    tournent dans un thread dédié, seul utilisateur de la connexion, jamais
+    sur la boucle asyncio ; ses tâches sont exécutées dans l'ordre d'envoi. chat_data, bot_data et
+    callback_data ne sont pas utilisés par le bot et ne sont pas stockés.
+
+    PTB garde en mémoire le user_data de tous les utilisateurs vus depuis le
+    démarrage. La tâche d'éviction retire ceux qui sont inactifs depuis plus de
+    max_idle secondes, puis les moins récents au-delà de max_entries, par
+    Application.drop_user_data : leur état est écrit sur le disque (spill) et
+    rechargé à leur retour. Un utilisateur dont une update est en cours ou en
+    file n'est jamais évincé.
+    """
+
+    def __init__(self, path, update_interval=10, max_entries=0, max_idle=0, spill=True, sweep_interval=60):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval,
+        )
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS user_data (
+                user_id INTEGER PRIMARY KEY,
+                data BLOB NOT NULL,
+                updated REAL NOT NULL
+            )
+            """
+        )
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="state-db")
+        self._digests = {}  # user_id -> empreinte du dernier contenu écrit (ou lu), modifié par le thread
+        self.loads = 0
+        self.writes = 0
+        self.skipped = 0
+        # Éviction des états en mémoire
+        self.max_entries = max_entries
+        self.max_idle = max_idle
+        self.spill = spill
+        self.sweep_interval = sweep_interval
+        self._last_seen = collections.OrderedDict()  # user_id -> dernière update, du plus ancien au plus récent
+        self._overflow = asyncio.Event()
+        self._sweeper = None
+        self._application = None
+        self._evicted = set()  # retirés par drop_user_data, à ne pas effacer de la base
+        self._spilling = set()  # évincés dont l'écriture est en cours
+        self.evictions = 0
+        self.busy_skips = 0
+
+    @staticmethod
+    def _digest(blob):
+        return hashlib.blake2b(blob, digest_size=16).digest()
+
+    async def _db(self, function, *args):
+        """Exécuter function dans le thread de la base et attendre son résultat"""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+
+    # user_data : chargement paresseux, écriture des seules lignes modifiées
+    async def get_user_data(self):
+        return {}
+
+    async def refresh_user_data(self, user_id, user_data):
+        # Appelé par PTB avant chaque handler : sert aussi à suivre l'activité
+        self._last_seen[user_id] = time.monotonic()
+        self._last_seen.move_to_end(user_id)
+        if self.max_entries and len(self._last_seen) > self.max_entries:
+            self._overflow.set()
+        if user_id in self._digests and user_id not in self._spilling:
+            return  # déjà lu : pas d'aller-retour vers le thread de la base
+        for key, value in (await self._db(self._load, user_id)).items():
+            user_data.setdefault(key, value)
+
+    def _load(self, user_id):
+        # Thread de la base : contenu enregistré, s'il n'a pas encore été lu
+        if user_id in self._digests:
+            return {}
+        row = self.conn.execute("SELECT data FROM user_data WHERE user_id = ?", (user_id,)).fetchone()
+        if row is None:
+            self._digests[user_id] = None
+            return {}
+        self._digests[user_id] = self._digest(row[0])
+        self.loads += 1
+        try:
+            return pickle.loads(row[0])
+        except Exception as e:
+            storage_log.error("Erreur lors de la lecture de l'état de %s: %s", user_id, e)
+            return {}
+
+    async def update_user_data(self, user_id, data):
+        await self._db(self._write, user_id, data)
+
+    def _write(self, user_id, data):
+        # Ne jamais écraser une ligne qui n'a pas encore été lue
+        for key, value in self._load(user_id).items():
+            data.setdefault(key, value)
+        if not data:
+            self._delete(user_id)
+            return
+        blob = pickle.dumps(dict(data), protocol=pickle.HIGHEST_PROTOCOL)
+        digest = self._digest(blob)
+        if self._digests.get(user_id) == digest:
+            self.skipped += 1
+            return
+        self.conn.execute(
+            "INSERT INTO user_data (user_id, data, updated) VALUES (?, ?, ?) "
+            "ON CONFLICT(user_id) DO UPDATE SET data = excluded.data, updated = excluded.updated",
+            (user_id, blob, time.time()),
+        )
+        self._digests[user_id] = digest
+        self.writes += 1
+
+    async def drop_user_data(self, user_id):
+        if user_id in self._evicted:
+            # Suppression demandée par PTB après une éviction : l'état est sur le
+            # disque, pas à effacer. Si l'utilisateur est revenu entre-temps, PTB
+            # a écarté sa mise à jour au profit de cette suppression : l'écrire ici.
+            self._evicted.discard(user_id)
+            data = self._application.user_data.get(user_id) if self._application else None
+            if data:
+                await self.update_user_data(user_id, copy.deepcopy(data))
+            return
+        await self._db(self._delete, user_id)
+
+    def _delete(self, user_id):
+        if self._digests.get(user_id, True) is not None:
+            self.conn.execute("DELETE FROM user_data WHERE user_id = ?", (user_id,))
+        self._digests[user_id] = None
+
+    def _spill(self, user_id, data):
+        # Thread de la base : écrire l'état évincé, puis le relire au retour de l'utilisateur
+        if data:
+            self._write(user_id, data)
+        self._digests.pop(user_id, None)
+
+    # Données non stockées par ce bot
+    async def get_chat_data(self):
+        return {}
+
+    async def get_bot_data(self):
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def get_conversations(self, name):
+        return {}
+
+    async def update_chat_data(self, chat_id, data):
+        pass
+
+    async def update_bot_data(self, data):
+        pass
+
+    async def update_callback_data(self, data):
+        pass
+
+    async def update_conversation(self, name, key, new_state):
+        pass
+
+    async def refresh_chat_data(self, chat_id, chat_data):
+        pass
+
+    async def refresh_bot_data(self, bot_data):
+        pass
+
+    async def drop_chat_data(self, chat_id):
+        pass
+
+    async def flush(self):
+        # Appelé à l'arrêt, après la dernière update_user_data
+        storage_log.info("💾 État des utilisateurs : %s", self.stats())
+
+    # Éviction des utilisateurs inactifs
+    def _eviction_candidates(self):
+        now = time.monotonic()
+        # Entrées recréées par PTB sans passer par un handler : jamais consultées
+        candidates = [user_id for user_id in self._application.user_data if user_id not in self._last_seen]
+        excess = len(self._last_seen) - self.max_entries if self.max_entries else 0
+        for user_id, seen in self._last_seen.items():
+            if excess > 0 or (self.max_idle and now - seen > self.max_idle):
+                candidates.append(user_id)
+                excess -= 1
+            else:
+                break
+        return candidates
+
+    async def evict(self):
+        processor = self._application.update_processor
+        for user_id in self._eviction_candidates():
+            if processor.busy(user_id):
+                # Update en cours ou en file : son handler écrit dans ce dict
+                self.busy_skips += 1
+                continue
+            # Retirer de la mémoire avant toute attente : une update qui arrive
+            # pendant l'écriture repart d'un dict neuf, rechargé depuis la base
+            data = self._application.user_data.get(user_id)
+            self._application.drop_user_data(user_id)
+            self._evicted.add(user_id)
+            self._last_seen.pop(user_id, None)
+            self.evictions += 1
+            # Sans spill, l'état est seulement oublié en mémoire : la ligne déjà
+            # enregistrée reste dans la base et sera relue au retour. Le thread
+            # de la base traite ses tâches dans l'ordre : si l'utilisateur revient
+            # pendant l'écriture, sa relecture passe après.
+            self._spilling.add(user_id)
+            try:
+                await self._db(self._spill, user_id, data if self.spill else None)
+            finally:
+                self._spilling.discard(user_id)
+
+    async def _sweep(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._overflow.wait(), self.sweep_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._overflow.clear()
+            try:
+                await self.evict()
+            except Exception as e:
+                storage_log.error("Erreur lors de l'éviction des états utilisateurs : %s", e)
+
+    def start_eviction(self, application):
+        self._application = application
+        if not (self.max_entries or self.max_idle):
+            return
+        if not isinstance(application.update_processor, PerUserUpdateProcessor):
+            # Sans lui, impossible de savoir si une update utilise encore l'état
+            storage_log.warning("Éviction des états désactivée : PerUserUpdateProcessor requis")
+            return
+        self._sweeper = asyncio.create_task(self._sweep())
+
+    async def stop_eviction(self):
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            await asyncio.gather(self._sweeper, return_exceptions=True)
+            self._sweeper = None
+
+    def stats(self):
+        return {
+            "resident": len(self._application.user_data) if self._application else None,
+            "tracked": len(self._last_seen),
+            "evictions": self.evictions,
+            "busy_skips": self.busy_skips,
+            "loaded": self.loads,
+            "written": self.writes,
+            "unchanged": self.skipped,
+        }
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self.conn.close()
+
+
+state_persistence = SQLitePersistence(
+    STATE_DB,
+    update_interval=STATE_FLUSH_INTERVAL,
+    max_entries=STATE_MAX_USERS,
+    max_idle=STATE_MAX_IDLE,
+    spill=STATE_SPILL,
+)
+
+
+# --- Traitement concurrent des updates ---
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """Traite les updates en parallèle, mais dans l'ordre pour un même utilisateur.
+
+    La première update d'un utilisateur est traitée tout de suite ; celles qui
+    arrivent pendant ce traitement sont mises dans sa file et traitées ensuite,
+    dans l'ordre d'arrivée, par la même tâche. Une update en file ne bloque pas
+    de place de concurrence : seul l'utilisateur concerné attend, les autres
+    continuent d'être servis. Les updates sans utilisateur ni chat (sondages...)
+    ne sont pas sérialisées.
+    """
+
+    def __init__(self, max_concurrent_updates):
+        super().__init__(max_concurrent_updates)
+        self._queues = {}  # user_id -> deque de (coroutine, heure d'arrivée)
+        self.processed = 0
+        self.max_depth = 0
+        self.wait = WaitStats()
+
+    @staticmethod
+    def _key(update):
+        user = getattr(update, "effective_user", None)
+        if user is not None:
+            return user.id
+        chat = getattr(update, "effective_chat", None)
+        return chat.id if chat is not None else None
+
+    async def _run(self, coroutine):
+        try:
+            await coroutine
+        except Exception as e:
+            # Une erreur ne doit pas bloquer les updates suivantes de l'utilisateur
+            bot_log.error("Erreur lors du traitement d'une update : %s", e)
+        self.processed += 1
+
+    async def do_process_update(self, update, coroutine):
+        key = self._key(update)
+        if key is None:
+            await self._run(coroutine)
+            return
+        queue = self._queues.get(key)
+        if queue is not None:
+            # Une update de cet utilisateur est en cours : attendre son tour
+            queue.append((coroutine, time.perf_counter()))
+            self.max_depth = max(self.max_depth, len(queue))
+            return
+        queue = self._queues[key] = collections.deque()
+        try:
+            await self._run(coroutine)
+            while queue:
+                coroutine, queued_at = queue.popleft()
+                self.wait.observe(time.perf_counter() - queued_at)
+                await self._run(coroutine)
+        finally:
+            del self._queues[key]
+            # Arrêt pendant le traitement : ne pas laisser de coroutines jamais attendues
+            for coroutine, _ in queue:
+                coroutine.close()
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    def busy(self, key):
+        """Une update de cet utilisateur est-elle en cours ou en file ?"""
+        return key in self._queues
+
+    def stats(self):
+        return {
+            "users": len(self._queues),
+            "queued": sum(len(queue) for queue in self._queues.values()),
+            "max_depth": self.max_depth,
+            "processed": self.processed,
+            "user_wait": self.wait.stats(),
+        }
+
+
+def concurrency_stats(application):
+    """Profondeur des files et temps d'attente des verrous (santé et arrêt)"""
+    stats = {"update_queue": application.update_queue.qsize()}
+    if isinstance(application.update_processor, PerUserUpdateProcessor):
+        stats.update(application.update_processor.stats())
+    stats["content_lock_wait"] = content_store.lock_wait.stats()
+    stats["admins_lock_wait"] = role_registry.lock_wait.stats()
+    stats["user_state"] = state_persistence.stats()
+    stats["write_behind"] = persistence.stats()
+    stats["event_loop"] = loop_watchdog.stats()
+    return stats
+
+
+# --- Surveillance de la boucle asyncio ---
+class LoopWatchdog:
+    """Mesure le retard de la boucle asyncio et capture la pile des blocages.
+
+    Une tâche se réveille toutes les interval secondes et note de combien son
+    réveil a été retardé (histogramme "loop"). Un thread vérifie en parallèle
+    que ce réveil a bien lieu : dès que la boucle ne répond plus depuis
+    threshold / 2 secondes, il relève à chaque passage la tâche en cours et sa
+    pile. Le blocage n'est attribué au handler et à la route de callback de la
+    tâche (task_flows) que si le premier et le dernier relevé montrent la même
+    tâche, toujours dans la même coroutine : un seul appel synchrone a bloqué
+    la boucle. Sinon, la boucle était saturée par une longue file de tâches
+    prêtes, toutes courtes, et le blocage est compté pour "<file d'attente>".
+    Quand la boucle reprend, sa durée est ajoutée à l'histogramme "stall" et
+    journalisée.
+    """
+
+    STACK_DEPTH = 8  # appels conservés en haut de la pile capturée
+    SATURATED = "<file d'attente>"
+
+    def __init__(self, interval=0.1, threshold=0.25):
+        self.interval = interval
+        self.threshold = threshold
+        self.stalls = 0
+        self.max_lag = 0.0
+        self.last_stall = None
+        self._expected = None  # heure (monotonic) du prochain réveil attendu
+        self._captured = None  # (réveil attendu, blocage capturé par le thread)
+        self._loop = None
+        self._loop_thread = None
+        self._task = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    def start(self):
+        if not self.interval or not self.threshold:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._expected = time.monotonic() + self.interval
+        self._stop.clear()
+        self._task = asyncio.create_task(self._beat())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._stop.set()
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._thread.join(timeout=5)
+        self._task = self._thread = None
+
+    async def _beat(self):
+        while True:
+            expected = self._expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.monotonic() - expected)
+            stalled = lag >= self.threshold
+            metrics.observe("loop", "main", lag, stalled)
+            self.max_lag = max(self.max_lag, lag)
+            if stalled:
+                self._record_stall(lag, expected)
+
+    def _record_stall(self, lag, expected):
+        captured = self._captured
+        if captured is not None and captured[0] == expected:
+            captured = captured[1]
+        else:
+            # Blocage trop court pour deux relevés du thread : pas d'attribution
+            captured = {"flow": "<inconnu>", "route": None, "task": None, "stack": []}
+        self.stalls += 1
+        # La route est plus précise que le handler (button_callback pour tous les clics)
+        metrics.observe("stall", captured["route"] or captured["flow"], lag)
+        self.last_stall = dict(captured, lag_ms=round(lag * 1000, 1), at=str(datetime.now()))
+        loop_log.warning(
+            "⚠️ Boucle asyncio bloquée %.0f ms par %s%s",
+            lag * 1000, captured["flow"], f" (route {captured['route']})" if captured["route"] else "",
+        )
+
+    def _watch(self):
+        # Au moins deux relevés entre threshold / 2 et threshold
+        period = min(self.interval, self.threshold / 4)
+        first = None  # (réveil attendu, premier relevé du blocage en cours)
+        reported = None
+        while not self._stop.wait(period):
+            expected = self._expected
+            blocked = time.monotonic() - expected
+            if blocked < self.threshold / 2:
+                first = None  # ne pas garder les frames du blocage précédent
+                continue
+            sample = self._sample()
+            if first is None or first[0] != expected:
+                first = (expected, sample)
+                continue
+            captured = self._verdict(first[1], sample)
+            self._captured = (expected, captured)
+            if blocked >= self.threshold and reported != expected and captured["flow"] != self.SATURATED:
+                reported = expected
+                loop_log.warning(
+                    "⏳ Boucle asyncio bloquée depuis %.0f ms, tâche %s (%s) :\n%s",
+                    blocked * 1000, captured["task"], captured["flow"], "".join(captured["stack"]).rstrip(),
+                )
+
+    def _sample(self):
+        """Tâche en cours et pile du thread de la boucle (objets frame)"""
+        frame = sys._current_frames().get(self._loop_thread)
+        frames = []
+        while frame is not None:
+            frames.append(frame)
+            frame = frame.f_back
+        return asyncio.current_task(self._loop), frames
+
+    @staticmethod
+    def _anchor(frames):
+        """Coroutine la plus profonde en cours : celle qui exécute le code synchrone"""
+        for frame in frames:
+            if frame.f_code.co_flags & inspect.CO_COROUTINE:
+                return frame
+        return frames[0] if frames else None
+
+    def _verdict(self, first, last):
+        """Même tâche et même coroutine aux deux relevés : blocage attribué, sinon saturation"""
+        (task, frames), (last_task, last_frames) = first, last
+        anchor = self._anchor(frames)
+        if task is not last_task or anchor is None or not any(frame is anchor for frame in last_frames):
+            return {"flow": self.SATURATED, "route": None, "task": None, "stack": []}
+        flows = task_flows.get(task) or []
+        return {
+            "flow": flows[0] if flows else task.get_name() if task is not None else "<hors tâche>",
+            "route": flows[-1] if len(flows) > 1 else None,
+            "task": task.get_name() if task is not None else None,
+            "stack": traceback.format_stack(last_frames[0])[-self.STACK_DEPTH:] if last_frames else [],
+        }
+
+    def stats(self):
+        stalls = metrics.summary("stall", limit=5)
+        return {
+            "max_lag_ms": round(self.max_lag * 1000, 1),
+            "stalls": self.stalls,
+            "by_flow": {flow: count for flow, count, _, _, _ in stalls},
+            "last_stall": {key: value for key, value in (self.last_stall or {}).items() if key != "stack"} or None,
+        }
+
+
+loop_watchdog = LoopWatchdog(LOOP_WATCHDOG_INTERVAL, LOOP_STALL_THRESHOLD)
+
+
+# --- Mode webhook ---
+class WebhookServer:
+    """Serveur HTTP embarqué (asyncio, sans dépendance) pour le mode webhook.
+
+    POST <path> : une update Telegram, acceptée seulement si l'en-tête
+    X-Telegram-Bot-Api-Secret-Token correspond au secret, puis déposée dans
+    application.update_queue (traitée par l'Application comme en polling).
+    GET <health_path> : état du bot en JSON. GET <metrics_path> : mesures au
+    format texte de Prometheus. Les connexions HTTP/1.1 restent ouvertes
+    entre deux requêtes (keep-alive). Sans path, le serveur ne sert que les
+    routes GET (serveur local de métriques du mode polling).
+    """
+
+    MAX_BODY = 1 << 20
+    REASONS = {
+        200: "OK",
+        400: "Bad Request",
+        403: "Forbidden",
+        404: "Not Found",
+        405: "Method Not Allowed",
+        413: "Payload Too Large",
+    }
+
+    def __init__(self, application, listen, port, path, secret_token, health_path="/health", metrics_path=None):
+        self.application = application
+        self.listen = listen
+        self.port = port
+        self.path = path
+        self.secret_token = (secret_token or "").encode("utf-8")
+        self.health_path = health_path
+        self.metrics_path = metrics_path
+        self.received = 0
+        self.rejected = 0
+        self.invalid = 0
+        self.started_at = None
+        self._server = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._serve, self.listen, self.port)
+        self.started_at = time.monotonic()
+        if self.path:
+            server_log.info("🌐 Webhook en écoute sur %s:%s%s", self.listen, self.port, self.path)
+        if self.metrics_path:
+            server_log.info("📈 Métriques sur http://%s:%s%s", self.listen, self.port, self.metrics_path)
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _serve(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, version = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length") or 0)
+                if length > self.MAX_BODY:
+                    await self._respond(writer, 413, {"ok": False}, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                status, payload = await self._route(method, target.split("?", 1)[0], headers, body)
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, method, path, headers, body):
+        if path == self.health_path and method == "GET":
+            return 200, self.health()
+        if path == self.metrics_path and method == "GET":
+            return 200, metrics.render_prometheus()
+        if not self.path or path != self.path:
+            return 404, {"ok": False}
+        if method != "POST":
+            return 405, {"ok": False}
+        secret = headers.get("x-telegram-bot-api-secret-token", "").encode("utf-8")
+        if not hmac.compare_digest(secret, self.secret_token):
+            self.rejected += 1
+            return 403, {"ok": False}
+        try:
+            payload = json.loads(body)
+            # Un JSON valide mais pas un objet ([], 1, null) n'est pas une update
+            if not isinstance(payload, dict):
+                raise ValueError("update JSON attendue")
+            update = Update.de_json(payload, self.application.bot)
+            if update is None:  # objet vide
+                raise ValueError("update vide")
+        except (ValueError, KeyError, TypeError):
+            self.invalid += 1
+            return 400, {"ok": False}
+        await self.application.update_queue.put(update)
+        self.received += 1
+        return 200, {"ok": True}
+
+    def health(self):
+        return {
+            "status": "ok" if self.application.running else "stopping",
+            "uptime": round(time.monotonic() - self.started_at, 1),
+            "updates": self.received,
+            "rejected": self.rejected,
+            "invalid": self.invalid,
+            "queue": self.application.update_queue.qsize(),
+            "concurrency": concurrency_stats(self.application),
+            "menu_cache": menu_renderer.stats(),
+        }
+
+    async def _respond(self, writer, status, payload, keep_alive=True):
+        if isinstance(payload, str):
+            body, content_type = payload.encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            body, content_type = json.dumps(payload).encode("utf-8"), "application/json"
+        head = (
+            f"HTTP/1.1 {status} {self.REASONS[status]}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+
+async def run_webhook(app):
+    """Équivalent de run_polling() : l'Application reçoit ses updates du WebhookServer"""
+    # Pas de /metrics sur ce port public : les métriques restent sur le serveur local (METRICS_LISTEN)
+    server = WebhookServer(app, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_HEALTH_PATH)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            pass  # Windows : Ctrl+C interrompt asyncio.run()
+    
+    await app.initialize()
+    if app.post_init:
+        await app.post_init(app)
+    if WEBHOOK_URL:
+        # Enregistrer l'URL publique auprès de Telegram
+        await app.bot.set_webhook(
+            url=WEBHOOK_URL,
+            secret_token=WEBHOOK_SECRET,
+            allowed_updates=Update.ALL_TYPES,
+        )
+    await app.start()
+    await server.start()
+    try:
+        await stop.wait()
+    finally:
+        await server.stop()
+        await app.stop()
+        if app.post_stop:
+            await app.post_stop(app)
+        await app.shutdown()
+
+
+# --- Démarrage et arrêt ---
+async def post_init(application):
+    # Reprendre les diffusions interrompues par un redémarrage
+    broadcast_engine.resume_all(application.bot)
+    # Évincer de la mémoire les états des utilisateurs inactifs
+    state_persistence.start_eviction(application)
+    # Détecter le code synchrone qui bloque la boucle asyncio
+    loop_watchdog.start()
+    if METRICS_PORT:
+        # Serveur local : /metrics (Prometheus) et état du bot
+        server = WebhookServer(
+            application, METRICS_LISTEN, METRICS_PORT, None, None, WEBHOOK_HEALTH_PATH, metrics_path=METRICS_PATH
+        )
+        try:
+            await server.start()
+        except OSError as e:
+            # Port déjà pris : le bot tourne quand même, sans serveur de métriques
+            server_log.warning("⚠️ Serveur de métriques indisponible sur %s:%s : %s", METRICS_LISTEN, METRICS_PORT, e)
+        else:
+            application.bot_data["metrics_server"] = server
+
+
+async def post_stop(application):
+    # Enregistrer le point de reprise des diffusions en cours
+    await broadcast_engine.stop()
+    if "metrics_server" in application.bot_data:
+        await application.bot_data.pop("metrics_server").stop()
+    # Avant d'arrêter le planificateur, qui annulerait le récapitulatif en attente
+    await admin_notifier.drain(application.bot)
+    await ui_scheduler.stop()
+    await state_persistence.stop_eviction()
+    await loop_watchdog.stop()
+    bot_log.info("📊 Routes admin : %s", admin_router.stats())
+    bot_log.info("📊 Routes utilisateur : %s", user_router.stats())
+    bot_log.info("📊 Concurrence : %s", concurrency_stats(application))
+    bot_log.info("📊 Écritures différées : %s", persistence.stats())
+    bot_log.info("📊 Messages enregistrés : %s", message_ledger.stats())
+    bot_log.info("📊 Cache des claviers : %s", menu_renderer.stats())
+    bot_log.info("📊 Transitions différées : %s", ui_scheduler.stats())
+    bot_log.info("📊 Notifications admin : %s", admin_notifier.stats())
+    for flow, updates, average, most in api_accounting.flows(limit=5):
+        bot_log.info("📞 %s : %.2f appel(s) API par update (max %s, %s updates)", flow, average, most, updates)
+    if API_REPORT_FILE:
+        try:
+            api_accounting.write_report(API_REPORT_FILE)
+            bot_log.info("📞 Rapport des appels API écrit dans %s", API_REPORT_FILE)
+        except OSError as e:
+            bot_log.error("Erreur lors de l'écriture de %s: %s", API_REPORT_FILE, e)
+
+
+# --- Construction de l'Application ---
+def build_application(request=None, update_processor=None):
+    """Application complète (bot, concurrence, persistance, handlers).
+
+    request et update_processor permettent au banc d'essai (benchmark.py) de
+    brancher une fausse API Bot et de chronométrer le traitement, sans rien
+    changer d'autre au câblage utilisé en production.
+    """
+    bot_options = {}
+    if TELEGRAM_API_URL:
+        bot_options = {"base_url": f"{TELEGRAM_API_URL}/bot", "base_file_url": f"{TELEGRAM_API_URL}/file/bot"}
+    bot = TrackingBot(
+        TOKEN,
+        # Une connexion HTTP par update en cours (1 par défaut dans PTB)
+        request=request or InstrumentedRequest(connection_pool_size=CONCURRENT_UPDATES),
+        **bot_options,
+    )
+    app = (
+        ApplicationBuilder()
+        .bot(bot)
+        .concurrent_updates(update_processor or PerUserUpdateProcessor(CONCURRENT_UPDATES))
+        .persistence(state_persistence)
+        .post_init(post_init)
+        .post_stop(post_stop)
+        .build()
+    )
 
     app.add_handler(CommandHandler("start", start))
     app.add_handler(CommandHandler("admin", admin))
     app.add_handler(CommandHandler("repondre", reply_command))
+    app.add_handler(CommandHandler("stats", stats_command))
     app.add_handler(CallbackQueryHandler(button_callback))
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_text))
     app.add_handler(MessageHandler(filters.PHOTO, handle_photo))
+    return app
 
-    print("🤖 Bot en marche...")
-    app.run_polling()
+
+# --- Fonction principale ---
+def main():
+    if BOT_MODE == "webhook" and not WEBHOOK_SECRET:
+        raise SystemExit("❌ WEBHOOK_SECRET est obligatoire en mode webhook")
+    
+    app = build_application()
+    bot_log.info("🤖 Bot en marche (%s)...", BOT_MODE)
+    try:
+        if BOT_MODE == "webhook":
+            asyncio.run(run_webhook(app))
+        else:
+            app.run_polling()
+    finally:
+        message_journal.close()
+        state_persistence.close()
+        persistence.close()
 
 
 if __name__ == "__main__":
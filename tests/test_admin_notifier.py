@@ -0,0 +1,82 @@
+"""Notifications admin : les noms et messages des utilisateurs (avec _, *, `)
+ne doivent jamais faire échouer l'envoi en Markdown, ni seuls ni regroupés."""
+import asyncio
+import os
+import sys
+import tempfile
+from types import SimpleNamespace
+
+import pytest
+
+# La configuration du bot est lue à l'import : fichiers dans un dossier temporaire
+os.chdir(tempfile.mkdtemp(prefix="bot-tests-"))
+os.environ.update(TELEGRAM_TOKEN="123456:TEST", LOG_LEVEL="WARNING", API_REPORT_FILE="")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import telegram_bot as bot  # noqa: E402
+from telegram.error import BadRequest  # noqa: E402
+
+ADMINS = [1, 2]
+
+
+def parse_markdown(text):
+    """Comme l'API Bot en parse_mode="Markdown" : toute entité ouverte doit être fermée"""
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if char == "\\":
+            i += 2
+            continue
+        if char in "*_`[":
+            end = text.find("]" if char == "[" else char, i + 1)
+            if end == -1:
+                raise BadRequest(f"Can't parse entities: can't find end of the entity starting at byte offset {i}")
+            i = end
+        i += 1
+
+
+class FakeBot:
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id, text, reply_markup=None, parse_mode=None):
+        if parse_mode == "Markdown":
+            parse_markdown(text)
+        self.sent.append((chat_id, text))
+
+
+def user(user_id, first_name, username):
+    return SimpleNamespace(id=user_id, first_name=first_name, last_name=None, username=username)
+
+
+@pytest.fixture
+def notifier(monkeypatch):
+    monkeypatch.setattr(bot.role_registry, "members", lambda min_role="STAFF": ADMINS)
+    return bot.AdminNotifier(window=60)
+
+
+def test_single_notification_with_markdown_characters(notifier):
+    fake_bot = FakeBot()
+    asyncio.run(notifier.notify(fake_bot, user(10, "Jean_Pierre *", "jean_p"), "prix: 5*3 = 15 _ok `"))
+    assert notifier.failed == 0
+    assert [chat_id for chat_id, _ in fake_bot.sent] == ADMINS
+    assert "Jean\\_Pierre \\*" in fake_bot.sent[0][1]
+
+
+def test_digest_with_markdown_characters(notifier):
+    fake_bot = FakeBot()
+
+    async def scenario():
+        await notifier.notify(fake_bot, user(10, "Alice", None), "bonjour")
+        await notifier.notify(fake_bot, user(11, "snake_case", "under_score"), "un _ seul")
+        # Coupé à 80 caractères juste après le *
+        await notifier.notify(fake_bot, user(12, "Bob*", None), "x" * 79 + "*gras*")
+        bot.ui_scheduler.cancel("admin_digest")
+        await notifier._flush(fake_bot)
+
+    asyncio.run(scenario())
+    assert notifier.failed == 0
+    assert notifier.digests == 1
+    assert len(fake_bot.sent) == 2 * len(ADMINS)
+    digest = fake_bot.sent[-1][1]
+    assert "snake\\_case" in digest and "un \\_ seul" in digest and "Bob\\*" in digest
@@ -0,0 +1,62 @@
+"""Appels par update : les tâches lancées par un handler (diffusion, redessin
+différé, récapitulatif) ne comptent pas dans les appels de son update."""
+import asyncio
+import os
+import sys
+import tempfile
+
+import pytest
+
+# La configuration du bot est lue à l'import : fichiers dans un dossier temporaire
+os.chdir(tempfile.mkdtemp(prefix="bot-tests-"))
+os.environ.update(TELEGRAM_TOKEN="123456:TEST", LOG_LEVEL="WARNING", API_REPORT_FILE="")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import telegram_bot as bot  # noqa: E402
+
+USERS = 5
+
+
+class FakeBot:
+    """Chaque envoi est compté comme par InstrumentedRequest"""
+
+    async def send_message(self, chat_id, text, **kwargs):
+        bot.api_accounting.record("sendMessage", 0.001)
+
+    async def edit_message_text(self, **kwargs):
+        bot.api_accounting.record("editMessageText", 0.001)
+
+
+@pytest.fixture
+def accounting(monkeypatch):
+    accounting = bot.ApiAccounting()
+    monkeypatch.setattr(bot, "api_accounting", accounting)
+    return accounting
+
+
+def test_background_calls_do_not_count_for_the_update(accounting, tmp_path):
+    bot.user_store.replace_all([
+        {"user_id": 2_000_000 + i, "username": None, "first_name": "Test", "last_name": None} for i in range(USERS)
+    ])
+    engine = bot.BroadcastEngine(str(tmp_path), rate=100000, concurrency=2)
+    fake_bot = FakeBot()
+
+    async def redraw():
+        await fake_bot.edit_message_text()
+
+    async def handler():
+        with bot.api_flow("admin_broadcast"):
+            await fake_bot.send_message(1, "Diffusion lancée")
+            job = engine.create("Bonjour", admin_chat_id=1)
+            task = engine.launch(job, fake_bot)
+            bot.ui_scheduler.later("redraw", 0, redraw)
+            # Le handler attend encore pendant que les tâches d'arrière-plan envoient
+            await task
+            await asyncio.sleep(0.01)
+        assert bot.api_origin.get() == "<hors handler>"
+
+    asyncio.run(handler())
+    assert accounting.updates == {"admin_broadcast": [1, 1, 1]}
+    assert accounting.calls[("sendMessage", "diffusion")]["calls"] == USERS
+    # Le redessin reste attribué au flux qui l'a programmé, hors appels par update
+    assert accounting.calls[("editMessageText", "admin_broadcast")]["calls"] >= 1
@@ -0,0 +1,144 @@
+"""Reprise d'une diffusion interrompue : chaque utilisateur reçoit le message
+une seule fois et les compteurs restent exacts (sent + failed == total)."""
+import asyncio
+import collections
+import os
+import random
+import sys
+import tempfile
+
+import pytest
+
+# La configuration du bot est lue à l'import : fichiers dans un dossier temporaire
+WORKDIR = tempfile.mkdtemp(prefix="bot-tests-")
+os.chdir(WORKDIR)
+os.environ.update(TELEGRAM_TOKEN="123456:TEST", LOG_LEVEL="WARNING", API_REPORT_FILE="")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import telegram_bot as bot  # noqa: E402
+from telegram.error import Forbidden  # noqa: E402
+
+USERS = 200
+BLOCKED = {1_000_007, 1_000_050, 1_000_150}  # utilisateurs qui ont bloqué le bot
+
+
+class FakeBot:
+    """Enregistre les livraisons ; délais aléatoires pour que les envois se terminent dans le désordre"""
+
+    def __init__(self, seed, stop_after=None):
+        self.random = random.Random(seed)
+        self.deliveries = collections.Counter()
+        self.stop_after = stop_after
+        self.interrupted = asyncio.Event()
+
+    async def send_message(self, chat_id, text):
+        await asyncio.sleep(self.random.random() * 0.005)
+        if chat_id in BLOCKED:
+            raise Forbidden("Forbidden: bot was blocked by the user")
+        self.deliveries[chat_id] += 1
+        if self.stop_after is not None and sum(self.deliveries.values()) >= self.stop_after:
+            self.interrupted.set()
+
+    async def edit_message_text(self, **kwargs):
+        pass
+
+
+@pytest.fixture
+def engine(tmp_path):
+    bot.user_store.replace_all([
+        {"user_id": 1_000_000 + i, "username": f"u{i}", "first_name": "Test", "last_name": None}
+        for i in range(USERS)
+    ])
+    with bot.user_store._lock:
+        bot.user_store.conn.execute("DELETE FROM dead_recipients")
+    return bot.BroadcastEngine(str(tmp_path), rate=100000, concurrency=10, checkpoint_every=7)
+
+
+async def interrupt(engine, job, fake_bot):
+    """Laisser la diffusion en cours avancer puis l'arrêter comme à l'arrêt du bot"""
+    task = engine._tasks[job.id]
+    await asyncio.wait([task, asyncio.ensure_future(fake_bot.interrupted.wait())], return_when=asyncio.FIRST_COMPLETED)
+    await engine.stop()
+    assert job.status == "running"
+
+
+def resume(engine, fake_bot):
+    """Relancer les diffusions depuis le disque, comme au redémarrage (nouveau moteur)"""
+    resumed = bot.BroadcastEngine(engine.store_dir, rate=100000, concurrency=10, checkpoint_every=7)
+    assert resumed.resume_all(fake_bot) == 1
+    return resumed
+
+
+def assert_complete(job, deliveries):
+    assert job.status == "done"
+    assert set(deliveries) == {1_000_000 + i for i in range(USERS)} - BLOCKED
+    assert set(deliveries.values()) == {1}
+    assert job.sent == USERS - len(BLOCKED)
+    assert job.failed == job.unreachable == len(BLOCKED)
+    assert job.sent + job.failed == job.total == USERS
+
+
+def test_resume_delivers_once_and_counts_exactly(engine):
+    async def scenario():
+        job = engine.create("Bonjour à tous", admin_chat_id=1)
+        first = FakeBot(seed=1, stop_after=80)
+        engine.launch(job, first)
+        await interrupt(engine, job, first)
+        # Le point de reprise ne compte que ce qui est au plus au curseur
+        record = bot.load_json(engine._job_path(job))
+        assert record["sent"] + record["failed"] <= job.done
+
+        second = FakeBot(seed=2)
+        resumed = resume(engine, second)
+        await asyncio.gather(*resumed._tasks.values())
+        deliveries = first.deliveries + second.deliveries
+        assert_complete(resumed.jobs[job.id], deliveries)
+
+    asyncio.run(scenario())
+
+
+def test_resume_twice(engine):
+    async def scenario():
+        job = engine.create("Bonjour à tous", admin_chat_id=1)
+        first = FakeBot(seed=3, stop_after=50)
+        engine.launch(job, first)
+        await interrupt(engine, job, first)
+
+        second = FakeBot(seed=4, stop_after=60)
+        resumed = resume(engine, second)
+        await interrupt(resumed, resumed.jobs[job.id], second)
+
+        third = FakeBot(seed=5)
+        final = resume(resumed, third)
+        await asyncio.gather(*final._tasks.values())
+        assert_complete(final.jobs[job.id], first.deliveries + second.deliveries + third.deliveries)
+
+    asyncio.run(scenario())
+
+
+def test_resume_recounts_recipients(engine):
+    async def scenario():
+        revived = 1_000_190  # injoignable à la création, de retour pendant l'arrêt
+        late = {1_000_195, 1_000_196}  # bloquent le bot pendant l'arrêt, avant d'avoir été servis
+        bot.user_store.mark_dead(revived, "blocked")
+        job = engine.create("Bonjour à tous", admin_chat_id=1)
+        assert job.total == USERS - 1
+        first = FakeBot(seed=6, stop_after=40)
+        engine.launch(job, first)
+        await interrupt(engine, job, first)
+
+        assert not ({revived} | late) & set(first.deliveries)
+        for user_id in late:
+            bot.user_store.mark_dead(user_id, "blocked")
+        bot.user_store.add_user(revived, "u190", "Test", None)
+        second = FakeBot(seed=7)
+        resumed = resume(engine, second)
+        await asyncio.gather(*resumed._tasks.values())
+        final = resumed.jobs[job.id]
+        deliveries = first.deliveries + second.deliveries
+        assert set(deliveries) == {1_000_000 + i for i in range(USERS)} - BLOCKED - late
+        assert set(deliveries.values()) == {1}
+        assert final.sent == USERS - len(late) - len(BLOCKED)
+        assert final.sent + final.failed == final.total == USERS - len(late)
+
+    asyncio.run(scenario())
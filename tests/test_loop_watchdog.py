@@ -0,0 +1,51 @@
+"""Surveillance de la boucle : un appel synchrone long est attribué à son
+handler, une boucle saturée de tâches courtes ne l'est à personne."""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+# La configuration du bot est lue à l'import : fichiers dans un dossier temporaire
+os.chdir(tempfile.mkdtemp(prefix="bot-tests-"))
+os.environ.update(TELEGRAM_TOKEN="123456:TEST", LOG_LEVEL="CRITICAL", API_REPORT_FILE="")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import telegram_bot as bot  # noqa: E402
+
+
+def watch(scenario):
+    async def run():
+        watchdog = bot.LoopWatchdog(interval=0.02, threshold=0.2)
+        watchdog.start()
+        await asyncio.sleep(0.05)
+        await scenario()
+        await asyncio.sleep(0.1)  # laisser le réveil retardé enregistrer le blocage
+        await watchdog.stop()
+        return watchdog
+
+    return asyncio.run(run())
+
+
+def test_blocking_call_is_attributed_to_its_handler():
+    async def handler():
+        with bot.api_flow("slow_handler"):
+            time.sleep(0.4)
+
+    watchdog = watch(handler)
+    assert watchdog.stalls == 1
+    assert watchdog.last_stall["flow"] == "slow_handler"
+    assert any("time.sleep(0.4)" in line for line in watchdog.last_stall["stack"])
+
+
+def test_saturated_loop_is_not_blamed_on_a_handler():
+    async def short_handler():
+        with bot.api_flow("short_handler"):
+            time.sleep(0.0005)
+
+    async def burst():
+        await asyncio.gather(*(short_handler() for _ in range(1000)))
+
+    watchdog = watch(burst)
+    assert watchdog.stalls >= 1
+    assert watchdog.last_stall["flow"] == bot.LoopWatchdog.SATURATED
@@ -0,0 +1,68 @@
+"""Pagination du journal des messages après des suppressions : mêmes pages
+qu'un parcours complet, sans parcourir les ids supprimés."""
+import os
+import random
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+import pytest
+
+# La configuration du bot est lue à l'import : fichiers dans un dossier temporaire
+os.chdir(tempfile.mkdtemp(prefix="bot-tests-"))
+os.environ.update(TELEGRAM_TOKEN="123456:TEST", LOG_LEVEL="WARNING", API_REPORT_FILE="")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import telegram_bot as bot  # noqa: E402
+
+START = datetime(2024, 1, 1)
+USERS = (1, 2, 3)
+
+
+@pytest.fixture
+def journal(tmp_path):
+    journal = bot.MessageJournal(str(tmp_path / "messages.jsonl"), compact_min=10**9)
+    for i in range(500):
+        journal.append({
+            "user_id": USERS[i % len(USERS)], "message": f"message {i}", "timestamp": str(START + timedelta(minutes=i)),
+        })
+    yield journal
+    journal.close()
+
+
+def expected_page(journal, limit, before=None, after=None, user_id=None):
+    """Page calculée en parcourant tous les messages"""
+    ids = [m["id"] for m in journal.list() if user_id is None or m["user_id"] == user_id]
+    window = [i for i in ids if (before is None or i < before) and (after is None or i > after)]
+    page = window[:limit] if after is not None else window[-limit:]
+    if not page:
+        return [], None, None
+    if after is not None:
+        return page, page[0] if ids.index(page[0]) > 0 else None, page[-1] if len(window) > limit else None
+    return page, page[0] if len(window) > limit else None, page[-1] if page[-1] != ids[-1] else None
+
+
+def check(journal, **kwargs):
+    page = journal.page(10, **kwargs)
+    assert ([m["id"] for m in page["messages"]], page["older"], page["newer"]) == expected_page(journal, 10, **kwargs)
+
+
+def test_pages_skip_deleted_messages(journal):
+    rng = random.Random(1)
+    # Suppression en masse des messages récents, puis quelques suppressions isolées
+    journal.delete(list(range(300, 490)))
+    journal.delete(rng.sample(range(1, 300), 40))
+    assert journal.tombstones == 230
+    assert len(journal._ids) == journal.count() == 270
+    for user_id in (None,) + USERS:
+        check(journal, user_id=user_id)
+        check(journal, user_id=user_id, before=495)
+        check(journal, user_id=user_id, before=301)
+        check(journal, user_id=user_id, after=250)
+        check(journal, user_id=user_id, after=1)
+
+
+def test_user_list_emptied_by_deletes(journal):
+    journal.delete([m["id"] for m in journal.list() if m["user_id"] == 2])
+    assert 2 not in journal._by_user
+    assert journal.page(10, user_id=2) == {"messages": [], "older": None, "newer": None}
@@ -0,0 +1,149 @@
+"""Éviction des états (context.user_data) : jamais pendant une update de
+l'utilisateur, et l'état évincé est retrouvé à son retour."""
+import asyncio
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+import pytest
+
+# La configuration du bot est lue à l'import : fichiers dans un dossier temporaire
+os.chdir(tempfile.mkdtemp(prefix="bot-tests-"))
+os.environ.update(TELEGRAM_TOKEN="123456:TEST", LOG_LEVEL="WARNING", API_REPORT_FILE="")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import telegram_bot as bot  # noqa: E402
+from telegram import Chat, Message, Update, User  # noqa: E402
+from telegram.ext import ApplicationBuilder, MessageHandler, filters  # noqa: E402
+
+SLOW_USER = 10
+
+
+class Harness:
+    """Application PTB réelle (sans réseau), un handler qui compte les messages par utilisateur"""
+
+    def __init__(self, path, spill=True):
+        self.persistence = bot.SQLitePersistence(path, max_idle=0.01, spill=spill, sweep_interval=3600)
+        self.app = (
+            ApplicationBuilder().token("123456:TEST").persistence(self.persistence)
+            .concurrent_updates(bot.PerUserUpdateProcessor(8)).build()
+        )
+        self.app.bot._bot_user = User(1, "bot", True, username="test_bot")
+        self.app.bot._initialized = True
+        self.gate = asyncio.Event()
+        self.update_id = 0
+        self.app.add_handler(MessageHandler(filters.ALL, self.handler))
+
+    async def handler(self, update, context):
+        context.user_data["count"] = context.user_data.get("count", 0) + 1
+        if update.effective_user.id == SLOW_USER:
+            await self.gate.wait()
+            context.user_data["finished"] = True
+
+    async def start(self):
+        await self.app.initialize()
+        self.persistence.start_eviction(self.app)
+
+    async def stop(self):
+        await self.persistence.stop_eviction()
+        await self.app.shutdown()
+
+    def send(self, user_id):
+        self.update_id += 1
+        update = Update(self.update_id, message=Message(
+            self.update_id, datetime.now(), Chat(user_id, "private"), from_user=User(user_id, "Test", False), text="hi",
+        ))
+        return self.app.update_processor.process_update(update, self.app.process_update(update))
+
+    def stored(self):
+        return {row[0] for row in self.persistence.conn.execute("SELECT user_id FROM user_data")}
+
+
+@pytest.fixture
+def db(tmp_path):
+    return str(tmp_path / "state.db")
+
+
+def test_busy_user_is_not_evicted(db):
+    async def scenario():
+        harness = Harness(db)
+        await harness.start()
+        slow = asyncio.create_task(harness.send(SLOW_USER))
+        await harness.send(11)
+        await asyncio.sleep(0.05)
+        await harness.persistence.evict()
+        # L'utilisateur 10 est encore dans son handler : son état reste en mémoire
+        assert set(harness.app.user_data) == {SLOW_USER}
+        assert harness.persistence.busy_skips == 1
+        harness.gate.set()
+        await slow
+        assert harness.app.user_data[SLOW_USER] == {"count": 1, "finished": True}
+        # L'utilisateur 11, évincé, retrouve son état à son retour
+        await harness.send(11)
+        assert harness.app.user_data[11] == {"count": 2}
+        await harness.stop()
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("spill", [True, False])
+def test_evicted_row_survives_persistence_run(db, spill):
+    async def scenario():
+        harness = Harness(db, spill=spill)
+        await harness.start()
+        harness.gate.set()
+        await harness.send(11)
+        await harness.app.update_persistence()
+        await asyncio.sleep(0.05)
+        await harness.persistence.evict()
+        # PTB demande ensuite la suppression de l'utilisateur évincé : la ligne reste
+        await harness.app.update_persistence()
+        assert harness.stored() == {11}
+        await harness.send(11)
+        assert harness.app.user_data[11] == {"count": 2}
+        await harness.stop()
+
+    asyncio.run(scenario())
+
+
+def test_user_back_before_persistence_run_is_saved(db):
+    async def scenario():
+        harness = Harness(db)
+        await harness.start()
+        harness.gate.set()
+        await harness.send(11)
+        await asyncio.sleep(0.05)
+        await harness.persistence.evict()
+        # Retour avant le passage de PTB, qui écarte alors sa mise à jour
+        await harness.send(11)
+        await harness.app.update_persistence()
+        await harness.stop()
+
+        reopened = bot.SQLitePersistence(db)
+        data = {}
+        await reopened.refresh_user_data(11, data)
+        assert data == {"count": 2}
+        reopened.close()
+
+    asyncio.run(scenario())
+
+
+def test_user_back_during_spill_write(db):
+    async def scenario():
+        harness = Harness(db)
+        await harness.start()
+        harness.gate.set()
+        await harness.send(11)
+        await asyncio.sleep(0.05)
+        # L'écriture de l'état évincé se fait dans le thread de la base ;
+        # l'update qui arrive pendant ce temps relit l'état écrit
+        eviction = asyncio.create_task(harness.persistence.evict())
+        await asyncio.sleep(0)
+        assert 11 not in harness.app.user_data
+        await harness.send(11)
+        await eviction
+        assert harness.app.user_data[11] == {"count": 2}
+        await harness.stop()
+
+    asyncio.run(scenario())
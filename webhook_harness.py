@@ -0,0 +1,263 @@
+"""Banc de test local du mode webhook.
+
+Envoie des updates Telegram enregistrées (ou générées) en POST sur le webhook
+du bot et mesure le débit, sans passer par l'API Telegram :
+
+    python webhook_harness.py --spawn --count 2000 --concurrency 20
+
+--spawn lance telegram_bot.py en mode webhook dans un dossier temporaire, et
+--fake-api (activé par --spawn) lui fournit une fausse API Bot qui répond à
+tous les appels. Sans --spawn, le bot doit déjà tourner avec BOT_MODE=webhook
+(et TELEGRAM_API_URL pointant vers --fake-api pour ne pas contacter Telegram).
+
+Le fichier --updates contient des updates au format de l'API Bot : une liste
+JSON ou une update par ligne (JSONL). Les update_id sont renumérotés.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import parse_qs
+
+import httpx
+
+
+# --- Updates de test ---
+def load_updates(path):
+    with open(path, "r", encoding="utf-8") as f:
+        content = f.read().strip()
+    if content.startswith("["):
+        return json.loads(content)
+    return [json.loads(line) for line in content.splitlines() if line.strip()]
+
+
+def synthetic_updates(users=50):
+    """/start puis un message texte pour chaque utilisateur"""
+    updates = []
+    now = int(time.time())
+    for i in range(users):
+        user = {"id": 100000 + i, "is_bot": False, "first_name": f"Test{i}", "username": f"test{i}"}
+        chat = {"id": user["id"], "type": "private"}
+        updates.append({
+            "update_id": 0,
+            "message": {
+                "message_id": 1, "date": now, "chat": chat, "from": user, "text": "/start",
+                "entities": [{"type": "bot_command", "offset": 0, "length": 6}],
+            },
+        })
+        updates.append({
+            "update_id": 0,
+            "message": {"message_id": 2, "date": now, "chat": chat, "from": user, "text": f"Bonjour {i}"},
+        })
+    return updates
+
+
+# --- Fausse API Bot ---
+class FakeBotApi:
+    """Répond à /bot<token>/<méthode> comme l'API Bot, sans rien envoyer"""
+
+    def __init__(self, port, latency=0.0):
+        self.port = port
+        self.latency = latency  # délai de réponse simulé (aller-retour vers Telegram)
+        self.calls = {}
+        self._message_ids = itertools.count(1000)
+        self._server = None
+        self._connections = {}  # writer -> tâche qui sert la connexion
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._serve, "127.0.0.1", self.port)
+
+    async def stop(self):
+        self._server.close()
+        for writer in list(self._connections):
+            writer.close()
+        # Laisser chaque connexion voir la fin de flux et se terminer proprement
+        await asyncio.gather(*self._connections.values(), return_exceptions=True)
+        await self._server.wait_closed()
+
+    def _result(self, method, params):
+        if method == "getMe":
+            return {"id": 1, "is_bot": True, "first_name": "Harness", "username": "harness_bot"}
+        if method == "getUpdates":
+            return []
+        if method.startswith(("send", "edit", "copy", "forward")):
+            chat_id = int(params.get("chat_id", 0) or 0)
+            return {
+                "message_id": next(self._message_ids),
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "text": "",
+            }
+        return True
+
+    async def _serve(self, reader, writer):
+        self._connections[writer] = asyncio.current_task()
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                _, target, _ = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length") or 0)
+                body = await reader.readexactly(length) if length else b""
+                method = target.rsplit("/", 1)[-1]
+                self.calls[method] = self.calls.get(method, 0) + 1
+                if headers.get("content-type", "").startswith("application/json"):
+                    params = json.loads(body or b"{}")
+                else:
+                    params = {k: v[0] for k, v in parse_qs(body.decode("utf-8")).items()}
+                payload = json.dumps({"ok": True, "result": self._result(method, params)}).encode("utf-8")
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    + f"Content-Length: {len(payload)}\r\n\r\n".encode("latin-1")
+                    + payload
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            self._connections.pop(writer, None)
+            writer.close()
+
+
+# --- Envoi et mesure ---
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+async def wait_healthy(client, health_url, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            response = await client.get(health_url)
+            if response.status_code == 200:
+                return response.json()
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.2)
+    raise SystemExit(f"❌ Le bot ne répond pas sur {health_url}")
+
+
+async def blast(client, url, secret, updates, count, concurrency):
+    """POST de count updates avec concurrency requêtes en parallèle"""
+    latencies = []
+    statuses = {}
+    update_ids = itertools.count(1)
+    source = itertools.islice(itertools.cycle(updates), count)
+
+    async def worker():
+        for update in source:
+            update = dict(update, update_id=next(update_ids))
+            start = time.perf_counter()
+            response = await client.post(
+                url,
+                content=json.dumps(update),
+                headers={"Content-Type": "application/json", "X-Telegram-Bot-Api-Secret-Token": secret},
+            )
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, statuses
+
+
+async def run(args):
+    updates = load_updates(args.updates) if args.updates else synthetic_updates()
+    base = f"http://127.0.0.1:{args.port}"
+    fake_api = None
+    bot_process = None
+    workdir = None
+    if args.fake_api or args.spawn:
+        fake_api = FakeBotApi(args.fake_api_port, args.api_latency / 1000)
+        await fake_api.start()
+        print(f"🧪 Fausse API Bot sur http://127.0.0.1:{args.fake_api_port}")
+    if args.spawn:
+        # Le bot tourne dans un dossier temporaire : aucune donnée réelle n'est touchée
+        workdir = tempfile.TemporaryDirectory(prefix="webhook-harness-")
+        env = dict(
+            os.environ,
+            BOT_MODE="webhook",
+            WEBHOOK_LISTEN="127.0.0.1",
+            WEBHOOK_PORT=str(args.port),
+            WEBHOOK_PATH=args.path,
+            WEBHOOK_SECRET=args.secret,
+            WEBHOOK_URL="",
+            TELEGRAM_TOKEN="123456:HARNESS",
+            TELEGRAM_API_URL=f"http://127.0.0.1:{args.fake_api_port}",
+        )
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "telegram_bot.py")
+        bot_process = subprocess.Popen(
+            [sys.executable, script], cwd=workdir.name, env=env,
+            stdout=subprocess.DEVNULL if args.quiet else None,
+        )
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+            await wait_healthy(client, base + args.health_path, args.startup_timeout)
+            print(f"📨 {args.count} updates, {args.concurrency} connexions")
+            start = time.perf_counter()
+            latencies, statuses = await blast(client, base + args.path, args.secret, updates, args.count, args.concurrency)
+            accepted = time.perf_counter() - start
+            # Attendre que la file du bot soit vide et que plus aucune update
+            # ne soit en cours : débit de traitement complet
+            while True:
+                health = (await client.get(base + args.health_path)).json()
+                if health["queue"] == 0 and health.get("concurrency", {}).get("users", 0) == 0:
+                    break
+                await asyncio.sleep(0.05)
+            drained = time.perf_counter() - start
+    finally:
+        if bot_process is not None:
+            bot_process.terminate()
+            bot_process.wait(timeout=30)
+        if fake_api is not None:
+            await fake_api.stop()
+        if workdir is not None:
+            workdir.cleanup()
+
+    print(f"✅ Réponses HTTP : {statuses}")
+    print(f"📈 Acceptation : {args.count / accepted:.0f} updates/s ({accepted:.2f} s)")
+    print(f"📈 Traitement : {args.count / drained:.0f} updates/s ({drained:.2f} s, file vidée)")
+    print(f"⏱️ Latence POST : p50 {percentile(latencies, 0.5) * 1000:.1f} ms, p99 {percentile(latencies, 0.99) * 1000:.1f} ms")
+    if fake_api is not None:
+        total_calls = sum(fake_api.calls.values())
+        print(f"📞 Appels API Bot : {total_calls} ({total_calls / args.count:.2f} par update) {fake_api.calls}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Banc de test local du mode webhook")
+    parser.add_argument("--updates", help="fichier JSON/JSONL d'updates enregistrées (défaut : updates générées)")
+    parser.add_argument("--count", type=int, default=1000, help="nombre d'updates à envoyer")
+    parser.add_argument("--concurrency", type=int, default=10, help="requêtes simultanées")
+    parser.add_argument("--port", type=int, default=int(os.getenv("WEBHOOK_PORT", "8443")))
+    parser.add_argument("--path", default=os.getenv("WEBHOOK_PATH", "/webhook"))
+    parser.add_argument("--health-path", default=os.getenv("WEBHOOK_HEALTH_PATH", "/health"))
+    parser.add_argument("--secret", default=os.getenv("WEBHOOK_SECRET", "harness-secret"))
+    parser.add_argument("--spawn", action="store_true", help="lancer telegram_bot.py en mode webhook")
+    parser.add_argument("--fake-api", action="store_true", help="servir une fausse API Bot")
+    parser.add_argument("--fake-api-port", type=int, default=8081)
+    parser.add_argument("--api-latency", type=float, default=0, help="latence simulée de la fausse API Bot, en ms")
+    parser.add_argument("--startup-timeout", type=float, default=30)
+    parser.add_argument("--quiet", action="store_true", help="masquer la sortie du bot lancé par --spawn")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()